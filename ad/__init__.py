@@ -1,8 +1,45 @@
-from .ad_client import ADUser, search_candidates, reset_password, disable_user
+from .ad_client import (
+    ADUser,
+    DirectoryBackend,
+    search_candidates,
+    iter_candidates,
+    search_stats,
+    cache_stats,
+    get_user,
+    get_user_by_guid,
+    account_name,
+    invalidate_user,
+    reset_password,
+    disable_user,
+    disable_users,
+    reset_passwords,
+    BulkReport,
+    BulkResult,
+    set_backend,
+    get_backend,
+    configure_from_env,
+    set_write_governor,
+)
 
 __all__ = [
     "ADUser",
+    "DirectoryBackend",
     "search_candidates",
+    "iter_candidates",
+    "search_stats",
+    "cache_stats",
+    "get_user",
+    "get_user_by_guid",
+    "account_name",
+    "invalidate_user",
     "reset_password",
     "disable_user",
+    "disable_users",
+    "reset_passwords",
+    "BulkReport",
+    "BulkResult",
+    "set_backend",
+    "get_backend",
+    "configure_from_env",
+    "set_write_governor",
 ]
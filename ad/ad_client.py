@@ -1,28 +1,495 @@
-import logging, random, string
-from dataclasses import dataclass
+import asyncio, logging, os, secrets, string, time, uuid
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Protocol
 
-@dataclass
+from .cache import TTLCache
+from .governor import BULK, INTERACTIVE, WriteGovernor
+from .identifiers import query_keys
+from .singleflight import SingleFlight
+
+@dataclass(frozen=True, slots=True)
 class ADUser:
     SamAccountName: str
     DisplayName: str
     DistinguishedName: str
     Enabled: bool
+    Mail: str = ""
+    ObjectGUID: str = ""
+    EmployeeID: str = ""
+    TelephoneNumber: str = ""
+    Manager: str = ""
+
+
+class DirectoryBackend(Protocol):
+    """Operations a directory implementation has to provide."""
+
+    async def search(self, query: str, limit: int | None = None) -> list[ADUser]: ...
+
+    async def set_password(self, sam: str, password: str) -> None: ...
+
+    async def disable(self, sam: str) -> None: ...
+
+
+_DEMO_USERS = [
+    ADUser("nustinova", "Устинова Наталья", "CN=Nat,OU=Users,DC=corp,DC=local", True),
+    ADUser("nustinovam", "Устинова Марина", "CN=Marina,OU=Users,DC=corp,DC=local", True),
+]
+
+
+class DemoBackend:
+    """Static directory used when no real AD connection is configured."""
+
+    def __init__(self, users: list[ADUser] | None = None):
+        from .index import DirectoryIndex
+
+        self.index = DirectoryIndex(_DEMO_USERS if users is None else users)
+
+    async def search(self, query: str, limit: int | None = None) -> list[ADUser]:
+        return self.index.search(query, limit)
+
+    async def get_user(self, sam: str) -> ADUser | None:
+        return self.index.get(sam)
+
+    async def get_user_by_guid(self, guid: str) -> ADUser | None:
+        return self.index.get_by_guid(guid)
+
+    async def find(self, identifier: str) -> list[ADUser]:
+        return self.index.find(identifier)
+
+    async def set_password(self, sam: str, password: str) -> None:
+        return None
+
+    async def disable(self, sam: str) -> None:
+        user = self.index.get(sam)
+        if user is not None:
+            self.index.add(replace(user, Enabled=False))
+
+
+_backend: DirectoryBackend = DemoBackend()
+
+
+def set_backend(backend: DirectoryBackend) -> DirectoryBackend:
+    """Install ``backend`` for all module level operations and return the previous one."""
+    global _backend
+    previous, _backend = _backend, backend
+    clear_caches()
+    return previous
+
+
+def get_backend() -> DirectoryBackend:
+    return _backend
+
+
+def _dc_backend(hosts: list[str], base_dn: str | None = None) -> DirectoryBackend:
+    from .ldap_backend import LDAPBackend
+
+    if len(hosts) == 1:
+        return LDAPBackend.from_env(hosts[0], base_dn)
+    from .failover import FailoverBackend
+
+    hedge_ms = float(os.getenv("AD_HEDGE_MS", "0"))
+    return FailoverBackend(
+        {host: LDAPBackend.from_env(host, base_dn) for host in hosts},
+        hedge_after=hedge_ms / 1000 if hedge_ms else None,
+    )
+
+
+def _split_hosts(value: str) -> list[str]:
+    return [h.strip() for h in value.split(",") if h.strip()]
+
+
+def configure_from_env() -> DirectoryBackend:
+    """Switch to the pooled LDAP backend when ``AD_SERVER`` is configured.
+
+    A comma separated ``AD_SERVER`` list puts the domain controllers behind a
+    latency-aware :class:`~ad.failover.FailoverBackend`.  ``AD_DOMAINS``
+    (``corp.local=dc1,dc2;eu.corp.local=dc3``) searches several domains at
+    once through :class:`~ad.forest.ForestBackend`.  ``AD_BACKEND=powershell``
+    runs ActiveDirectory cmdlets in pooled PowerShell hosts instead of LDAP.
+    """
+    if os.getenv("AD_BACKEND", "").lower() == "powershell":
+        from .powershell import PowerShellBackend
+
+        backend: DirectoryBackend = PowerShellBackend.from_env()
+        set_backend(backend)
+        logging.info("Using PowerShell directory backend")
+        return backend
+    domains = [d.split("=", 1) for d in os.getenv("AD_DOMAINS", "").split(";") if "=" in d]
+    if domains:
+        from .forest import ForestBackend, domain_dn
+
+        backend = ForestBackend(
+            {name.strip(): _dc_backend(_split_hosts(hosts), domain_dn(name.strip())) for name, hosts in domains},
+            timeout=float(os.getenv("AD_DOMAIN_TIMEOUT", "2")) or None,
+        )
+        set_backend(backend)
+        logging.info("Using LDAP forest with domains %s", ", ".join(name.strip() for name, _ in domains))
+        return backend
+    hosts = _split_hosts(os.getenv("AD_SERVER", ""))
+    if not hosts:
+        logging.info("AD_SERVER is not set, using demo directory")
+        return _backend
+    backend = _dc_backend(hosts)
+    set_backend(backend)
+    logging.info("Using LDAP directory at %s", os.getenv("AD_SERVER"))
+    return backend
+
+
+_search_flight = SingleFlight()
+_search_cache = TTLCache(int(os.getenv("AD_CACHE_SIZE", "1024")), float(os.getenv("AD_CACHE_TTL", "60")))
+# Keyed by lowercased sAMAccountName and by ("guid", objectGUID).
+_user_cache = TTLCache(int(os.getenv("AD_CACHE_SIZE", "1024")), float(os.getenv("AD_CACHE_TTL", "60")))
+# Bumped by every write; lookups started before a write never populate the
+# caches and never share a flight with lookups started after it.
+_write_generation = 0
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).lower()
+
+
+def _remember(users, generation: int) -> bool:
+    if generation != _write_generation:
+        return False
+    for user in users:
+        _user_cache.set(user.SamAccountName.lower(), user)
+        if user.ObjectGUID:
+            _user_cache.set(("guid", user.ObjectGUID.lower()), user)
+    return True
+
+
+async def _lookup(query: str, limit: int | None, generation: int) -> tuple[ADUser, ...]:
+    found: tuple[ADUser, ...] = ()
+    find = getattr(_backend, "find", None)
+    if find is not None and query_keys(query):
+        found = tuple(await find(query))[:limit]
+    if not found:
+        found = tuple(await _backend.search(query, limit))
+    if _remember(found, generation):
+        _search_cache.set((query, limit), found)
+    return found
+
+
+async def search_candidates(query: str, limit: int | None = None) -> list[ADUser]:
+    """Search the directory through the result cache.
+
+    A query that looks like a mail address, employeeID or phone number is
+    first resolved exactly through the backend's ``find`` when it has one.
+    Identical concurrent queries that miss the cache share one lookup.
+    """
+    key = normalize_query(query)
+    found = _search_cache.get((key, limit))
+    if found is None:
+        generation = _write_generation
+        found = await _search_flight.do((key, limit, generation), lambda: _lookup(key, limit, generation))
+    return list(found)
+
+
+async def get_user(sam: str) -> ADUser | None:
+    """Return the user with ``sAMAccountName`` ``sam`` or ``None``."""
+    key = sam.lower()
+    user = _user_cache.get(key)
+    if user is not None:
+        return user
+    generation = _write_generation
+    lookup = getattr(_backend, "get_user", None)
+    if lookup is not None:
+        user = await lookup(sam)
+    else:
+        user = next((u for u in await _backend.search(sam) if u.SamAccountName.lower() == key), None)
+    if user is not None:
+        _remember((user,), generation)
+    return user
+
+
+async def get_user_by_guid(guid: str) -> ADUser | None:
+    """Return the user with ``objectGUID`` ``guid`` (``xxxxxxxx-xxxx-...`` form) or ``None``.
+
+    Unlike the sAMAccountName the GUID survives renames and moves.
+    """
+    key = ("guid", guid.strip("{}").lower())
+    user = _user_cache.get(key)
+    if user is not None:
+        return user
+    generation = _write_generation
+    lookup = getattr(_backend, "get_user_by_guid", None)
+    if lookup is None:
+        return None
+    user = await lookup(key[1])
+    if user is not None:
+        _remember((user,), generation)
+    return user
+
+
+def account_name(user: ADUser) -> str:
+    """Name writes should address ``user`` by.
+
+    Multi-domain backends qualify it (``corp.local\\iivanov``), since a
+    sAMAccountName is only unique within its domain.
+    """
+    qualify = getattr(_backend, "account_name", None)
+    return qualify(user) if qualify is not None else user.SamAccountName
+
+
+def invalidate_user(sam: str) -> None:
+    """Forget everything cached about ``sam`` after it was modified."""
+    global _write_generation
+    _write_generation += 1
+    key = sam.rpartition("\\")[2].lower()
+    _user_cache.invalidate(lambda _k, user: user.SamAccountName.lower() == key)
+    _search_cache.invalidate(lambda _k, users: any(u.SamAccountName.lower() == key for u in users))
 
-async def search_candidates(query: str) -> list[ADUser]:
-    # TODO: подключить pyad/ldap3/winrm
-    demo = [
-        ADUser("nustinova", "Устинова Наталья", "CN=Nat,OU=Users,DC=corp,DC=local", True),
-        ADUser("nustinovam", "Устинова Марина", "CN=Marina,OU=Users,DC=corp,DC=local", True),
-    ]
-    return [u for u in demo if query.lower() in u.DisplayName.lower()]
-
-async def reset_password(sam: str, length: int = 12) -> str:
-    chars = string.ascii_letters + string.digits + "!@#$%^&*()-_=+"
-    pwd = "".join(random.choice(chars) for _ in range(length))
+
+def clear_caches() -> None:
+    global _write_generation
+    _write_generation += 1
+    _search_cache.clear()
+    _user_cache.clear()
+    invalidate_org_chart()
+
+
+def search_stats() -> dict[str, int]:
+    """Counters of ``search_candidates`` calls and how many were coalesced."""
+    return dict(_search_flight.stats)
+
+
+def cache_stats() -> dict[str, dict]:
+    stats = {"search": _search_cache.info(), "users": _user_cache.info(), "flight": search_stats()}
+    if _governor is not None:
+        stats["writes"] = _governor.metrics()
+    return stats
+
+
+async def iter_candidates(query: str, page_size: int = 200) -> AsyncIterator[ADUser]:
+    """Yield matching users without materialising the whole result set.
+
+    Backends that support server side paging provide ``iter_search``; for the
+    others the regular search result is streamed.  Close the iterator (e.g.
+    with ``contextlib.aclosing``) when stopping early.
+    """
+    iter_search = getattr(_backend, "iter_search", None)
+    if iter_search is None:
+        for user in await _backend.search(query):
+            yield user
+        return
+    async for user in iter_search(query, page_size):
+        yield user
+
+
+def _write_governor_from_env() -> WriteGovernor | None:
+    rate = float(os.getenv("AD_WRITE_RATE", "0"))
+    if rate <= 0:
+        return None
+    return WriteGovernor(rate, int(os.getenv("AD_WRITE_BURST", "5")))
+
+
+_governor: WriteGovernor | None = _write_governor_from_env()
+
+
+def set_write_governor(governor: WriteGovernor | None) -> WriteGovernor | None:
+    """Install the rate limiter for directory writes (``None`` disables it)."""
+    global _governor
+    previous, _governor = _governor, governor
+    return previous
+
+
+async def _throttle(priority: int) -> None:
+    if _governor is not None:
+        waited = await _governor.acquire(priority)
+        if waited > 1:
+            logging.info("Directory write waited %.1fs for the rate limit", waited)
+
+
+_org_chart = None
+_org_chart_built = (-1, 0.0)
+# Bumped by directory syncs; writes through the bot never move anybody.
+_org_chart_generation = 0
+_org_chart_flight = SingleFlight()
+
+
+def invalidate_org_chart() -> None:
+    """Rebuild the org chart on next use, e.g. after managers changed."""
+    global _org_chart_generation
+    _org_chart_generation += 1
+
+
+async def _build_org_chart(generation: int):
+    global _org_chart, _org_chart_built
+    from .hierarchy import OrgChart
+
+    index = getattr(_backend, "index", None)
+    if index is not None and getattr(_backend, "ready", True):
+        # Copied on the loop: sync batches patch the index between our awaits.
+        table = index.snapshot()
+        chart = await asyncio.to_thread(OrgChart, table)
+    else:
+        users = [user async for user in iter_candidates("")]
+        chart = await asyncio.to_thread(OrgChart, users)
+    if generation == _org_chart_generation:
+        _org_chart, _org_chart_built = chart, (generation, time.monotonic())
+    logging.info("Built org chart of %d users", len(chart))
+    return chart
+
+
+async def org_chart():
+    """Return an :class:`~ad.hierarchy.OrgChart` of the whole directory.
+
+    Built in a worker thread from the local index when there is one,
+    otherwise by streaming all users.  Reused until the next directory sync
+    or for ``AD_CACHE_TTL`` seconds; password resets and disables made
+    through the bot do not change the hierarchy, so they keep it.
+    """
+    generation, built = _org_chart_built
+    if (
+        _org_chart is not None
+        and generation == _org_chart_generation
+        and time.monotonic() - built < _search_cache.ttl
+    ):
+        return _org_chart
+    generation = _org_chart_generation
+    return await _org_chart_flight.do(generation, lambda: _build_org_chart(generation))
+
+
+PASSWORD_CLASSES = (string.ascii_uppercase, string.ascii_lowercase, string.digits, "!@#$%^&*()-_=+")
+
+
+def generate_password(length: int = 12) -> str:
+    """Random password with a character of every class AD complexity counts."""
+    if length < len(PASSWORD_CLASSES):
+        raise ValueError(f"Password length must be at least {len(PASSWORD_CLASSES)}")
+    chars = "".join(PASSWORD_CLASSES)
+    pwd = [secrets.choice(cls) for cls in PASSWORD_CLASSES]
+    pwd += [secrets.choice(chars) for _ in range(length - len(pwd))]
+    secrets.SystemRandom().shuffle(pwd)
+    return "".join(pwd)
+
+
+async def reset_password(sam: str, length: int = 12, priority: int = INTERACTIVE) -> str:
+    """Set a random password; ``priority`` selects the rate limiter lane."""
+    pwd = generate_password(length)
+    await _throttle(priority)
+    try:
+        await _backend.set_password(sam, pwd)
+    finally:
+        invalidate_user(sam)
     logging.info("Reset password for %s", sam)
-    # TODO: реальная смена пароля
     return pwd
 
-async def disable_user(sam: str):
+async def disable_user(sam: str, priority: int = INTERACTIVE):
+    await _throttle(priority)
+    try:
+        await _backend.disable(sam)
+    finally:
+        invalidate_user(sam)
     logging.info("Disable user %s", sam)
-    # TODO: реальное отключение в AD
+
+
+@dataclass
+class BulkResult:
+    sam: str
+    ok: bool
+    duration: float
+    error: str | None = None
+    password: str | None = None
+
+
+@dataclass
+class BulkReport:
+    """Outcome of a batch operation, one :class:`BulkResult` per account."""
+
+    action: str
+    results: list[BulkResult]
+    duration: float
+    batch_id: str = ""
+
+    @property
+    def succeeded(self) -> list[str]:
+        return [r.sam for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> list[str]:
+        return [r.sam for r in self.results if not r.ok]
+
+    def audit_details(self) -> dict:
+        """Summary suitable for the audit log; never contains passwords."""
+        return {
+            "batch": self.batch_id,
+            "total": len(self.results),
+            "ok": len(self.succeeded),
+            "failed": len(self.failed),
+            "duration_ms": round(self.duration * 1000),
+            "items": [
+                {"sam": r.sam, "ok": r.ok, "duration_ms": round(r.duration * 1000), "error": r.error}
+                for r in self.results
+            ],
+        }
+
+
+AuditFn = Callable[..., None]
+
+
+async def _run_bulk(
+    action: str,
+    sams: Iterable[str],
+    op: Callable[[str], Awaitable[str | None]],
+    concurrency: int,
+    actor: int | None,
+    audit: AuditFn | None,
+) -> BulkReport:
+    if concurrency < 1:
+        raise ValueError("concurrency must be positive")
+    unique = list(dict.fromkeys(s for s in sams if s))
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(sam: str) -> BulkResult:
+        async with slots:
+            started = time.perf_counter()
+            try:
+                value = await op(sam)
+            except Exception as exc:
+                logging.warning("%s failed for %s: %s", action, sam, exc)
+                return BulkResult(sam, False, time.perf_counter() - started, error=str(exc) or type(exc).__name__)
+            return BulkResult(sam, True, time.perf_counter() - started, password=value)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(sam) for sam in unique))
+    report = BulkReport(action, list(results), time.perf_counter() - started, uuid.uuid4().hex[:12])
+    logging.info("%s: %d ok, %d failed", action, len(report.succeeded), len(report.failed))
+    if audit is not None:
+        audit(actor, action, target=f"{len(unique)} accounts", details=report.audit_details())
+    return report
+
+
+async def disable_users(
+    sams: Iterable[str],
+    concurrency: int = 8,
+    *,
+    actor: int | None = None,
+    audit: AuditFn | None = None,
+) -> BulkReport:
+    """Disable many accounts with at most ``concurrency`` requests in flight.
+
+    ``audit`` (e.g. ``bot.database.audit``) receives one record for the batch
+    with per-account details.  Writes go through the bulk rate limiter lane.
+    """
+
+    async def op(sam: str) -> None:
+        await disable_user(sam, priority=BULK)
+
+    return await _run_bulk("bulk_disable", sams, op, concurrency, actor, audit)
+
+
+async def reset_passwords(
+    sams: Iterable[str],
+    length: int = 12,
+    concurrency: int = 8,
+    *,
+    actor: int | None = None,
+    audit: AuditFn | None = None,
+) -> BulkReport:
+    """Reset passwords for many accounts; new passwords are in ``BulkResult.password``."""
+
+    async def op(sam: str) -> str:
+        return await reset_password(sam, length, priority=BULK)
+
+    return await _run_bulk("bulk_reset_password", sams, op, concurrency, actor, audit)
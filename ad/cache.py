@@ -0,0 +1,94 @@
+"""Bounded LRU cache with per-entry time-to-live."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Least-recently-used mapping whose entries expire after ``ttl`` seconds.
+
+    Safe to share between the event loop and worker threads.
+
+    Parameters
+    ----------
+    maxsize:
+        Maximum number of entries; the least recently used one is evicted.
+    ttl:
+        Lifetime of an entry in seconds.  ``0`` disables caching.
+    clock:
+        Monotonic time source, replaceable in tests.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.stats["misses"] += 1
+                return default
+            expires, value = item
+            if expires <= self._clock():
+                del self._data[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def pop(self, key: Hashable) -> bool:
+        with self._lock:
+            if self._data.pop(key, _MISSING) is _MISSING:
+                return False
+            self.stats["invalidations"] += 1
+            return True
+
+    def invalidate(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Drop every entry for which ``predicate(key, value)`` is true."""
+        with self._lock:
+            stale = [k for k, (_exp, v) in self._data.items() if predicate(k, v)]
+            for key in stale:
+                del self._data[key]
+            self.stats["invalidations"] += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def info(self) -> dict[str, Any]:
+        with self._lock:
+            stats, size = dict(self.stats), len(self._data)
+        requests = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "size": size,
+            "maxsize": self.maxsize,
+            "hit_ratio": round(stats["hits"] / requests, 3) if requests else 0.0,
+        }
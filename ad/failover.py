@@ -0,0 +1,257 @@
+"""Latency-aware routing across several domain controllers.
+
+Every DC keeps an exponentially weighted moving average (EWMA) of its latency
+and error rate.  Reads go to the fastest healthy DC, optionally hedged to the
+runner-up when the first answer is late; writes go to the best DC and fail
+over on connection errors.  A DC failing ``failure_threshold`` times in a row
+is taken out of rotation (circuit open) for ``reset_timeout`` seconds, after
+which a single probe request decides whether it comes back.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable
+
+from .ad_client import ADUser
+from .ldap_backend import CONNECTION_ERRORS
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class DirectoryUnavailable(ConnectionError):
+    """No domain controller is currently accepting requests."""
+
+
+class DCHealth:
+    """Latency/error statistics and circuit breaker state of one DC."""
+
+    def __init__(self, name: str, backend: Any, alpha: float, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.backend = backend
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency: float | None = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.requests = 0
+
+    def available(self, now: float) -> bool:
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            return not self.probing
+        return self.state == CLOSED
+
+    def score(self) -> float:
+        # Unmeasured DCs score 0 so every DC gets measured early on.
+        return (self.latency or 0.0) * (1 + 10 * self.error_rate)
+
+    def observe(self, latency: float) -> None:
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+
+    def record_success(self, latency: float) -> None:
+        self.observe(latency)
+        self.error_rate *= 1 - self.alpha
+        self.failures = 0
+        self.state = CLOSED
+        self.probing = False
+
+    def record_failure(self, now: float) -> None:
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = now
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+        }
+
+
+class FailoverBackend:
+    """Directory backend spreading calls over several domain controllers.
+
+    Parameters
+    ----------
+    backends:
+        Mapping of DC name to backend, in order of preference.
+    hedge_after:
+        Seconds after which a read still waiting on the first DC is also sent
+        to the next best one; the first answer wins.  ``None`` disables it.
+    timeout:
+        Per-call timeout in seconds; a timeout counts as a failure.
+    failure_threshold, reset_timeout:
+        Circuit breaker settings.
+    alpha:
+        EWMA smoothing factor.
+    """
+
+    def __init__(
+        self,
+        backends: dict[str, Any],
+        *,
+        hedge_after: float | None = None,
+        timeout: float | None = None,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        alpha: float = 0.3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not backends:
+            raise ValueError("At least one domain controller is required")
+        self.dcs = [DCHealth(name, b, alpha, failure_threshold, reset_timeout) for name, b in backends.items()]
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self._clock = clock
+        self.stats = {"hedged": 0, "failovers": 0}
+
+    @property
+    def primary(self) -> Any:
+        return self.dcs[0].backend
+
+    def health(self) -> dict[str, dict[str, Any]]:
+        return {dc.name: dc.info() for dc in self.dcs}
+
+    def _order(self) -> list[DCHealth]:
+        now = self._clock()
+        ready = [dc for dc in self.dcs if dc.available(now)]
+        if not ready:
+            raise DirectoryUnavailable("All domain controllers are failing")
+        # sorted() is stable, so equally fast DCs keep their configured order
+        return sorted(ready, key=DCHealth.score)
+
+    @staticmethod
+    def _is_failure(exc: BaseException) -> bool:
+        return isinstance(exc, CONNECTION_ERRORS + (TimeoutError,))
+
+    async def _call(self, dc: DCHealth, op: str, *args: Any) -> Any:
+        if dc.state == HALF_OPEN:
+            dc.probing = True
+        dc.requests += 1
+        started = self._clock()
+        try:
+            call = getattr(dc.backend, op)(*args)
+            result = await (asyncio.wait_for(call, self.timeout) if self.timeout else call)
+        except asyncio.CancelledError:
+            # Lost a hedged race: the elapsed time is a lower bound of its latency.
+            dc.observe(self._clock() - started)
+            dc.probing = False
+            raise
+        except Exception as exc:
+            if self._is_failure(exc):
+                dc.record_failure(self._clock())
+            else:
+                dc.record_success(self._clock() - started)
+            raise
+        dc.record_success(self._clock() - started)
+        return result
+
+    async def _read(self, op: str, *args: Any) -> Any:
+        order = self._order()
+        tasks: dict[asyncio.Future, DCHealth] = {}
+        errors: list[BaseException] = []
+        position = 0
+        hedged = False
+
+        def launch() -> None:
+            nonlocal position
+            dc = order[position]
+            position += 1
+            tasks[asyncio.ensure_future(self._call(dc, op, *args))] = dc
+
+        launch()
+        try:
+            while tasks:
+                hedge = self.hedge_after is not None and not hedged and position < len(order)
+                done, _ = await asyncio.wait(
+                    tasks, timeout=self.hedge_after if hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    self.stats["hedged"] += 1
+                    launch()
+                    continue
+                for task in done:
+                    del tasks[task]
+                    exc = task.exception()
+                    if exc is None:
+                        return task.result()
+                    if not self._is_failure(exc):
+                        raise exc
+                    errors.append(exc)
+                if not tasks and position < len(order):
+                    self.stats["failovers"] += 1
+                    launch()
+            raise errors[-1]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _write(self, op: str, *args: Any) -> Any:
+        error: BaseException | None = None
+        for dc in self._order():
+            if error is not None:
+                self.stats["failovers"] += 1
+            try:
+                return await self._call(dc, op, *args)
+            except Exception as exc:
+                if not self._is_failure(exc):
+                    raise
+                error = exc
+        assert error is not None
+        raise error
+
+    async def search(self, query: str, limit: int | None = None) -> list[ADUser]:
+        return await self._read("search", query, limit)
+
+    async def get_user(self, sam: str) -> ADUser | None:
+        return await self._read("get_user", sam)
+
+    async def get_user_by_guid(self, guid: str) -> ADUser | None:
+        return await self._read("get_user_by_guid", guid)
+
+    async def find(self, identifier: str) -> list[ADUser]:
+        return await self._read("find", identifier)
+
+    async def iter_search(self, query: str, page_size: int = 200) -> AsyncIterator[ADUser]:
+        """Stream from the best DC; fails over only until the first user was yielded."""
+        error: BaseException | None = None
+        for dc in self._order():
+            iter_search = getattr(dc.backend, "iter_search", None)
+            if iter_search is None:
+                continue
+            started = self._clock()
+            yielded = False
+            try:
+                async for user in iter_search(query, page_size):
+                    if not yielded:
+                        dc.record_success(self._clock() - started)
+                        yielded = True
+                    yield user
+                return
+            except Exception as exc:
+                if yielded or not self._is_failure(exc):
+                    raise
+                dc.record_failure(self._clock())
+                error = exc
+        if error is not None:
+            raise error
+        for user in await self.search(query):
+            yield user
+
+    async def set_password(self, sam: str, password: str) -> None:
+        await self._write("set_password", sam, password)
+
+    async def disable(self, sam: str) -> None:
+        await self._write("disable", sam)
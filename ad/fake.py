@@ -0,0 +1,195 @@
+"""Synthetic directory for load tests and benchmarks.
+
+:func:`generate_users` produces a deterministic, realistic looking set of
+Russian employees (FIO, sAMAccountName, DN, mail) of any size and
+:class:`MemoryBackend` serves it through the regular backend interface with
+optional injected latency and failures, so search, caching and bulk
+operations can be measured without a domain controller.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import uuid
+from collections import Counter
+from dataclasses import replace
+from typing import Any, AsyncIterator, Iterable, Iterator
+
+from .ad_client import ADUser
+from .index import DirectoryIndex
+from .translit import transliterate
+
+# (masculine, feminine) surname forms
+SURNAMES = [
+    ("Иванов", "Иванова"), ("Смирнов", "Смирнова"), ("Кузнецов", "Кузнецова"), ("Попов", "Попова"),
+    ("Васильев", "Васильева"), ("Петров", "Петрова"), ("Соколов", "Соколова"), ("Михайлов", "Михайлова"),
+    ("Новиков", "Новикова"), ("Фёдоров", "Фёдорова"), ("Морозов", "Морозова"), ("Волков", "Волкова"),
+    ("Алексеев", "Алексеева"), ("Лебедев", "Лебедева"), ("Семёнов", "Семёнова"), ("Егоров", "Егорова"),
+    ("Павлов", "Павлова"), ("Козлов", "Козлова"), ("Степанов", "Степанова"), ("Николаев", "Николаева"),
+    ("Орлов", "Орлова"), ("Андреев", "Андреева"), ("Макаров", "Макарова"), ("Никитин", "Никитина"),
+    ("Захаров", "Захарова"), ("Зайцев", "Зайцева"), ("Соловьёв", "Соловьёва"), ("Борисов", "Борисова"),
+    ("Яковлев", "Яковлева"), ("Григорьев", "Григорьева"), ("Романов", "Романова"), ("Воробьёв", "Воробьёва"),
+    ("Сергеев", "Сергеева"), ("Кузьмин", "Кузьмина"), ("Фролов", "Фролова"), ("Александров", "Александрова"),
+    ("Дмитриев", "Дмитриева"), ("Королёв", "Королёва"), ("Гусев", "Гусева"), ("Киселёв", "Киселёва"),
+    ("Ильин", "Ильина"), ("Максимов", "Максимова"), ("Поляков", "Полякова"), ("Сорокин", "Сорокина"),
+    ("Виноградов", "Виноградова"), ("Ковалёв", "Ковалёва"), ("Белов", "Белова"), ("Медведев", "Медведева"),
+    ("Антонов", "Антонова"), ("Тарасов", "Тарасова"), ("Жуков", "Жукова"), ("Баранов", "Баранова"),
+    ("Филиппов", "Филиппова"), ("Комаров", "Комарова"), ("Давыдов", "Давыдова"), ("Беляев", "Беляева"),
+    ("Герасимов", "Герасимова"), ("Богданов", "Богданова"), ("Осипов", "Осипова"), ("Сидоров", "Сидорова"),
+    ("Матвеев", "Матвеева"), ("Титов", "Титова"), ("Марков", "Маркова"), ("Миронов", "Миронова"),
+    ("Крылов", "Крылова"), ("Куликов", "Куликова"), ("Карпов", "Карпова"), ("Власов", "Власова"),
+    ("Мельников", "Мельникова"), ("Денисов", "Денисова"), ("Гаврилов", "Гаврилова"), ("Тихонов", "Тихонова"),
+    ("Казаков", "Казакова"), ("Афанасьев", "Афанасьева"), ("Данилов", "Данилова"), ("Савельев", "Савельева"),
+    ("Тимофеев", "Тимофеева"), ("Фомин", "Фомина"), ("Чернов", "Чернова"), ("Абрамов", "Абрамова"),
+    ("Мартынов", "Мартынова"), ("Ефимов", "Ефимова"), ("Федотов", "Федотова"), ("Щербаков", "Щербакова"),
+    ("Назаров", "Назарова"), ("Калинин", "Калинина"), ("Исаев", "Исаева"), ("Чернышёв", "Чернышёва"),
+    ("Быков", "Быкова"), ("Маслов", "Маслова"), ("Родионов", "Родионова"), ("Коновалов", "Коновалова"),
+    ("Лазарев", "Лазарева"), ("Воронин", "Воронина"), ("Климов", "Климова"), ("Филатов", "Филатова"),
+    ("Пономарёв", "Пономарёва"), ("Голубев", "Голубева"), ("Кудрявцев", "Кудрявцева"), ("Устинов", "Устинова"),
+]
+MALE_NAMES = [
+    "Александр", "Алексей", "Андрей", "Антон", "Артём", "Борис", "Вадим", "Валерий", "Виктор", "Владимир",
+    "Вячеслав", "Геннадий", "Георгий", "Григорий", "Денис", "Дмитрий", "Евгений", "Егор", "Иван", "Игорь",
+    "Илья", "Кирилл", "Константин", "Максим", "Михаил", "Никита", "Николай", "Олег", "Павел", "Пётр",
+    "Роман", "Руслан", "Сергей", "Станислав", "Степан", "Тимур", "Фёдор", "Юрий", "Ярослав",
+]
+FEMALE_NAMES = [
+    "Александра", "Алина", "Алла", "Анастасия", "Анна", "Валентина", "Валерия", "Вера", "Виктория", "Галина",
+    "Дарья", "Екатерина", "Елена", "Елизавета", "Жанна", "Зоя", "Ирина", "Карина", "Ксения", "Лариса",
+    "Людмила", "Маргарита", "Марина", "Мария", "Надежда", "Наталья", "Нина", "Оксана", "Ольга", "Полина",
+    "Светлана", "София", "Тамара", "Татьяна", "Юлия", "Яна",
+]
+# (masculine patronymic, feminine patronymic)
+PATRONYMICS = [
+    ("Александрович", "Александровна"), ("Алексеевич", "Алексеевна"), ("Андреевич", "Андреевна"),
+    ("Борисович", "Борисовна"), ("Викторович", "Викторовна"), ("Владимирович", "Владимировна"),
+    ("Дмитриевич", "Дмитриевна"), ("Евгеньевич", "Евгеньевна"), ("Иванович", "Ивановна"),
+    ("Игоревич", "Игоревна"), ("Михайлович", "Михайловна"), ("Николаевич", "Николаевна"),
+    ("Олегович", "Олеговна"), ("Павлович", "Павловна"), ("Петрович", "Петровна"),
+    ("Сергеевич", "Сергеевна"), ("Юрьевич", "Юрьевна"), ("Анатольевич", "Анатольевна"),
+]
+DEPARTMENTS = ["IT", "Sales", "HR", "Finance", "Logistics", "Legal", "Marketing", "Support", "Production"]
+CITIES = ["Moscow", "SPb", "Kazan", "Novosibirsk", "Ekaterinburg"]
+
+
+def generate_users(
+    n: int,
+    seed: int = 0,
+    domain: str = "corp.local",
+    disabled_ratio: float = 0.03,
+    span: int = 8,
+) -> Iterator[ADUser]:
+    """Yield ``n`` deterministic synthetic users (same ``seed`` -> same users).
+
+    Namesakes are deliberately common, as in a real directory; the
+    sAMAccountName gets a numeric suffix when the base login is taken.  The
+    first user heads the company and everybody else reports to one of the
+    earlier users, ``span`` direct reports per manager.
+    """
+    rnd = random.Random(seed)
+    dc = ",".join(f"DC={part}" for part in domain.split("."))
+    logins: Counter[str] = Counter()
+    dns: list[str] = []
+    for number in range(1, n + 1):
+        female = rnd.random() < 0.5
+        surname = rnd.choice(SURNAMES)[female]
+        name = rnd.choice(FEMALE_NAMES if female else MALE_NAMES)
+        patronymic = rnd.choice(PATRONYMICS)[female]
+        display = f"{surname} {name} {patronymic}"
+        base = (transliterate(name[0]) + transliterate(surname))[:18]
+        logins[base] += 1
+        sam = base if logins[base] == 1 else f"{base}{logins[base]}"
+        ou = f"OU={rnd.choice(DEPARTMENTS)},OU={rnd.choice(CITIES)},OU=Users,{dc}"
+        dns.append(f"CN={display} ({sam}),{ou}")
+        yield ADUser(
+            SamAccountName=sam,
+            DisplayName=display,
+            DistinguishedName=dns[-1],
+            Enabled=rnd.random() >= disabled_ratio,
+            Mail=f"{sam}@{domain}",
+            ObjectGUID=str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{sam}.{domain}")),
+            EmployeeID=f"{number:06d}",
+            TelephoneNumber=f"+7 (495) {100 + number // 10000:03d}-{number // 100 % 100:02d}-{number % 100:02d}",
+            Manager=dns[(number - 2) // span] if number > 1 else "",
+        )
+
+
+class MemoryBackend:
+    """In-memory directory with injectable latency and failure rate.
+
+    Parameters
+    ----------
+    users:
+        Initial directory content.
+    latency:
+        Seconds every call waits before answering (``± jitter``).
+    error_rate:
+        Probability in ``[0, 1]`` that a call fails with ``ConnectionError``.
+    seed:
+        Seed for jitter and failures, for reproducible runs.
+    """
+
+    def __init__(
+        self,
+        users: Iterable[ADUser] = (),
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+        analyzer: Any = None,
+    ):
+        self.index = DirectoryIndex(users, analyzer=analyzer)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.calls: Counter[str] = Counter()
+        self.passwords: dict[str, str] = {}
+
+    async def _call(self, op: str) -> None:
+        self.calls[op] += 1
+        delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise ConnectionError(f"Injected {op} failure")
+
+    async def search(self, query: str, limit: int | None = None) -> list[ADUser]:
+        await self._call("search")
+        return self.index.search(query, limit)
+
+    async def iter_search(self, query: str, page_size: int = 200) -> AsyncIterator[ADUser]:
+        found = self.index.search(query)
+        for start in range(0, len(found), page_size):
+            await self._call("page")
+            for user in found[start : start + page_size]:
+                yield user
+
+    async def get_user(self, sam: str) -> ADUser | None:
+        await self._call("get_user")
+        return self.index.get(sam)
+
+    async def get_user_by_guid(self, guid: str) -> ADUser | None:
+        await self._call("get_user")
+        return self.index.get_by_guid(guid)
+
+    async def find(self, identifier: str) -> list[ADUser]:
+        await self._call("find")
+        return self.index.find(identifier)
+
+    def _require(self, sam: str) -> ADUser:
+        user = self.index.get(sam)
+        if user is None:
+            raise LookupError(f"User {sam} not found")
+        return user
+
+    async def set_password(self, sam: str, password: str) -> None:
+        await self._call("set_password")
+        self._require(sam)
+        self.passwords[sam.lower()] = password
+
+    async def disable(self, sam: str) -> None:
+        await self._call("disable")
+        self.index.add(replace(self._require(sam), Enabled=False))
@@ -0,0 +1,125 @@
+"""LDAP filters and attribute lists for directory reads.
+
+A ``(displayName=*query*)`` filter cannot use any index on the domain
+controller, so every search walks all user objects.  :func:`search_filter`
+instead asks for Ambiguous Name Resolution (``anr=``, which covers display,
+given and surname, sAMAccountName and mail including "first last" splits)
+plus initial substrings of the name attributes; all of those are indexed.
+That finds everything ranked as an exact, field prefix or word prefix match
+by :func:`~ad.index.match_rank`; only mid-word matches ("tinova") need the
+optional unindexed ``substring`` term.
+
+Filters are built once per normalized query and cached.
+"""
+
+from __future__ import annotations
+
+import os
+import uuid
+from functools import lru_cache
+
+from .identifiers import EMPLOYEE_ID, MAIL, PHONE, query_keys
+
+FILTER_CACHE_SIZE = int(os.getenv("AD_FILTER_CACHE_SIZE", "4096"))
+PERSON = "(objectCategory=person)(objectClass=user)"
+PREFIX_ATTRIBUTES = ("displayName", "sn", "givenName", "sAMAccountName")
+# Directory attribute behind every ADUser field; the DN comes with each entry.
+FIELD_ATTRIBUTES = {
+    "SamAccountName": "sAMAccountName",
+    "DisplayName": "displayName",
+    "DistinguishedName": None,
+    "Enabled": "userAccountControl",
+    "Mail": "mail",
+    "ObjectGUID": "objectGUID",
+    "EmployeeID": "employeeID",
+    "TelephoneNumber": "telephoneNumber",
+    "Manager": "manager",
+}
+USER_ATTRIBUTES = [a for a in FIELD_ATTRIBUTES.values() if a is not None]
+
+
+def escape(value: str) -> str:
+    """Escape ``value`` for use inside an LDAP filter (RFC 4515)."""
+    out = []
+    for ch in value:
+        if ch in "\\*()\x00":
+            out.append("\\%02x" % ord(ch))
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.split()).lower()
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def _search_filter(query: str, substring: bool) -> str:
+    if not query:
+        return f"(&{PERSON}(displayName=*))"
+    value = escape(query)
+    terms = [f"(anr={value})"]
+    terms += [f"({attr}={value}*)" for attr in PREFIX_ATTRIBUTES]
+    if substring:
+        terms.append(f"(displayName=*{value}*)")
+    return f"(&{PERSON}(|{''.join(terms)}))"
+
+
+def search_filter(query: str, substring: bool = False) -> str:
+    """Filter for users whose names match ``query``; every user for an empty query.
+
+    ``substring`` adds a ``displayName=*query*`` term so matches in the middle
+    of a word are found too, at the cost of an unindexed search.
+    """
+    return _search_filter(normalize(query), substring)
+
+
+def phone_spellings(digits: str) -> list[str]:
+    """Common ways the normalized number ``digits`` is typed into the directory."""
+    if len(digits) != 10:
+        return [digits]
+    code, a, b, c = digits[:3], digits[3:6], digits[6:8], digits[8:]
+    local = [f"{a}-{b}-{c}", f"{a} {b} {c}", f"{a}{b}{c}"]
+    spellings = [digits, f"+7{digits}", f"8{digits}", f"7{digits}"]
+    for trunk in ("+7", "8"):
+        for number in local:
+            spellings += [f"{trunk} ({code}) {number}", f"{trunk}({code}){number}", f"{trunk} {code} {number}"]
+        spellings.append(f"{trunk}-{code}-{a}-{b}-{c}")
+    return list(dict.fromkeys(spellings))
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def identifier_filter(identifier: str) -> str | None:
+    """Filter for users with mail, employeeID or phone ``identifier``.
+
+    Phone numbers are stored as typed ("+7 (495) 123-45-67"), so the full
+    number is matched by equality against its :func:`phone_spellings`, which
+    keeps the search indexed; callers compare the normalized numbers afterwards.
+    ``None`` when ``identifier`` does not look like any of them.
+    """
+    terms = []
+    for kind, value in query_keys(identifier):
+        if kind == MAIL:
+            terms.append(f"(mail={escape(value)})")
+        elif kind == EMPLOYEE_ID:
+            terms.append(f"(employeeID={escape(value)})")
+        elif kind == PHONE:
+            terms += [f"(telephoneNumber={escape(s)})" for s in phone_spellings(value)]
+    if not terms:
+        return None
+    return f"(&{PERSON}(|{''.join(terms)}))"
+
+
+def sam_filter(sam: str) -> str:
+    return f"(&(objectClass=user)(sAMAccountName={escape(sam)}))"
+
+
+def guid_filter(guid: str) -> str:
+    """``(objectGUID=...)`` filter; AD matches the binary value byte by byte."""
+    raw = uuid.UUID(guid.strip("{}")).bytes_le
+    return "(objectGUID=%s)" % "".join("\\%02x" % b for b in raw)
+
+
+def cache_info() -> dict[str, int]:
+    info = _search_filter.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
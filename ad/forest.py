@@ -0,0 +1,210 @@
+"""Fan-out search across the domains of a forest.
+
+Every domain (or global catalog) is queried concurrently with its own
+timeout.  Results are merged with one ranking independent of which domain
+answered first, deduplicated by distinguished name, and a slow or broken
+domain only drops its own users from the answer.
+
+Writes are routed to the domain named by the DC= components of the
+account's distinguished name.  They address accounts as ``domain\\sam``
+(see :meth:`ForestBackend.account_name`); a bare sAMAccountName is only
+written when every domain answered and exactly one has it, since a domain
+that timed out may hold a namesake.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator
+
+from .ad_client import ADUser
+from .index import INDEXED_FIELDS, match_rank, normalize
+
+# Backends may return matches the substring ranking does not explain
+# (another grammatical case, transliteration); they go after the rest.
+UNRANKED = 4
+
+
+def dn_domain(dn: str) -> str:
+    """``CN=x,OU=y,DC=corp,DC=local`` -> ``corp.local``."""
+    parts = [p.strip() for p in dn.split(",")]
+    return ".".join(p[3:] for p in parts if p[:3].upper() == "DC=").lower()
+
+
+def domain_dn(domain: str) -> str:
+    """``corp.local`` -> ``DC=corp,DC=local``."""
+    return ",".join(f"DC={label}" for label in domain.split(".") if label)
+
+
+async def _get_by_search(backend: Any, sam: str) -> ADUser | None:
+    key = sam.lower()
+    return next((u for u in await backend.search(sam) if u.SamAccountName.lower() == key), None)
+
+
+async def _stream(users: list[ADUser]) -> AsyncIterator[ADUser]:
+    for user in users:
+        yield user
+
+
+class ForestBackend:
+    """Directory backend spanning several domains.
+
+    Parameters
+    ----------
+    domains:
+        Mapping of DNS domain name to backend, in order of preference; the
+        order breaks ranking ties between users of different domains.
+    timeout:
+        Seconds to wait for each domain; ``None`` waits for all of them.
+    """
+
+    def __init__(self, domains: dict[str, Any], *, timeout: float | None = 2.0):
+        if not domains:
+            raise ValueError("At least one domain is required")
+        self.domains = {name.lower(): backend for name, backend in domains.items()}
+        self.timeout = timeout
+        self.stats = {"partial": 0, "timeouts": 0, "errors": 0}
+
+    async def _ask(self, domain: str, op: str, *args: Any) -> Any:
+        backend = self.domains[domain]
+        if op == "get_user" and not hasattr(backend, "get_user"):
+            call = _get_by_search(backend, *args)
+        elif op == "get_user_by_guid" and not hasattr(backend, op):
+            return None
+        elif op == "find" and not hasattr(backend, op):
+            return []
+        else:
+            call = getattr(backend, op)(*args)
+        return await (asyncio.wait_for(call, self.timeout) if self.timeout else call)
+
+    async def _fan_out(self, op: str, *args: Any, complete: bool = False) -> list[tuple[str, Any]]:
+        """Results of domains that answered in time; raises only when none did.
+
+        With ``complete`` every domain has to answer, otherwise
+        :class:`ConnectionError` is raised.
+        """
+        names = list(self.domains)
+        outcomes = await asyncio.gather(*(self._ask(d, op, *args) for d in names), return_exceptions=True)
+        answered = []
+        error: BaseException | None = None
+        for domain, outcome in zip(names, outcomes):
+            if isinstance(outcome, (TimeoutError, asyncio.TimeoutError)):
+                self.stats["timeouts"] += 1
+                logging.warning("Domain %s did not answer %s in %ss", domain, op, self.timeout)
+                error = outcome
+            elif isinstance(outcome, LookupError):
+                raise outcome
+            elif isinstance(outcome, Exception):
+                self.stats["errors"] += 1
+                logging.warning("Domain %s failed %s: %s", domain, op, outcome)
+                error = outcome
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                answered.append((domain, outcome))
+        if not answered and error is not None:
+            raise error
+        if complete and len(answered) < len(names):
+            missing = sorted(set(names) - {domain for domain, _ in answered})
+            raise ConnectionError(f"Domains {', '.join(missing)} did not answer {op}") from error
+        if len(answered) < len(names):
+            self.stats["partial"] += 1
+        return answered
+
+    async def search(self, query: str, limit: int | None = None) -> list[ADUser]:
+        q = normalize(query)
+        order = {domain: pos for pos, domain in enumerate(self.domains)}
+        ranked: dict[str, tuple] = {}
+        for domain, users in await self._fan_out("search", query, limit):
+            for user in users:
+                keys = [normalize(getattr(user, f, "") or "") for f in INDEXED_FIELDS]
+                rank = match_rank(q, keys)
+                key = (UNRANKED if rank is None else rank, keys[0], keys[1], order[domain])
+                dn = user.DistinguishedName.lower()
+                if dn not in ranked or key < ranked[dn][0]:
+                    ranked[dn] = (key, user)
+        merged = [user for _key, user in sorted(ranked.values(), key=lambda item: item[0])]
+        return merged if limit is None else merged[:limit]
+
+    async def iter_search(self, query: str, page_size: int = 200) -> AsyncIterator[ADUser]:
+        """Page through every domain in turn, deduplicated by distinguished name.
+
+        Meant for full enumerations (the org chart), so unlike :meth:`search`
+        a failing domain raises instead of silently dropping its users, and no
+        per-domain timeout applies.  Results are not ranked.
+        """
+        seen: set[str] = set()
+        for domain, backend in self.domains.items():
+            pages = getattr(backend, "iter_search", None)
+            if pages is not None:
+                users = pages(query, page_size)
+            else:
+                logging.warning("Domain %s cannot page, its search may be truncated", domain)
+                users = _stream(await backend.search(query))
+            async for user in users:
+                dn = user.DistinguishedName.lower()
+                if dn not in seen:
+                    seen.add(dn)
+                    yield user
+
+    async def find(self, identifier: str) -> list[ADUser]:
+        merged: dict[str, ADUser] = {}
+        for _domain, users in await self._fan_out("find", identifier):
+            for user in users:
+                merged.setdefault(user.DistinguishedName.lower(), user)
+        return list(merged.values())
+
+    def account_name(self, user: ADUser) -> str:
+        """``domain\\sam`` of ``user``, understood by the write methods."""
+        return f"{dn_domain(user.DistinguishedName)}\\{user.SamAccountName}"
+
+    def _split(self, name: str) -> tuple[str | None, str]:
+        domain, _sep, sam = name.rpartition("\\")
+        if not domain:
+            return None, sam
+        domain = domain.lower()
+        if domain not in self.domains:
+            raise LookupError(f"User {name} belongs to unconfigured domain {domain}")
+        return domain, sam
+
+    async def _locate(self, sam: str, complete: bool = False) -> list[ADUser]:
+        found = await self._fan_out("get_user", sam, complete=complete)
+        return [user for _domain, user in found if user is not None]
+
+    async def get_user(self, sam: str) -> ADUser | None:
+        domain, sam = self._split(sam)
+        if domain is not None:
+            return await self._ask(domain, "get_user", sam)
+        found = await self._locate(sam)
+        return found[0] if found else None
+
+    async def get_user_by_guid(self, guid: str) -> ADUser | None:
+        # objectGUIDs are unique across the forest.
+        found = [user for _domain, user in await self._fan_out("get_user_by_guid", guid) if user is not None]
+        return found[0] if found else None
+
+    async def _home(self, name: str) -> tuple[Any, str]:
+        domain, sam = self._split(name)
+        if domain is not None:
+            return self.domains[domain], sam
+        # sAMAccountName is only unique within a domain; never guess for writes,
+        # and a domain that did not answer may hold a namesake.
+        found = await self._locate(sam, complete=True)
+        if not found:
+            raise LookupError(f"User {sam} not found")
+        if len(found) > 1:
+            raise LookupError(f"User {sam} exists in several domains")
+        domain = dn_domain(found[0].DistinguishedName)
+        backend = self.domains.get(domain)
+        if backend is None:
+            raise LookupError(f"User {sam} belongs to unconfigured domain {domain or '?'}")
+        return backend, sam
+
+    async def set_password(self, sam: str, password: str) -> None:
+        backend, sam = await self._home(sam)
+        await backend.set_password(sam, password)
+
+    async def disable(self, sam: str) -> None:
+        backend, sam = await self._home(sam)
+        await backend.disable(sam)
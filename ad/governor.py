@@ -0,0 +1,106 @@
+"""Token bucket rate limiting of directory writes with priority lanes.
+
+Interactive operations (a helpdesk admin pressing "reset") and bulk ones
+(scheduled disables, batch offboarding) share one ops/sec budget.  When the
+budget is exhausted callers queue per lane and every freed token goes to the
+interactive lane first, so a mass run never delays an admin by more than one
+token interval.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable
+
+INTERACTIVE = 0
+BULK = 1
+LANES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+
+class WriteGovernor:
+    """Grant at most ``rate`` operations per second, bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lanes: dict[int, deque[tuple[asyncio.Future, float]]] = {p: deque() for p in LANES}
+        self._pump: asyncio.Task | None = None
+        self._stats = {p: {"granted": 0, "waited": 0, "wait_total": 0.0, "wait_max": 0.0} for p in LANES}
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _grant(self, priority: int, waited: float) -> float:
+        self._tokens -= 1
+        stats = self._stats[priority]
+        stats["granted"] += 1
+        if waited > 0:
+            stats["waited"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+        return waited
+
+    def queue_depth(self, priority: int | None = None) -> int:
+        lanes = self._lanes.values() if priority is None else [self._lanes[priority]]
+        return sum(1 for lane in lanes for fut, _ in lane if not fut.done())
+
+    async def acquire(self, priority: int = INTERACTIVE) -> float:
+        """Wait for a token and return the time spent waiting in seconds."""
+        if priority not in self._lanes:
+            raise ValueError(f"Unknown priority {priority}")
+        self._refill()
+        ahead = sum(self.queue_depth(p) for p in self._lanes if p <= priority)
+        if not ahead and self._tokens >= 1:
+            return self._grant(priority, 0.0)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._lanes[priority].append((future, self._clock()))
+        if self._pump is None or self._pump.done() or self._pump.get_loop() is not loop:
+            self._pump = loop.create_task(self._run_pump())
+        return await future
+
+    def _next_waiter(self) -> tuple[int, asyncio.Future, float] | None:
+        for priority in sorted(self._lanes):
+            lane = self._lanes[priority]
+            while lane:
+                future, queued = lane[0]
+                if future.done():  # cancelled while waiting
+                    lane.popleft()
+                    continue
+                return priority, future, queued
+        return None
+
+    async def _run_pump(self) -> None:
+        while True:
+            self._refill()
+            while self._tokens >= 1:
+                waiter = self._next_waiter()
+                if waiter is None:
+                    return
+                priority, future, queued = waiter
+                self._lanes[priority].popleft()
+                future.set_result(self._grant(priority, self._clock() - queued))
+            if self._next_waiter() is None:
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def metrics(self) -> dict[str, Any]:
+        result: dict[str, Any] = {"rate": self.rate, "burst": self.burst}
+        for priority, name in LANES.items():
+            stats = self._stats[priority]
+            result[f"{name}_queue"] = self.queue_depth(priority)
+            result[f"{name}_granted"] = stats["granted"]
+            result[f"{name}_wait_avg_ms"] = (
+                round(stats["wait_total"] / stats["waited"] * 1000, 1) if stats["waited"] else 0.0
+            )
+            result[f"{name}_wait_max_ms"] = round(stats["wait_max"] * 1000, 1)
+        return result
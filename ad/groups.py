@@ -0,0 +1,197 @@
+"""Cached transitive closure of nested group membership.
+
+Authorisation by AD group ("members of GRP-Helpdesk, directly or through
+nested groups, are bot admins") must not hit the directory on every update.
+:class:`GroupMembership` keeps the direct ``member`` lists of all groups and
+memoises, per group that is asked about, the frozen set of everything nested
+inside it -- the same answer ``tokenGroups`` gives from the user's side.  A
+membership check is then one set lookup.  When a group changes only the
+memoised closures that contain it are dropped.
+
+:class:`GroupSync` keeps the membership current from a :class:`GroupFeed`,
+mirroring :class:`~ad.sync.DirectorySync` for users.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Iterable, Protocol
+
+from .ldap_backend import LDAPBackend, _first
+from .sync import SHOW_DELETED_OID
+
+FULL_FILTER = "(objectCategory=group)"
+DELTA_FILTER = "(&(objectClass=group)(uSNChanged>={low})(uSNChanged<={high}))"
+
+
+def _key(dn: str) -> str:
+    return dn.lower()
+
+
+@dataclass
+class GroupChange:
+    """New direct members of ``dn``; ``members`` is ``None`` when the group was deleted."""
+
+    dn: str
+    members: list[str] | None = None
+
+
+@dataclass
+class GroupBatch:
+    changes: list[GroupChange]
+    cursor: str
+    full: bool = False
+
+
+class GroupFeed(Protocol):
+    async def changes(self, cursor: str | None) -> GroupBatch:
+        """Return groups changed after ``cursor`` or all groups when it is ``None``."""
+        ...
+
+
+class LDAPGroupFeed:
+    """Group feed reading ``uSNChanged`` and ``member`` from the domain controller.
+
+    ldap3 follows AD's ranged retrieval of large ``member`` attributes on its own.
+    """
+
+    def __init__(self, backend: LDAPBackend, page_size: int = 500):
+        self.backend = backend
+        self.page_size = page_size
+
+    async def changes(self, cursor: str | None) -> GroupBatch:
+        return await self.backend.pool.run(self._changes, cursor)
+
+    def _changes(self, conn: Any, cursor: str | None) -> GroupBatch:
+        conn.search("", "(objectClass=*)", search_scope="BASE", attributes=["highestCommittedUSN"])
+        high = int(_first(conn.response[0]["attributes"]["highestCommittedUSN"]))
+        if cursor is None:
+            search_filter, controls = FULL_FILTER, None
+        else:
+            search_filter = DELTA_FILTER.format(low=int(cursor) + 1, high=high)
+            controls = [(SHOW_DELETED_OID, True, None)]
+        entries = conn.extend.standard.paged_search(
+            self.backend.base_dn,
+            search_filter,
+            attributes=["member", "isDeleted"],
+            controls=controls,
+            paged_size=self.page_size,
+            generator=True,
+        )
+        changes = []
+        for entry in entries:
+            if entry.get("type") != "searchResEntry":
+                continue
+            attrs = entry["attributes"]
+            if _first(attrs.get("isDeleted")):
+                changes.append(GroupChange(entry["dn"]))
+            else:
+                changes.append(GroupChange(entry["dn"], list(attrs.get("member") or [])))
+        return GroupBatch(changes, str(high), full=cursor is None)
+
+
+class GroupMembership:
+    """Direct members of every group plus memoised transitive closures.
+
+    Distinguished names are compared case-insensitively.
+    """
+
+    def __init__(self):
+        self._members: dict[str, frozenset[str]] = {}
+        self._closures: dict[str, frozenset[str]] = {}
+        self.stats = {"computed": 0, "invalidated": 0}
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def _invalidate(self, group: str) -> None:
+        stale = [g for g, closure in self._closures.items() if g == group or group in closure]
+        for g in stale:
+            del self._closures[g]
+        self.stats["invalidated"] += len(stale)
+
+    def set_members(self, group: str, members: Iterable[str]) -> None:
+        key = _key(group)
+        new = frozenset(_key(m) for m in members)
+        if self._members.get(key) == new:
+            return
+        self._members[key] = new
+        self._invalidate(key)
+
+    def remove_group(self, group: str) -> None:
+        key = _key(group)
+        if self._members.pop(key, None) is not None:
+            self._invalidate(key)
+
+    def clear(self) -> None:
+        self._members.clear()
+        self._closures.clear()
+
+    def apply(self, batch: GroupBatch) -> None:
+        if batch.full:
+            self.clear()
+        for change in batch.changes:
+            if change.members is None:
+                self.remove_group(change.dn)
+            else:
+                self.set_members(change.dn, change.members)
+
+    def members(self, group: str) -> frozenset[str]:
+        """Every object nested in ``group`` at any depth (nested groups included)."""
+        key = _key(group)
+        closure = self._closures.get(key)
+        if closure is None:
+            seen: set[str] = set()
+            stack = [key]
+            while stack:  # membership cycles are legal in AD, hence ``seen``
+                for member in self._members.get(stack.pop(), ()):
+                    if member not in seen:
+                        seen.add(member)
+                        stack.append(member)
+            closure = self._closures[key] = frozenset(seen)
+            self.stats["computed"] += 1
+        return closure
+
+    def is_member(self, dn: str, group: str) -> bool:
+        return _key(dn) in self.members(group)
+
+    def member_of_any(self, dn: str, groups: Iterable[str]) -> bool:
+        key = _key(dn)
+        return any(key in self.members(g) for g in groups)
+
+
+class GroupSync:
+    """Keep ``membership`` up to date with ``feed``.
+
+    Renaming or moving a user does not change the ``uSNChanged`` of its
+    groups, so every ``full_every``-th poll re-reads all groups.
+    """
+
+    def __init__(self, feed: GroupFeed, membership: GroupMembership, interval: float = 300, full_every: int = 12):
+        self.feed = feed
+        self.membership = membership
+        self.interval = interval
+        self.full_every = full_every
+        self.cursor: str | None = None
+        self._polls = 0
+
+    async def sync_once(self) -> int:
+        self._polls += 1
+        if self.full_every and self._polls % self.full_every == 0:
+            self.cursor = None
+        batch = await self.feed.changes(self.cursor)
+        self.membership.apply(batch)
+        self.cursor = batch.cursor
+        return len(batch.changes)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                count = await self.sync_once()
+                if count:
+                    logging.info("Group sync applied %d changes", count)
+            except Exception:
+                logging.exception("Group sync error")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,110 @@
+"""Manager/report hierarchy with constant time subtree checks.
+
+:class:`OrgChart` turns the ``manager`` attribute of a directory snapshot into
+an adjacency list and numbers the users in depth-first (Euler tour) order.
+Everybody below a manager then occupies one contiguous range of that order:
+``u`` reports to ``m`` at any depth iff ``enter[m] < enter[u] < leave[m]``,
+and listing a subtree is a slice.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from .ad_client import ADUser
+
+
+def _key(dn: str) -> str:
+    return dn.lower()
+
+
+class OrgChart:
+    """Immutable reporting tree built from ``users``.
+
+    Users whose manager is missing from the snapshot are roots.  Manager
+    cycles (dirty data) are broken at an arbitrary member of the cycle.
+    """
+
+    def __init__(self, users: Iterable[ADUser]):
+        self._users: list[ADUser] = list(users)
+        self._by_dn = {_key(u.DistinguishedName): i for i, u in enumerate(self._users)}
+        self._by_sam = {u.SamAccountName.lower(): i for i, u in enumerate(self._users)}
+        self._reports: list[list[int]] = [[] for _ in self._users]
+        roots = []
+        for i, user in enumerate(self._users):
+            manager = self._by_dn.get(_key(user.Manager)) if user.Manager else None
+            if manager is None or manager == i:
+                roots.append(i)
+            else:
+                self._reports[manager].append(i)
+        self._order: list[int] = []
+        self._enter = [-1] * len(self._users)
+        self._leave = [-1] * len(self._users)
+        for root in roots:
+            self._walk(root)
+        for i in range(len(self._users)):  # only members of manager cycles are left
+            if self._enter[i] < 0:
+                self._walk(i)
+
+    def _walk(self, root: int) -> None:
+        # Iterative DFS: real hierarchies are shallow, cycles or chains may not be.
+        self._enter[root] = len(self._order)
+        self._order.append(root)
+        stack = [(root, iter(self._reports[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if self._enter[child] < 0:
+                    self._enter[child] = len(self._order)
+                    self._order.append(child)
+                    stack.append((child, iter(self._reports[child])))
+                    break
+            else:
+                self._leave[node] = len(self._order)
+                stack.pop()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _find(self, who: str) -> int | None:
+        """Row of the user with sAMAccountName or distinguished name ``who``."""
+        row = self._by_sam.get(who.lower())
+        return row if row is not None else self._by_dn.get(_key(who))
+
+    def get(self, who: str) -> ADUser | None:
+        row = self._find(who)
+        return None if row is None else self._users[row]
+
+    def reports(self, manager: str) -> list[ADUser]:
+        """Direct reports of ``manager``."""
+        row = self._find(manager)
+        return [] if row is None else [self._users[i] for i in self._reports[row]]
+
+    def is_under(self, who: str, manager: str) -> bool:
+        """Whether ``who`` reports to ``manager`` directly or indirectly."""
+        u, m = self._find(who), self._find(manager)
+        if u is None or m is None:
+            return False
+        return self._enter[m] < self._enter[u] < self._leave[m]
+
+    def subtree(self, manager: str, include_manager: bool = False) -> list[ADUser]:
+        """Everybody below ``manager`` in depth-first order."""
+        row = self._find(manager)
+        if row is None:
+            return []
+        start = self._enter[row] + (0 if include_manager else 1)
+        return [self._users[i] for i in self._order[start : self._leave[row]]]
+
+    def chain(self, who: str) -> list[ADUser]:
+        """Managers of ``who`` from the direct one up to the root."""
+        row = self._find(who)
+        found: list[ADUser] = []
+        seen = {row}
+        while row is not None:
+            manager = self._users[row].Manager
+            row = self._by_dn.get(_key(manager)) if manager else None
+            if row is None or row in seen:
+                break
+            seen.add(row)
+            found.append(self._users[row])
+        return found
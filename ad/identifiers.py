@@ -0,0 +1,60 @@
+"""Exact identifiers of a person besides the name: mail, employeeID, phone.
+
+Users are indexed under normalized ``(kind, value)`` keys and queries that
+look like one of these identifiers are turned into the same keys, so a
+person mentioned by mail address, personnel number or phone is found with a
+dictionary lookup instead of a substring search over names.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any
+
+MAIL, EMPLOYEE_ID, PHONE = "mail", "employeeID", "phone"
+MIN_PHONE_DIGITS = 7
+
+_MAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_EMPLOYEE_RE = re.compile(r"^[a-z]{0,3}-?\d{3,12}$")
+_PHONE_RE = re.compile(r"^\+?[\d\s().-]+$")
+
+
+def normalize_phone(value: str) -> str:
+    """Digits of ``value``; Russian ``+7``/``8`` trunk prefixes are dropped."""
+    digits = re.sub(r"\D", "", value)
+    if len(digits) == 11 and digits[0] in "78":
+        digits = digits[1:]
+    return digits if len(digits) >= MIN_PHONE_DIGITS else ""
+
+
+def user_keys(user: Any) -> set[tuple[str, str]]:
+    keys = set()
+    mail = (getattr(user, "Mail", "") or "").strip().lower()
+    if mail:
+        keys.add((MAIL, mail))
+    employee = (getattr(user, "EmployeeID", "") or "").strip().lower()
+    if employee:
+        keys.add((EMPLOYEE_ID, employee))
+    phone = normalize_phone(getattr(user, "TelephoneNumber", "") or "")
+    if phone:
+        keys.add((PHONE, phone))
+    return keys
+
+
+def query_keys(query: str) -> list[tuple[str, str]]:
+    """Keys ``query`` could be; empty when it does not look like an identifier."""
+    q = query.strip().lower()
+    if _MAIL_RE.match(q):
+        return [(MAIL, q)]
+    keys = []
+    if _EMPLOYEE_RE.match(q):
+        keys.append((EMPLOYEE_ID, q))
+    if _PHONE_RE.match(q):
+        phone = normalize_phone(q)
+        if phone:
+            keys.append((PHONE, phone))
+    return keys
+
+
+def matches(user: Any, query: str) -> bool:
+    return not user_keys(user).isdisjoint(query_keys(query))
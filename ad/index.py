@@ -0,0 +1,323 @@
+"""In-memory trigram index over directory users.
+
+The index answers the same question as the original linear scan in
+``search_candidates`` -- "is the query a case-insensitive substring of the
+user's name" -- without touching every user.  Each indexed field is lowercased
+once when a user is added and split into trigrams; a query is answered by
+intersecting the posting lists of its own trigrams and verifying the few
+remaining candidates.
+
+Every name token is also indexed under its transliterations and its
+wrong-keyboard-layout spelling, so "ustinova" or "Ecnbyjdf" find "Устинова"
+with a dictionary lookup instead of a fuzzy scan.
+"""
+
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_left, insort
+from dataclasses import replace
+from typing import Any, AsyncIterator, Iterable, Iterator
+
+from .ad_client import ADUser
+from .identifiers import query_keys, user_keys
+from .morph import NameForms, tokenize
+from .table import UserTable
+from .translit import spelling_variants
+
+INDEXED_FIELDS = ("DisplayName", "SamAccountName", "Mail")
+# Shorter respelled words only match a variant exactly, not as a prefix.
+MIN_VARIANT_PREFIX = 3
+# Shorter queries cannot use a trigram; they only match whole name words.
+MIN_SUBSTRING_QUERY = 3
+
+
+def normalize(text: str) -> str:
+    return text.lower()
+
+
+def grams(text: str, n: int = 3) -> set[str]:
+    """Return the set of ``n``-grams of ``text`` (or ``text`` itself when shorter)."""
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+def match_rank(query: str, keys: Iterable[str]) -> int | None:
+    """Rank how well normalized ``query`` matches any of ``keys``.
+
+    ``0`` -- exact match, ``1`` -- prefix of a field, ``2`` -- prefix of a word
+    inside a field, ``3`` -- plain substring.  ``None`` when nothing matches.
+    """
+    best: int | None = None
+    for key in keys:
+        if key == query:
+            return 0
+        pos = key.find(query)
+        if pos < 0:
+            continue
+        rank = 1 if pos == 0 else 3
+        while rank == 3 and pos > 0:
+            if not key[pos - 1].isalnum():
+                rank = 2
+            else:
+                pos = key.find(query, pos + 1)
+        if best is None or rank < best:
+            best = rank
+    return best
+
+
+class DirectoryIndex:
+    """Substring index of :class:`ADUser` objects keyed by ``SamAccountName``.
+
+    Users are stored in a columnar :class:`~ad.table.UserTable`; lookups hand
+    out :class:`ADUser` objects rebuilt from it.  With an explicit
+    ``analyzer`` the inflected forms of ``users`` are expanded right away;
+    otherwise, and for users added later, call ``names.warm()`` from a worker
+    thread so the shared analyzer is not loaded on import or on the event loop.
+    """
+
+    def __init__(self, users: Iterable[ADUser] = (), analyzer: Any = None):
+        self._table = UserTable()
+        self._keys: list[tuple[str, ...]] = []
+        self._by_sam: dict[str, int] = {}
+        self._by_guid: dict[str, int] = {}
+        self._exact: dict[tuple[str, str], set[int]] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._tokens: dict[str, set[int]] = {}
+        self._variants: dict[str, set[int]] = {}
+        self._variant_keys: list[str] = []
+        self._analyzer = analyzer
+        self.names = NameForms(analyzer)
+        for user in users:
+            self.add(user)
+        if analyzer is not None:
+            self.names.warm()
+
+    def rebuilt(self, users: Iterable[ADUser]) -> DirectoryIndex:
+        """New index over ``users`` using the same analyzer, with name forms expanded.
+
+        Slow for large directories; run it in a worker thread.
+        """
+        index = DirectoryIndex(users, analyzer=self._analyzer)
+        index.names.warm()
+        return index
+
+    def snapshot(self) -> UserTable:
+        """Copy of the stored users that later patches do not touch.
+
+        Take it on the event loop, where the index is patched, and iterate it
+        in a worker thread; the copy itself costs a few milliseconds.
+        """
+        return self._table.copy()
+
+    def __len__(self) -> int:
+        return len(self._by_sam)
+
+    def __iter__(self) -> Iterator[ADUser]:
+        return iter(self._table)
+
+    def __contains__(self, sam: str) -> bool:
+        return sam.lower() in self._by_sam
+
+    def get(self, sam: str) -> ADUser | None:
+        doc = self._by_sam.get(sam.lower())
+        return None if doc is None else self._table[doc]
+
+    def get_by_guid(self, guid: str) -> ADUser | None:
+        doc = self._by_guid.get(guid.strip("{}").lower())
+        return None if doc is None else self._table[doc]
+
+    def find(self, identifier: str) -> list[ADUser]:
+        """Users whose mail, employeeID or phone number equals ``identifier``."""
+        docs: set[int] = set()
+        for key in query_keys(identifier):
+            docs |= self._exact.get(key, set())
+        return [self._table[doc] for doc in sorted(docs, key=lambda d: self._keys[d][:2])]
+
+    def add(self, user: ADUser) -> None:
+        """Insert ``user`` or replace the entry with the same ``SamAccountName``."""
+        self.remove(user.SamAccountName)
+        keys = tuple(normalize(getattr(user, f, "") or "") for f in INDEXED_FIELDS)
+        doc = self._table.append(user)
+        if doc == len(self._keys):
+            self._keys.append(keys)
+        else:
+            self._keys[doc] = keys
+        self._by_sam[user.SamAccountName.lower()] = doc
+        if user.ObjectGUID:
+            self._by_guid[user.ObjectGUID.lower()] = doc
+        for key in user_keys(user):
+            self._exact.setdefault(key, set()).add(doc)
+        for gram in set().union(*(grams(k) for k in keys)):
+            self._postings.setdefault(gram, set()).add(doc)
+        tokens = set(tokenize(keys[0]))
+        for token in tokens:
+            self._tokens.setdefault(token, set()).add(doc)
+            for variant in spelling_variants(token):
+                posting = self._variants.get(variant)
+                if posting is None:
+                    posting = self._variants[variant] = set()
+                    insort(self._variant_keys, variant)
+                posting.add(doc)
+        self.names.add_tokens(tokens)
+
+    def remove(self, sam: str) -> bool:
+        doc = self._by_sam.pop(sam.lower(), None)
+        if doc is None:
+            return False
+        user = self._table[doc]
+        guid = user.ObjectGUID.lower()
+        if guid and self._by_guid.get(guid) == doc:
+            del self._by_guid[guid]
+        for key in user_keys(user):
+            posting = self._exact.get(key)
+            if posting is not None:
+                posting.discard(doc)
+                if not posting:
+                    del self._exact[key]
+        for gram in set().union(*(grams(k) for k in self._keys[doc])):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(doc)
+                if not posting:
+                    del self._postings[gram]
+        for token in set(tokenize(self._keys[doc][0])):
+            posting = self._tokens.get(token)
+            if posting is not None:
+                posting.discard(doc)
+                if not posting:
+                    del self._tokens[token]
+            for variant in spelling_variants(token):
+                posting = self._variants.get(variant)
+                if posting is not None:
+                    posting.discard(doc)
+                    if not posting:
+                        del self._variants[variant]
+                        del self._variant_keys[bisect_left(self._variant_keys, variant)]
+        self._table.delete(doc)
+        self._keys[doc] = ()
+        return True
+
+    def _candidates(self, query: str) -> Iterable[int]:
+        if len(query) < MIN_SUBSTRING_QUERY:
+            # A union over every gram containing one or two letters touches
+            # most of the directory; short names ("Ян") still match whole.
+            return self._tokens.get(query, ())
+        postings = sorted((self._postings.get(g, ()) for g in grams(query)), key=len)
+        if not postings or not postings[0]:
+            return ()
+        return postings[0].intersection(*postings[1:])
+
+    def _inflected(self, query: str) -> set[int]:
+        """Users whose name tokens match every word of ``query`` in any grammatical case."""
+        found: set[int] | None = None
+        for word in tokenize(query):
+            docs: set[int] = set()
+            for token in self.names.resolve(word):
+                docs |= self._tokens.get(token, set())
+            found = docs if found is None else found & docs
+            if not found:
+                return set()
+        return found or set()
+
+    def _respelled(self, query: str) -> set[int]:
+        """Users with a transliterated or wrong-layout name token for every word of ``query``."""
+        found: set[int] | None = None
+        for word in query.split():
+            docs: set[int] = set()
+            if len(word) < MIN_VARIANT_PREFIX:
+                docs |= self._variants.get(word, set())
+            else:
+                keys = self._variant_keys
+                for i in range(bisect_left(keys, word), len(keys)):
+                    if not keys[i].startswith(word):
+                        break
+                    docs |= self._variants[keys[i]]
+            found = docs if found is None else found & docs
+            if not found:
+                return set()
+        return found or set()
+
+    def search(self, query: str, limit: int | None = None) -> list[ADUser]:
+        """Return users whose indexed fields contain ``query``, best matches first.
+
+        Users whose name only matches in another grammatical case rank after
+        all substring matches, followed by transliteration and keyboard
+        layout matches.  Queries shorter than :data:`MIN_SUBSTRING_QUERY`
+        only match a whole word of the display name.
+        """
+        q = normalize(query)
+        docs = self._candidates(q) if q else (doc for doc in self._by_sam.values())
+        ranked = []
+        seen = set()
+        for doc in docs:
+            rank = match_rank(q, self._keys[doc])
+            if rank is not None:
+                seen.add(doc)
+                ranked.append((rank, self._keys[doc][0], self._keys[doc][1], doc))
+        for doc in self._inflected(q) - seen:
+            seen.add(doc)
+            ranked.append((4, self._keys[doc][0], self._keys[doc][1], doc))
+        for doc in self._respelled(q) - seen:
+            ranked.append((5, self._keys[doc][0], self._keys[doc][1], doc))
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, ranked)
+        else:
+            ranked.sort()
+        return [self._table[r[3]] for r in ranked]
+
+
+class IndexedBackend:
+    """Serve searches from a local :class:`DirectoryIndex` in front of ``inner``.
+
+    Until the index has been filled (``ready`` is false) searches fall through
+    to the wrapped backend.  Writes always go to ``inner`` and are mirrored
+    into the index so our own changes are visible immediately.
+    """
+
+    def __init__(self, inner, index: DirectoryIndex | None = None):
+        self.inner = inner
+        self.index = index if index is not None else DirectoryIndex()
+        self.ready = False
+
+    async def search(self, query: str, limit: int | None = None) -> list[ADUser]:
+        if not self.ready:
+            return await self.inner.search(query, limit)
+        return self.index.search(query, limit)
+
+    async def iter_search(self, query: str, page_size: int = 200) -> AsyncIterator[ADUser]:
+        inner_iter = getattr(self.inner, "iter_search", None)
+        if not self.ready and inner_iter is not None:
+            async for user in inner_iter(query, page_size):
+                yield user
+            return
+        for user in await self.search(query):
+            yield user
+
+    async def get_user(self, sam: str) -> ADUser | None:
+        inner_get = getattr(self.inner, "get_user", None)
+        if not self.ready and inner_get is not None:
+            return await inner_get(sam)
+        return self.index.get(sam)
+
+    async def get_user_by_guid(self, guid: str) -> ADUser | None:
+        inner_get = getattr(self.inner, "get_user_by_guid", None)
+        if not self.ready and inner_get is not None:
+            return await inner_get(guid)
+        return self.index.get_by_guid(guid)
+
+    async def find(self, identifier: str) -> list[ADUser]:
+        inner_find = getattr(self.inner, "find", None)
+        if not self.ready and inner_find is not None:
+            return await inner_find(identifier)
+        return self.index.find(identifier)
+
+    async def set_password(self, sam: str, password: str) -> None:
+        await self.inner.set_password(sam, password)
+
+    async def disable(self, sam: str) -> None:
+        await self.inner.disable(sam)
+        user = self.index.get(sam)
+        if user is not None:
+            self.index.add(replace(user, Enabled=False))
@@ -0,0 +1,413 @@
+"""LDAP directory backend built on a pool of pre-bound ldap3 connections.
+
+ldap3 itself is synchronous, so every directory operation runs in a worker
+thread on a connection borrowed from :class:`LDAPConnectionPool`.  Connections
+stay bound between calls which saves the TCP+TLS+bind handshake on every
+request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+try:  # pragma: no cover - optional dependency
+    import ldap3
+    from ldap3.core.exceptions import (
+        LDAPCommunicationError,
+        LDAPNoSuchObjectResult,
+        LDAPSessionTerminatedByServerError,
+        LDAPSizeLimitExceededResult,
+    )
+except ImportError:  # pragma: no cover - the demo directory works without ldap3
+    ldap3 = None
+    CONNECTION_ERRORS: tuple[type[BaseException], ...] = (OSError,)
+    _SIZE_LIMIT_ERRORS: tuple[type[BaseException], ...] = ()
+    _NO_SUCH_OBJECT_ERRORS: tuple[type[BaseException], ...] = ()
+else:  # pragma: no cover
+    CONNECTION_ERRORS = (OSError, LDAPCommunicationError, LDAPSessionTerminatedByServerError)
+    _SIZE_LIMIT_ERRORS = (LDAPSizeLimitExceededResult,)
+    _NO_SUCH_OBJECT_ERRORS = (LDAPNoSuchObjectResult,)
+
+from .ad_client import ADUser
+from .cache import TTLCache
+from . import filters
+from .filters import USER_ATTRIBUTES, guid_filter, identifier_filter, sam_filter
+from .identifiers import matches
+
+ACCOUNTDISABLE = 0x2
+PAGED_RESULTS_OID = "1.2.840.113556.1.4.319"
+MODIFY_REPLACE = "MODIFY_REPLACE"  # same value as ldap3.MODIFY_REPLACE
+
+
+def _require_ldap3():
+    if ldap3 is None:
+        raise RuntimeError("ldap3 is not installed. Add it to the environment to use LDAPBackend.")
+    return ldap3
+
+
+def _first(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else None
+    return value
+
+
+def guid_to_str(value: Any) -> str:
+    """Normalize an objectGUID (raw little-endian bytes or ``{...}`` string)."""
+    value = _first(value)
+    if not value:
+        return ""
+    if isinstance(value, (bytes, bytearray)):
+        return str(uuid.UUID(bytes_le=bytes(value)))
+    return str(value).strip("{}").lower()
+
+
+def entry_to_user(dn: str, attrs: dict[str, Any]) -> ADUser:
+    """Convert an ldap3 response entry into :class:`ADUser`."""
+    uac = int(_first(attrs.get("userAccountControl")) or 0)
+    sam = _first(attrs.get("sAMAccountName")) or ""
+    return ADUser(
+        SamAccountName=sam,
+        DisplayName=_first(attrs.get("displayName")) or sam,
+        DistinguishedName=dn,
+        Enabled=not uac & ACCOUNTDISABLE,
+        Mail=_first(attrs.get("mail")) or "",
+        ObjectGUID=guid_to_str(attrs.get("objectGUID")),
+        EmployeeID=str(_first(attrs.get("employeeID")) or ""),
+        TelephoneNumber=_first(attrs.get("telephoneNumber")) or "",
+        Manager=_first(attrs.get("manager")) or "",
+    )
+
+
+class LDAPConnectionPool:
+    """Bounded pool of bound connections shared by all directory calls.
+
+    Parameters
+    ----------
+    factory:
+        Blocking callable returning a new, already bound connection.
+    size:
+        Maximum number of connections open at the same time.  Callers wait for
+        a free connection once the limit is reached.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 4):
+        if size < 1:
+            raise ValueError("Pool size must be positive")
+        self._factory = factory
+        self.size = size
+        self._idle: list[Any] = []
+        self._slots = asyncio.Semaphore(size)
+        # Thread call in flight per borrowed connection (by id).
+        self._working: dict[int, asyncio.Future] = {}
+        self._closed = False
+        self.stats = {"created": 0, "reused": 0, "discarded": 0}
+
+    @staticmethod
+    def _usable(conn: Any) -> bool:
+        return not getattr(conn, "closed", False) and getattr(conn, "bound", True)
+
+    def _discard(self, conn: Any) -> None:
+        self.stats["discarded"] += 1
+        try:
+            conn.unbind()
+        except Exception:  # pragma: no cover - best effort cleanup
+            logging.debug("Failed to unbind LDAP connection", exc_info=True)
+
+    async def _checkout(self) -> Any:
+        while self._idle:
+            conn = self._idle.pop()
+            if self._usable(conn):
+                self.stats["reused"] += 1
+                return conn
+            self._discard(conn)
+        conn = await asyncio.to_thread(self._factory)
+        self.stats["created"] += 1
+        return conn
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Any]:
+        """Borrow a connection for the duration of the ``async with`` block.
+
+        Run blocking work on it through :meth:`call`.  When the block is
+        cancelled while such a call is still running in its thread, the slot
+        and the connection are only given up once that thread is done; the
+        connection is then dropped, since its ``response`` is unknown.
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        await self._slots.acquire()
+        try:
+            conn = await self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            yield conn
+        except asyncio.CancelledError:
+            work = self._working.pop(id(conn), None)
+            if work is not None and not work.done():
+                work.add_done_callback(lambda _work: self._give_back(conn, discard=True))
+            else:
+                self._give_back(conn, discard=True)
+            raise
+        except CONNECTION_ERRORS:
+            self._working.pop(id(conn), None)
+            self._give_back(conn, discard=True)
+            raise
+        except BaseException:
+            self._working.pop(id(conn), None)
+            self._give_back(conn)
+            raise
+        else:
+            self._working.pop(id(conn), None)
+            self._give_back(conn)
+
+    async def call(self, conn: Any, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run blocking ``fn(conn, *args)`` in a thread for a borrowed ``conn``.
+
+        Cancelling the caller does not stop the thread; :meth:`connection`
+        waits for it before handing ``conn`` on.
+        """
+        work = asyncio.ensure_future(asyncio.to_thread(fn, conn, *args))
+        self._working[id(conn)] = work
+        return await asyncio.shield(work)
+
+    def _give_back(self, conn: Any, discard: bool = False) -> None:
+        if discard:
+            self._discard(conn)
+        else:
+            self._release(conn)
+        self._slots.release()
+
+    def _release(self, conn: Any) -> None:
+        if self._closed or not self._usable(conn):
+            self._discard(conn)
+        else:
+            self._idle.append(conn)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run blocking ``fn(conn, *args)`` in a thread on a pooled connection.
+
+        Cancelling the caller does not stop the thread, so the slot is held
+        and the connection dropped once the thread is done instead of going
+        back to the pool, where another call would share it (and its
+        ``response``).
+        """
+        async with self.connection() as conn:
+            return await self.call(conn, fn, *args)
+
+    def close(self) -> None:
+        self._closed = True
+        while self._idle:
+            self._discard(self._idle.pop())
+
+
+def make_connection_factory(
+    host: str,
+    user: str,
+    password: str,
+    *,
+    use_ssl: bool = True,
+    port: int | None = None,
+    timeout: int = 10,
+) -> Callable[[], Any]:
+    """Return a factory opening bound ldap3 connections to ``host``."""
+    lib = _require_ldap3()
+    server = lib.Server(host, port=port, use_ssl=use_ssl, get_info=lib.NONE, connect_timeout=timeout)
+
+    def factory():
+        return lib.Connection(
+            server,
+            user=user,
+            password=password,
+            auto_bind=lib.AUTO_BIND_NO_TLS if use_ssl else lib.AUTO_BIND_TLS_BEFORE_BIND,
+            receive_timeout=timeout,
+            raise_exceptions=True,
+        )
+
+    return factory
+
+
+class LDAPBackend:
+    """Directory backend talking to Active Directory through a connection pool.
+
+    The DN of every user seen in a result is remembered for ``dn_cache_ttl``
+    seconds, so writes right after a lookup address the entry directly
+    instead of searching the subtree for its sAMAccountName again.
+
+    Name searches use indexed filters (see :mod:`ad.filters`); ``substring``
+    also matches inside words at the cost of an unindexed search.
+    """
+
+    def __init__(
+        self,
+        pool: LDAPConnectionPool,
+        base_dn: str,
+        dn_cache_size: int = 4096,
+        dn_cache_ttl: float = 600.0,
+        substring: bool = False,
+    ):
+        self.pool = pool
+        self.base_dn = base_dn
+        self.substring = substring
+        self._dns = TTLCache(dn_cache_size, dn_cache_ttl)
+
+    @classmethod
+    def from_env(cls, host: str | None = None, base_dn: str | None = None) -> "LDAPBackend":
+        use_ssl = os.getenv("AD_USE_SSL", "1") not in {"0", "false", "no"}
+        port = os.getenv("AD_PORT")
+        factory = make_connection_factory(
+            host or os.environ["AD_SERVER"],
+            os.getenv("AD_BIND_USER", ""),
+            os.getenv("AD_BIND_PASSWORD", ""),
+            use_ssl=use_ssl,
+            port=int(port) if port else None,
+            timeout=int(os.getenv("AD_TIMEOUT", "10")),
+        )
+        pool = LDAPConnectionPool(factory, size=int(os.getenv("AD_POOL_SIZE", "4")))
+        return cls(
+            pool,
+            base_dn if base_dn is not None else os.getenv("AD_BASE_DN", ""),
+            substring=os.getenv("AD_SUBSTRING_SEARCH", "0") not in {"0", "false", "no"},
+        )
+
+    def _entries(self, conn: Any, search_filter: str, limit: int | None = None) -> list[tuple[str, dict[str, Any]]]:
+        try:
+            conn.search(self.base_dn, search_filter, attributes=USER_ATTRIBUTES, size_limit=limit or 0)
+        except _SIZE_LIMIT_ERRORS:
+            # the entries up to the limit are still in conn.response
+            if not limit:
+                logging.warning("Server size limit truncated search %s; use iter_search to page", search_filter)
+        return self._collect(conn)
+
+    def _collect(self, conn: Any) -> list[tuple[str, dict[str, Any]]]:
+        found = [(e["dn"], e["attributes"]) for e in conn.response or [] if e.get("type") == "searchResEntry"]
+        for dn, attrs in found:
+            sam = _first(attrs.get("sAMAccountName"))
+            if sam:
+                self._dns.set(sam.lower(), dn)
+        return found
+
+    def _search(self, conn: Any, search_filter: str, limit: int | None = None) -> list[ADUser]:
+        return [entry_to_user(dn, attrs) for dn, attrs in self._entries(conn, search_filter, limit)]
+
+    def _find(self, conn: Any, sam: str) -> tuple[str, dict[str, Any]]:
+        search_filter = sam_filter(sam)
+        dn = self._dns.get(sam.lower())
+        if dn is not None:
+            try:
+                conn.search(dn, search_filter, search_scope="BASE", attributes=USER_ATTRIBUTES)
+                found = self._collect(conn)
+            except _NO_SUCH_OBJECT_ERRORS:
+                found = []
+            if found:
+                return found[0]
+            self._dns.pop(sam.lower())  # renamed or moved
+        found = self._entries(conn, search_filter)
+        if not found:
+            raise LookupError(f"User {sam} not found")
+        return found[0]
+
+    def _dn(self, conn: Any, sam: str) -> str:
+        dn = self._dns.get(sam.lower())
+        return dn if dn is not None else self._find(conn, sam)[0]
+
+    def _page(self, conn: Any, search_filter: str, page_size: int, cookie: bytes | None) -> tuple[list[ADUser], bytes | None]:
+        conn.search(
+            self.base_dn,
+            search_filter,
+            attributes=USER_ATTRIBUTES,
+            paged_size=page_size,
+            paged_cookie=cookie,
+        )
+        users = [entry_to_user(dn, attrs) for dn, attrs in self._collect(conn)]
+        controls = (conn.result or {}).get("controls") or {}
+        return users, controls.get(PAGED_RESULTS_OID, {}).get("value", {}).get("cookie") or None
+
+    def _abandon(self, conn: Any, search_filter: str, cookie: bytes) -> None:
+        # RFC 2696: a page size of zero releases the server side result set.
+        conn.search(self.base_dn, search_filter, attributes=["1.1"], paged_size=0, paged_cookie=cookie)
+
+    def _set_password(self, conn: Any, sam: str, password: str) -> None:
+        try:
+            conn.extend.microsoft.modify_password(self._dn(conn, sam), password)
+        except _NO_SUCH_OBJECT_ERRORS:
+            self._dns.pop(sam.lower())
+            conn.extend.microsoft.modify_password(self._find(conn, sam)[0], password)
+
+    def _disable(self, conn: Any, sam: str) -> None:
+        dn, attrs = self._find(conn, sam)
+        uac = int(_first(attrs.get("userAccountControl")) or 0)
+        conn.modify(dn, {"userAccountControl": [(MODIFY_REPLACE, [uac | ACCOUNTDISABLE])]})
+
+    def _search_filter(self, query: str) -> str:
+        return filters.search_filter(query, self.substring)
+
+    async def search(self, query: str, limit: int | None = None) -> list[ADUser]:
+        return await self.pool.run(self._search, self._search_filter(query), limit)
+
+    async def iter_search(self, query: str, page_size: int = 200) -> AsyncIterator[ADUser]:
+        """Stream matches page by page using the RFC 2696 paged results control.
+
+        The connection stays checked out until the iterator is exhausted or
+        closed, since the paging cookie is only valid on that connection.
+        """
+        search_filter = self._search_filter(query)
+        async with self.pool.connection() as conn:
+            cookie = None
+            try:
+                while True:
+                    try:
+                        users, cookie = await self.pool.call(conn, self._page, search_filter, page_size, cookie)
+                    except asyncio.CancelledError:
+                        # The page is still being read; dropping conn ends the search.
+                        cookie = None
+                        raise
+                    for user in users:
+                        yield user
+                    if not cookie:
+                        break
+            finally:
+                if cookie:
+                    await self.pool.call(conn, self._abandon, search_filter, cookie)
+
+    def _get_user(self, conn: Any, sam: str) -> ADUser | None:
+        try:
+            dn, attrs = self._find(conn, sam)
+        except LookupError:
+            return None
+        return entry_to_user(dn, attrs)
+
+    async def get_user(self, sam: str) -> ADUser | None:
+        return await self.pool.run(self._get_user, sam)
+
+    def _get_user_by_guid(self, conn: Any, guid: str) -> ADUser | None:
+        found = self._entries(conn, f"(&(objectClass=user){guid_filter(guid)})")
+        return entry_to_user(*found[0]) if found else None
+
+    async def get_user_by_guid(self, guid: str) -> ADUser | None:
+        return await self.pool.run(self._get_user_by_guid, guid)
+
+    def _find_users(self, conn: Any, identifier: str) -> list[ADUser]:
+        search_filter = identifier_filter(identifier)
+        if search_filter is None:
+            return []
+        return [u for u in self._search(conn, search_filter) if matches(u, identifier)]
+
+    async def find(self, identifier: str) -> list[ADUser]:
+        """Users whose mail, employeeID or phone number equals ``identifier``."""
+        return await self.pool.run(self._find_users, identifier)
+
+    async def set_password(self, sam: str, password: str) -> None:
+        await self.pool.run(self._set_password, sam, password)
+
+    async def disable(self, sam: str) -> None:
+        await self.pool.run(self._disable, sam)
+
+    def close(self) -> None:
+        self.pool.close()
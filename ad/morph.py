@@ -0,0 +1,161 @@
+"""Morphology-aware lookup of Russian name tokens.
+
+Admins and HR mails use names in oblique cases ("уволить Устиновой Натальи").
+:class:`NameForms` precomputes, for every distinct DisplayName token, all of
+its inflected forms with pymorphy3, so an inflected query word resolves to the
+nominative tokens with a single dictionary hit.  Words not seen while
+indexing fall back to the analyzer's normal forms through a bounded cache.
+
+pymorphy2 is used when pymorphy3 is missing; it only loads on Python 3.10 and
+older because it relies on ``inspect.getargspec``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Iterable
+
+NAME_GRAMMEMES = {"Surn", "Name", "Patr"}
+PARSE_CACHE_SIZE = int(os.getenv("MORPH_CACHE_SIZE", "20000"))
+_TOKEN_RE = re.compile(r"[^\W\d_]{2,}")
+
+_analyzer: Any = None
+_analyzer_lock = threading.Lock()
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def get_analyzer() -> Any:
+    """Return the shared ``MorphAnalyzer`` or ``None`` when unavailable.
+
+    pymorphy3 and its dictionaries are loaded on first use only.
+    """
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                try:
+                    try:
+                        import pymorphy3 as pymorphy
+                    except ImportError:
+                        import pymorphy2 as pymorphy
+
+                    _analyzer = pymorphy.MorphAnalyzer(lang="ru")
+                except ImportError:
+                    logging.warning("pymorphy3 is not installed, name morphology disabled")
+                    _analyzer = False
+                except Exception:
+                    logging.exception("Failed to load the morphology analyzer, name morphology disabled")
+                    _analyzer = False
+    return _analyzer or None
+
+
+def _name_parses(parses: list) -> list:
+    named = [p for p in parses if NAME_GRAMMEMES & set(p.tag.grammemes)]
+    return named or parses
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _normal_forms(word: str) -> tuple[str, ...]:
+    analyzer = get_analyzer()
+    if analyzer is None:
+        return ()
+    return tuple(dict.fromkeys(p.normal_form for p in _name_parses(analyzer.parse(word))))
+
+
+def inflections(token: str, analyzer: Any) -> set[str]:
+    """All forms of ``token`` with the same gender as the token itself."""
+    forms = {token}
+    for parse in _name_parses(analyzer.parse(token)):
+        if parse.word != token:
+            continue
+        gender = parse.tag.gender
+        for form in parse.lexeme:
+            if gender is None or form.tag.gender in (None, gender):
+                forms.add(form.word)
+    return forms
+
+
+class NameForms:
+    """Map inflected word forms to the indexed nominative tokens.
+
+    Parameters
+    ----------
+    analyzer:
+        ``MorphAnalyzer`` compatible object.  Defaults to the shared one;
+        ``False`` disables morphology.  Without an analyzer (or pymorphy3)
+        only exact token matches are found.
+
+    New tokens match exactly right away; their other forms become known once
+    :meth:`warm` has run, which belongs in a worker thread since it parses
+    every token.
+    """
+
+    def __init__(self, analyzer: Any = None):
+        self._analyzer = analyzer
+        # Values are replaced, never mutated, so readers need no lock.
+        self._forms: dict[str, frozenset[str]] = {}
+        self._pending: set[str] = set()
+        self._expanded: set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def analyzer(self) -> Any:
+        if self._analyzer is False:
+            return None
+        return self._analyzer if self._analyzer is not None else get_analyzer()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _merge(self, forms: dict[str, set[str]]) -> None:
+        for form, tokens in forms.items():
+            known = self._forms.get(form, frozenset())
+            if not tokens <= known:
+                self._forms[form] = known | tokens
+
+    def add_tokens(self, tokens: Iterable[str]) -> None:
+        with self._lock:
+            new = {t for t in tokens if t not in self._expanded and t not in self._pending}
+            self._pending |= new
+            self._merge({t: {t} for t in new})
+
+    def warm(self) -> None:
+        """Expand all tokens added so far; safe to call from a worker thread."""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return
+        analyzer = self.analyzer
+        forms: dict[str, set[str]] = {}
+        for token in pending:
+            for form in inflections(token, analyzer) if analyzer is not None else {token}:
+                forms.setdefault(form, set()).add(token)
+        with self._lock:
+            self._merge(forms)
+            self._expanded |= pending
+
+    def resolve(self, word: str) -> frozenset[str]:
+        """Nominative tokens ``word`` may be a form of.
+
+        Never parses the indexed tokens itself and never loads the shared
+        analyzer: until :meth:`warm` has run, pending tokens only match their
+        own spelling, and words not seen while indexing match nothing.
+        """
+        tokens = self._forms.get(word)
+        if tokens is not None:
+            return tokens
+        if self._analyzer is False or (self._analyzer is None and not _analyzer):
+            return frozenset()
+        if self._analyzer is not None:
+            normal = {p.normal_form for p in _name_parses(self._analyzer.parse(word))}
+        else:
+            normal = set(_normal_forms(word))
+        return frozenset(t for n in normal for t in self._forms.get(n, ()))
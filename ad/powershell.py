@@ -0,0 +1,270 @@
+"""Directory backend driving long-lived PowerShell hosts.
+
+Starting ``powershell.exe`` and importing the ActiveDirectory module takes
+seconds, far longer than the cmdlet itself.  :class:`PowerShellPool` keeps a
+few host processes running (``ad/ps_host.ps1``, optionally holding a WinRM
+session to a DC) and sends them one command at a time over a JSON line
+protocol::
+
+    -> {"id": 1, "command": "disable", "args": {"sam": "nustinova"}}
+    <- {"id": 1, "ok": true, "result": null}
+    <- {"id": 2, "ok": false, "error": "User ghost not found", "kind": "NotFound"}
+
+A host is restarted after ``max_ops`` commands (PowerShell leaks memory in
+long sessions) and killed when a command exceeds ``timeout``, since its state
+is unknown afterwards.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shlex
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Sequence
+
+from . import filters
+from .ad_client import ADUser
+from .identifiers import matches
+
+HOST_SCRIPT = os.path.join(os.path.dirname(__file__), "ps_host.ps1")
+# Lines from the host may carry a whole search result.
+LINE_LIMIT = 16 * 1024 * 1024
+
+
+class PowerShellError(RuntimeError):
+    """A command failed inside the PowerShell host."""
+
+
+class PowerShellWorker:
+    """One host process answering commands strictly in order."""
+
+    def __init__(self, argv: Sequence[str]):
+        self.argv = list(argv)
+        self.ops = 0
+        self._proc: asyncio.subprocess.Process | None = None
+        self._ids = itertools.count(1)
+        self._killed = False
+
+    @property
+    def alive(self) -> bool:
+        # returncode is only set once somebody waits for the process.
+        return self._proc is not None and self._proc.returncode is None and not self._killed
+
+    @property
+    def pid(self) -> int | None:
+        return self._proc.pid if self._proc is not None else None
+
+    async def start(self) -> None:
+        self._proc = await asyncio.create_subprocess_exec(
+            *self.argv,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=LINE_LIMIT,
+        )
+
+    async def call(self, command: str, args: dict[str, Any], timeout: float | None) -> Any:
+        if not self.alive:
+            raise ConnectionError("PowerShell host is not running")
+        assert self._proc is not None and self._proc.stdin is not None and self._proc.stdout is not None
+        request_id = next(self._ids)
+        self.ops += 1
+        line = json.dumps({"id": request_id, "command": command, "args": args}, ensure_ascii=False)
+        try:
+            self._proc.stdin.write(line.encode() + b"\n")
+            await self._proc.stdin.drain()
+            raw = await asyncio.wait_for(self._proc.stdout.readline(), timeout)
+        except (asyncio.TimeoutError, TimeoutError):
+            self.kill()
+            raise TimeoutError(f"PowerShell command {command} timed out after {timeout}s") from None
+        except asyncio.CancelledError:
+            # The reply would be read by the next caller instead.
+            self.kill()
+            raise
+        except (BrokenPipeError, ConnectionResetError) as exc:
+            self.kill()
+            raise ConnectionError(f"PowerShell host exited: {exc}") from exc
+        if not raw:
+            self.kill()
+            raise ConnectionError("PowerShell host exited")
+        try:
+            reply = json.loads(raw)
+        except ValueError:
+            self.kill()
+            raise ConnectionError(f"Malformed reply from PowerShell host: {raw[:200]!r}") from None
+        if reply.get("id") != request_id:
+            self.kill()
+            raise ConnectionError(f"PowerShell host answered {reply.get('id')} instead of {request_id}")
+        if not reply.get("ok"):
+            message = reply.get("error") or "PowerShell command failed"
+            if reply.get("kind") == "NotFound":
+                raise LookupError(message)
+            raise PowerShellError(message)
+        return reply.get("result")
+
+    def kill(self) -> None:
+        if self.alive:
+            assert self._proc is not None
+            self._killed = True
+            self._proc.kill()
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Ask the host to exit by closing its stdin, kill it if it does not."""
+        if self._proc is None:
+            return
+        if self._proc.stdin is not None and not self._proc.stdin.is_closing():
+            self._proc.stdin.close()
+        try:
+            await asyncio.wait_for(self._proc.wait(), timeout)
+        except (asyncio.TimeoutError, TimeoutError):
+            self.kill()
+            await self._proc.wait()
+
+
+class PowerShellPool:
+    """Bounded pool of :class:`PowerShellWorker` processes.
+
+    Parameters
+    ----------
+    argv:
+        Command line starting one host.
+    size:
+        Maximum number of hosts running at the same time.
+    max_ops:
+        Commands a host serves before it is replaced.
+    timeout:
+        Seconds a single command may take; ``None`` waits forever.
+    """
+
+    def __init__(self, argv: Sequence[str], size: int = 2, max_ops: int = 500, timeout: float | None = 60.0):
+        if size < 1:
+            raise ValueError("Pool size must be positive")
+        self.argv = list(argv)
+        self.size = size
+        self.max_ops = max_ops
+        self.timeout = timeout
+        self._idle: list[PowerShellWorker] = []
+        self._slots = asyncio.Semaphore(size)
+        self._closed = False
+        self.stats = {"started": 0, "reused": 0, "recycled": 0, "discarded": 0, "timeouts": 0}
+
+    async def _checkout(self) -> PowerShellWorker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.alive:
+                self.stats["reused"] += 1
+                return worker
+            self.stats["discarded"] += 1
+        worker = PowerShellWorker(self.argv)
+        await worker.start()
+        self.stats["started"] += 1
+        return worker
+
+    async def _release(self, worker: PowerShellWorker) -> None:
+        if self._closed or not worker.alive:
+            self.stats["discarded"] += 1
+            await worker.close()
+        elif self.max_ops and worker.ops >= self.max_ops:
+            logging.info("Recycling PowerShell host %s after %d commands", worker.pid, worker.ops)
+            self.stats["recycled"] += 1
+            await worker.close()
+        else:
+            self._idle.append(worker)
+
+    @asynccontextmanager
+    async def worker(self) -> AsyncIterator[PowerShellWorker]:
+        """Borrow a host for the duration of the ``async with`` block."""
+        if self._closed:
+            raise RuntimeError("PowerShell pool is closed")
+        async with self._slots:
+            worker = await self._checkout()
+            try:
+                yield worker
+            finally:
+                await self._release(worker)
+
+    async def run(self, command: str, **args: Any) -> Any:
+        async with self.worker() as worker:
+            try:
+                return await worker.call(command, args, self.timeout)
+            except TimeoutError:
+                self.stats["timeouts"] += 1
+                raise
+
+    async def close(self) -> None:
+        self._closed = True
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(worker.close() for worker in idle))
+
+
+def _to_user(data: dict[str, Any] | None) -> ADUser | None:
+    if not data:
+        return None
+    return ADUser(
+        SamAccountName=data.get("SamAccountName") or "",
+        DisplayName=data.get("DisplayName") or data.get("SamAccountName") or "",
+        DistinguishedName=data.get("DistinguishedName") or "",
+        Enabled=bool(data.get("Enabled")),
+        Mail=data.get("Mail") or "",
+        ObjectGUID=(data.get("ObjectGUID") or "").strip("{}").lower(),
+        EmployeeID=data.get("EmployeeID") or "",
+        TelephoneNumber=data.get("TelephoneNumber") or "",
+        Manager=data.get("Manager") or "",
+    )
+
+
+class PowerShellBackend:
+    """Directory backend running ActiveDirectory cmdlets in pooled hosts.
+
+    Searches send filters from :mod:`ad.filters`, so they use the same
+    indexed terms as :class:`~ad.ldap_backend.LDAPBackend`.
+    """
+
+    def __init__(self, pool: PowerShellPool, substring: bool = False):
+        self.pool = pool
+        self.substring = substring
+
+    @classmethod
+    def from_env(cls) -> "PowerShellBackend":
+        command = os.getenv("AD_PS_COMMAND") or (
+            f"pwsh -NoLogo -NoProfile -NonInteractive -File {shlex.quote(HOST_SCRIPT)}"
+        )
+        pool = PowerShellPool(
+            shlex.split(command),
+            size=int(os.getenv("AD_PS_WORKERS", "2")),
+            max_ops=int(os.getenv("AD_PS_MAX_OPS", "500")),
+            timeout=float(os.getenv("AD_PS_TIMEOUT", "60")) or None,
+        )
+        return cls(pool, substring=os.getenv("AD_SUBSTRING_SEARCH", "0") not in {"0", "false", "no"})
+
+    async def _search(self, search_filter: str, limit: int | None = None) -> list[ADUser]:
+        found = await self.pool.run("search", filter=search_filter, limit=limit or 0)
+        return [user for user in map(_to_user, found or []) if user is not None]
+
+    async def search(self, query: str, limit: int | None = None) -> list[ADUser]:
+        return await self._search(filters.search_filter(query, self.substring), limit)
+
+    async def find(self, identifier: str) -> list[ADUser]:
+        """Users whose mail, employeeID or phone number equals ``identifier``."""
+        search_filter = filters.identifier_filter(identifier)
+        if search_filter is None:
+            return []
+        return [u for u in await self._search(search_filter) if matches(u, identifier)]
+
+    async def get_user(self, sam: str) -> ADUser | None:
+        return _to_user(await self.pool.run("get_user", sam=sam))
+
+    async def get_user_by_guid(self, guid: str) -> ADUser | None:
+        return _to_user(await self.pool.run("get_user_by_guid", guid=guid))
+
+    async def set_password(self, sam: str, password: str) -> None:
+        await self.pool.run("set_password", sam=sam, password=password)
+
+    async def disable(self, sam: str) -> None:
+        await self.pool.run("disable", sam=sam)
+
+    async def close(self) -> None:
+        await self.pool.close()
@@ -0,0 +1,91 @@
+# Long-lived ActiveDirectory command host for ad/powershell.py.
+# Reads one JSON request per line from stdin and answers with one JSON line:
+#   {"id": 1, "command": "disable", "args": {"sam": "..."}}
+#   {"id": 1, "ok": true, "result": null}
+# "search" runs an LDAP filter built by ad/filters.py, so name and identifier
+# lookups behave as with the LDAP backend.
+# With -ComputerName the cmdlets run in one persistent WinRM session to that
+# host instead of locally.
+param(
+    [string]$Server,
+    [string]$ComputerName
+)
+
+$ErrorActionPreference = 'Stop'
+$Properties = @('SamAccountName', 'DisplayName', 'DistinguishedName', 'Enabled', 'mail', 'ObjectGUID', 'employeeID', 'telephoneNumber', 'manager')
+
+if ($ComputerName) {
+    $Session = New-PSSession -ComputerName $ComputerName
+    Invoke-Command -Session $Session -ScriptBlock { Import-Module ActiveDirectory }
+} else {
+    Import-Module ActiveDirectory
+}
+
+function Invoke-AD([scriptblock]$Block, [object[]]$Arguments) {
+    if ($Session) {
+        return Invoke-Command -Session $Session -ScriptBlock $Block -ArgumentList $Arguments
+    }
+    return & $Block @Arguments
+}
+
+function Convert-User($User) {
+    if ($null -eq $User) { return $null }
+    [ordered]@{
+        SamAccountName    = $User.SamAccountName
+        DisplayName       = $User.DisplayName
+        DistinguishedName = $User.DistinguishedName
+        Enabled           = [bool]$User.Enabled
+        Mail              = $User.mail
+        ObjectGUID        = "$($User.ObjectGUID)"
+        EmployeeID        = $User.employeeID
+        TelephoneNumber   = $User.telephoneNumber
+        Manager           = $User.manager
+    }
+}
+
+function Get-ServerArgs {
+    if ($Server) { return @{ Server = $Server } }
+    return @{}
+}
+
+while ($null -ne ($line = [Console]::In.ReadLine())) {
+    $request = $line | ConvertFrom-Json
+    $a = $request.args
+    $srv = Get-ServerArgs
+    try {
+        switch ($request.command) {
+            'search' {
+                # The filter comes from ad/filters.py, already escaped (RFC 4515).
+                $limit = if ($a.limit) { [int]$a.limit } else { 0 }
+                $found = Invoke-AD { param($f, $p, $l, $s) Get-ADUser -LDAPFilter $f -Properties $p -ResultSetSize ($(if ($l) { $l } else { $null })) @s } @($a.filter, $Properties, $limit, $srv)
+                $result = @($found | ForEach-Object { Convert-User $_ })
+            }
+            'get_user' {
+                $found = Invoke-AD { param($sam, $p, $s) Get-ADUser -Filter "SamAccountName -eq '$sam'" -Properties $p @s } @(($a.sam -replace "'", "''"), $Properties, $srv)
+                $result = Convert-User ($found | Select-Object -First 1)
+            }
+            'get_user_by_guid' {
+                $found = Invoke-AD { param($g, $p, $s) try { Get-ADUser -Identity ([guid]$g) -Properties $p @s } catch [Microsoft.ActiveDirectory.Management.ADIdentityNotFoundException] { $null } } @($a.guid, $Properties, $srv)
+                $result = Convert-User $found
+            }
+            'set_password' {
+                Invoke-AD { param($sam, $pwd, $s) Set-ADAccountPassword -Identity $sam -Reset -NewPassword (ConvertTo-SecureString $pwd -AsPlainText -Force) @s } @($a.sam, $a.password, $srv)
+                $result = $null
+            }
+            'disable' {
+                Invoke-AD { param($sam, $s) Disable-ADAccount -Identity $sam @s } @($a.sam, $srv)
+                $result = $null
+            }
+            default { throw "Unknown command $($request.command)" }
+        }
+        $reply = @{ id = $request.id; ok = $true; result = $result }
+    } catch [Microsoft.ActiveDirectory.Management.ADIdentityNotFoundException] {
+        $reply = @{ id = $request.id; ok = $false; kind = 'NotFound'; error = "User $($a.sam) not found" }
+    } catch {
+        $reply = @{ id = $request.id; ok = $false; kind = $_.Exception.GetType().Name; error = $_.Exception.Message }
+    }
+    [Console]::Out.WriteLine(($reply | ConvertTo-Json -Depth 5 -Compress))
+    [Console]::Out.Flush()
+}
+
+if ($Session) { Remove-PSSession $Session }
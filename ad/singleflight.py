@@ -0,0 +1,38 @@
+"""Coalescing of identical concurrent calls ("single-flight").
+
+The first caller for a key starts the real call; everybody asking for the same
+key while it is running awaits that call instead of starting their own.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of ``fn()``, sharing it with concurrent callers of ``key``."""
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["executed"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._forget(key, task))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: one impatient caller being cancelled must not cancel the
+        # lookup the other callers are waiting for.
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
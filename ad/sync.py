@@ -0,0 +1,259 @@
+"""Incremental synchronisation of the local directory index.
+
+A :class:`ChangeFeed` reports the users changed since an opaque cursor (the
+``highWaterMark``).  :class:`DirectorySync` applies those changes to a
+:class:`~ad.index.DirectoryIndex` and persists both the cursor and the
+touched users through the ``load_state``/``save_state`` callables, so after a
+restart the index is restored from the snapshot and only newer changes are
+fetched from the directory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable, Protocol
+
+from .ad_client import ADUser, clear_caches, get_backend, invalidate_org_chart, invalidate_user, set_backend
+from .index import DirectoryIndex, IndexedBackend
+from .ldap_backend import USER_ATTRIBUTES, LDAPBackend, entry_to_user, _first
+
+# Stored with the cursor: snapshots taken with other attributes or ADUser
+# fields lack data and must not be resumed.
+SNAPSHOT_SCHEMA = hashlib.sha1(
+    ",".join(USER_ATTRIBUTES + [f.name for f in fields(ADUser)]).encode()
+).hexdigest()[:12]
+# Batches touching more users than this drop the whole result cache.
+CACHE_CLEAR_THRESHOLD = 100
+SHOW_DELETED_OID = "1.2.840.113556.1.4.417"
+FULL_FILTER = "(&(objectCategory=person)(objectClass=user))"
+# Tombstones lose objectCategory, so incremental queries match on objectClass only.
+DELTA_FILTER = "(&(objectClass=user)(!(objectClass=computer))(uSNChanged>={low})(uSNChanged<={high}))"
+
+
+@dataclass
+class Change:
+    """A changed user; ``user`` is ``None`` when the account was deleted."""
+
+    sam: str
+    user: ADUser | None = None
+
+
+@dataclass
+class ChangeBatch:
+    """Changes up to ``cursor``; ``full`` batches replace the whole index."""
+
+    changes: list[Change]
+    cursor: str
+    full: bool = False
+
+
+class ChangeFeed(Protocol):
+    async def changes(self, cursor: str | None) -> ChangeBatch:
+        """Return changes after ``cursor`` or a full enumeration when it is ``None``."""
+        ...
+
+
+class LDAPChangeFeed:
+    """Change feed reading ``uSNChanged`` from the domain controller.
+
+    USNs are local to a DC, so the cursor is only meaningful while the backend
+    keeps talking to the same server.
+    """
+
+    def __init__(self, backend: LDAPBackend, page_size: int = 500):
+        self.backend = backend
+        self.page_size = page_size
+
+    async def changes(self, cursor: str | None) -> ChangeBatch:
+        return await self.backend.pool.run(self._changes, cursor)
+
+    def _changes(self, conn: Any, cursor: str | None) -> ChangeBatch:
+        conn.search("", "(objectClass=*)", search_scope="BASE", attributes=["highestCommittedUSN"])
+        high = int(_first(conn.response[0]["attributes"]["highestCommittedUSN"]))
+        if cursor is None:
+            search_filter, controls = FULL_FILTER, None
+        else:
+            search_filter = DELTA_FILTER.format(low=int(cursor) + 1, high=high)
+            controls = [(SHOW_DELETED_OID, True, None)]
+        entries = conn.extend.standard.paged_search(
+            self.backend.base_dn,
+            search_filter,
+            attributes=USER_ATTRIBUTES + ["isDeleted"],
+            controls=controls,
+            paged_size=self.page_size,
+            generator=True,
+        )
+        changes = []
+        for entry in entries:
+            if entry.get("type") != "searchResEntry":
+                continue
+            attrs = entry["attributes"]
+            sam = _first(attrs.get("sAMAccountName"))
+            if not sam:
+                continue
+            if _first(attrs.get("isDeleted")):
+                changes.append(Change(sam))
+            else:
+                changes.append(Change(sam, entry_to_user(entry["dn"], attrs)))
+        return ChangeBatch(changes, str(high), full=cursor is None)
+
+
+class DirectorySync:
+    """Keep ``index`` up to date with ``feed``.
+
+    Full batches and snapshot restores build a fresh index in a worker thread
+    and swap it in, so searches keep using the old one meanwhile; incremental
+    batches patch the index in place.  Snapshots are written from a worker
+    thread too.
+
+    Parameters
+    ----------
+    feed:
+        Source of change batches.
+    index:
+        Index patched in place until a full batch replaces it.
+    load_state:
+        Returns ``(cursor, users)`` previously stored by ``save_state``.
+    save_state:
+        ``save_state(cursor, upserts, deletes, full)`` persists one batch.
+        Both are called from a worker thread.
+    interval:
+        Seconds between polls in :meth:`run`.
+    on_ready:
+        Called once the index holds a complete snapshot.
+    on_change:
+        ``on_change(sams, full)`` is called after every applied batch.
+    on_index:
+        Called with the new index whenever it is replaced.
+    """
+
+    def __init__(
+        self,
+        feed: ChangeFeed,
+        index: DirectoryIndex,
+        load_state: Callable[[], tuple[str | None, list[dict]]] | None = None,
+        save_state: Callable[[str, list[dict], list[str], bool], None] | None = None,
+        interval: float = 300,
+        on_ready: Callable[[], None] | None = None,
+        on_change: Callable[[list[str], bool], None] | None = None,
+        on_index: Callable[[DirectoryIndex], None] | None = None,
+    ):
+        self.feed = feed
+        self.index = index
+        self.load_state = load_state
+        self.save_state = save_state
+        self.interval = interval
+        self.on_ready = on_ready
+        self.on_change = on_change
+        self.on_index = on_index
+        self.cursor: str | None = None
+        self.stats = {"batches": 0, "upserts": 0, "deletes": 0, "full": 0}
+
+    def _swap(self, index: DirectoryIndex) -> None:
+        self.index = index
+        if self.on_index is not None:
+            self.on_index(index)
+
+    async def restore(self) -> bool:
+        """Fill the index from the persisted snapshot; ``True`` when a usable cursor was found.
+
+        Snapshots written with other user attributes are ignored, so the next
+        sync enumerates the directory again.
+        """
+        if self.load_state is None:
+            return False
+        stamped, users = await asyncio.to_thread(self.load_state)
+        if stamped is None:
+            return False
+        schema, _, cursor = stamped.rpartition(":")
+        if schema != SNAPSHOT_SCHEMA:
+            logging.info("Directory snapshot has another schema, running a full sync")
+            return False
+        self._swap(await asyncio.to_thread(self.index.rebuilt, [ADUser(**data) for data in users]))
+        self.cursor = cursor
+        logging.info("Restored %d directory users at cursor %s", len(users), cursor)
+        if self.on_ready:
+            self.on_ready()
+        return True
+
+    def _save(self, batch: ChangeBatch) -> None:
+        upserts = [asdict(c.user) for c in batch.changes if c.user is not None]
+        deletes = [c.sam for c in batch.changes if c.user is None]
+        self.save_state(f"{SNAPSHOT_SCHEMA}:{batch.cursor}", upserts, deletes, batch.full)
+
+    async def apply(self, batch: ChangeBatch) -> None:
+        if batch.full:
+            users = [c.user for c in batch.changes if c.user is not None]
+            self._swap(await asyncio.to_thread(self.index.rebuilt, users))
+            self.stats["full"] += 1
+        else:
+            for change in batch.changes:
+                if change.user is None:
+                    self.index.remove(change.sam)
+                else:
+                    self.index.add(change.user)
+            await asyncio.to_thread(self.index.names.warm)
+        if self.save_state is not None:
+            await asyncio.to_thread(self._save, batch)
+        self.cursor = batch.cursor
+        deletes = sum(c.user is None for c in batch.changes)
+        self.stats["batches"] += 1
+        self.stats["upserts"] += len(batch.changes) - deletes
+        self.stats["deletes"] += deletes
+        if self.on_change is not None:
+            self.on_change([c.sam for c in batch.changes], batch.full)
+
+    async def sync_once(self) -> int:
+        """Fetch and apply one batch, returning the number of changes."""
+        first = self.cursor is None
+        batch = await self.feed.changes(self.cursor)
+        await self.apply(batch)
+        if first and self.on_ready:
+            self.on_ready()
+        return len(batch.changes)
+
+    async def run(self) -> None:
+        if self.cursor is None:
+            try:
+                await self.restore()
+            except Exception:
+                logging.exception("Failed to restore the directory snapshot, running a full sync")
+        while True:
+            try:
+                count = await self.sync_once()
+                if count:
+                    logging.info("Directory sync applied %d changes", count)
+            except Exception:
+                logging.exception("Directory sync error")
+            await asyncio.sleep(self.interval)
+
+
+def enable_sync(feed: ChangeFeed, **kwargs: Any) -> DirectorySync:
+    """Put a local index in front of the current backend and return its syncer.
+
+    The caller is responsible for scheduling :meth:`DirectorySync.run`.
+    """
+    backend = IndexedBackend(get_backend())
+
+    def ready() -> None:
+        backend.ready = True
+        clear_caches()
+
+    def changed(sams: list[str], full: bool) -> None:
+        if full or len(sams) > CACHE_CLEAR_THRESHOLD:
+            clear_caches()
+        else:
+            for sam in sams:
+                invalidate_user(sam)
+            if sams:
+                invalidate_org_chart()
+
+    def swapped(index: DirectoryIndex) -> None:
+        backend.index = index
+
+    sync = DirectorySync(feed, backend.index, on_ready=ready, on_change=changed, on_index=swapped, **kwargs)
+    set_backend(backend)
+    return sync
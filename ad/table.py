@@ -0,0 +1,169 @@
+"""Columnar storage for large directory snapshots.
+
+Keeping hundreds of thousands of :class:`ADUser` objects alive costs an object
+header plus a pointer per field for every user.  :class:`UserTable` keeps one
+list per field instead, stores the ``Enabled`` flags in a bitset and splits
+distinguished names into the leaf RDN and an interned parent path, since most
+users share a handful of ``OU=...,DC=...`` suffixes.  Rows are handed out as
+regular (immutable) :class:`ADUser` objects built on access.
+"""
+
+from __future__ import annotations
+
+from array import array
+from dataclasses import fields
+from typing import Iterator
+
+from .ad_client import ADUser
+
+FLAG_FIELDS = ("Enabled",)
+DN_FIELDS = ("DistinguishedName", "Manager")
+
+
+def split_dn(dn: str) -> tuple[str, str]:
+    """Split ``dn`` into its first RDN and the parent DN, honouring ``\\,`` escapes."""
+    escaped = False
+    for i, ch in enumerate(dn):
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == ",":
+            return dn[:i], dn[i + 1 :]
+    return dn, ""
+
+
+class UserTable:
+    """Append-only-with-reuse table of users addressed by integer row ids."""
+
+    def __init__(self):
+        self._fields = [f.name for f in fields(ADUser)]
+        self._columns: dict[str, list] = {
+            name: [] for name in self._fields if name not in FLAG_FIELDS and name not in DN_FIELDS
+        }
+        self._rdn: dict[str, list[str]] = {name: [] for name in DN_FIELDS}
+        self._parent: dict[str, array] = {name: array("I") for name in DN_FIELDS}
+        self._flags: dict[str, bytearray] = {name: bytearray() for name in FLAG_FIELDS}
+        # Path 0 is the empty parent of blank DNs (users without a manager).
+        self._paths: list[str] = [""]
+        self._path_ids: dict[str, int] = {"": 0}
+        self._live = bytearray()
+        self._free: list[int] = []
+        self._rows = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def copy(self) -> UserTable:
+        """Independent copy; copies whole columns, so it is cheap even for 100k rows."""
+        table = UserTable.__new__(UserTable)
+        table._fields = self._fields
+        table._columns = {name: column[:] for name, column in self._columns.items()}
+        table._rdn = {name: column[:] for name, column in self._rdn.items()}
+        table._parent = {name: column[:] for name, column in self._parent.items()}
+        table._flags = {name: bytearray(bits) for name, bits in self._flags.items()}
+        table._paths = self._paths[:]
+        table._path_ids = dict(self._path_ids)
+        table._live = bytearray(self._live)
+        table._free = self._free[:]
+        table._rows = self._rows
+        table._count = self._count
+        return table
+
+    @property
+    def paths(self) -> int:
+        """Number of distinct parent DNs stored."""
+        return len(self._paths) - 1
+
+    def _path_id(self, path: str) -> int:
+        pid = self._path_ids.get(path)
+        if pid is None:
+            pid = self._path_ids[path] = len(self._paths)
+            self._paths.append(path)
+        return pid
+
+    @staticmethod
+    def _get_bit(bits: bytearray, row: int) -> bool:
+        return bool(bits[row >> 3] & (1 << (row & 7)))
+
+    @staticmethod
+    def _set_bit(bits: bytearray, row: int, value: bool) -> None:
+        if value:
+            bits[row >> 3] |= 1 << (row & 7)
+        else:
+            bits[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+
+    def _store(self, row: int, user: ADUser) -> None:
+        for name, column in self._columns.items():
+            column[row] = getattr(user, name)
+        for name in DN_FIELDS:
+            rdn, parent = split_dn(getattr(user, name) or "")
+            self._rdn[name][row] = rdn
+            self._parent[name][row] = self._path_id(parent)
+        for name, bits in self._flags.items():
+            self._set_bit(bits, row, getattr(user, name))
+        self._set_bit(self._live, row, True)
+
+    def append(self, user: ADUser) -> int:
+        """Store ``user`` and return its row id (ids of deleted rows are reused)."""
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = self._rows
+            self._rows += 1
+            for column in self._columns.values():
+                column.append(None)
+            for name in DN_FIELDS:
+                self._rdn[name].append("")
+                self._parent[name].append(0)
+            if row & 7 == 0:
+                for bits in self._flags.values():
+                    bits.append(0)
+                self._live.append(0)
+        self._store(row, user)
+        self._count += 1
+        return row
+
+    def update(self, row: int, user: ADUser) -> None:
+        self._check(row)
+        self._store(row, user)
+
+    def delete(self, row: int) -> None:
+        self._check(row)
+        self._set_bit(self._live, row, False)
+        for column in self._columns.values():
+            column[row] = None
+        self._free.append(row)
+        self._count -= 1
+
+    def _check(self, row: int) -> None:
+        if not 0 <= row < self._rows or not self._get_bit(self._live, row):
+            raise IndexError(f"No user at row {row}")
+
+    def __contains__(self, row: int) -> bool:
+        return 0 <= row < self._rows and self._get_bit(self._live, row)
+
+    def enabled(self, row: int) -> bool:
+        self._check(row)
+        return self._get_bit(self._flags["Enabled"], row)
+
+    def distinguished_name(self, row: int, name: str = "DistinguishedName") -> str:
+        rdn = self._rdn[name][row]
+        parent = self._paths[self._parent[name][row]]
+        return f"{rdn},{parent}" if parent else rdn
+
+    def __getitem__(self, row: int) -> ADUser:
+        self._check(row)
+        values = {name: column[row] for name, column in self._columns.items()}
+        for name in DN_FIELDS:
+            values[name] = self.distinguished_name(row, name)
+        for name, bits in self._flags.items():
+            values[name] = self._get_bit(bits, row)
+        return ADUser(**values)
+
+    def rows(self) -> Iterator[int]:
+        return (row for row in range(self._rows) if self._get_bit(self._live, row))
+
+    def __iter__(self) -> Iterator[ADUser]:
+        return (self[row] for row in self.rows())
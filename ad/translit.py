@@ -0,0 +1,54 @@
+"""Transliteration of Cyrillic names into Latin script.
+
+Besides the passport tables this module knows the standard Russian (ЙЦУКЕН)
+and US (QWERTY) keyboard layouts, so text typed with the wrong layout active
+("Ecnbyjdf" for "Устинова") can be mapped back.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+# ICAO Doc 9303 (Russian passports since 2013).
+ICAO = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "ie", "ы": "y", "ь": "", "э": "e", "ю": "iu",
+    "я": "ia",
+}
+
+# GOST 7.79-2000 system B without the apostrophes, which never survive typing.
+GOST = {
+    **ICAO,
+    "ё": "yo", "й": "j", "х": "x", "ц": "cz", "щ": "shh", "ъ": "", "ы": "y", "ю": "yu",
+    "я": "ya",
+}
+
+# Pre-2010 passport rules; the spelling most people still use for themselves.
+PASSPORT_1997 = {**ICAO, "й": "y", "ъ": "", "ю": "yu", "я": "ya"}
+
+TABLES = (ICAO, GOST, PASSPORT_1997)
+
+_RU_KEYS = "ёйцукенгшщзхъфывапролджэячсмитьбю"
+_EN_KEYS = "`qwertyuiop[]asdfghjkl;'zxcvbnm,."
+LAYOUT = {**dict(zip(_RU_KEYS, _EN_KEYS)), **dict(zip(_EN_KEYS, _RU_KEYS))}
+
+
+def transliterate(text: str, table: dict[str, str] = ICAO) -> str:
+    """Transliterate lowercased ``text``; characters missing from ``table`` are kept."""
+    return "".join(table.get(ch, ch) for ch in text.lower())
+
+
+def swap_layout(text: str) -> str:
+    """Retype lowercased ``text`` on the other keyboard layout (both directions)."""
+    return "".join(LAYOUT.get(ch, ch) for ch in text.lower())
+
+
+@lru_cache(maxsize=65536)
+def spelling_variants(token: str) -> frozenset[str]:
+    """Transliterations and the wrong-layout spelling of ``token``, without ``token`` itself."""
+    variants = {transliterate(token, table) for table in TABLES}
+    variants.add(swap_layout(token))
+    variants.discard(token)
+    return frozenset(variants)
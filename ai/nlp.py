@@ -8,25 +8,101 @@ from __future__ import annotations
 
 import email.message
 import re
+import threading
 from datetime import datetime
-from typing import List, Tuple
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
 
-from dateparser.search import search_dates
+# dateparser takes about half a second to import and more to load its
+# locale data; interactive commands never need it, so it is loaded on first
+# use (or by :func:`warm_up` in the background).
+_search_dates: Callable[..., Any] | None = None
+_dateparser_lock = threading.Lock()
+
+
+def search_dates(text: str, **kwargs: Any) -> Any:
+    """``dateparser.search.search_dates``, imported on first use."""
+
+    global _search_dates
+    if _search_dates is None:
+        with _dateparser_lock:
+            if _search_dates is None:
+                from dateparser.search import search_dates as impl
+
+                _search_dates = impl
+    return _search_dates(text, **kwargs)
+
+
+def warm_up() -> None:
+    """Import dateparser and load its Russian data; meant for a worker thread."""
+
+    search_dates("уволить 1 января", languages=["ru"])
 
 
 ALIASES = {
     "reset password": "reset",
     "reset": "reset",
+    "сбросить пароль": "reset",
+    "сброс пароля": "reset",
+    "сброс": "reset",
     "schedule block": "disable",
     "block": "disable",
     "disable": "disable",
+    "заблокировать": "disable",
+    "блокировать": "disable",
+    "отключить": "disable",
     "list jobs": "jobs",
     "jobs": "jobs",
+    "список задач": "jobs",
+    "задачи": "jobs",
     "admin menu": "admin",
     "admin": "admin",
+    "меню администратора": "admin",
+    "админ": "admin",
+    "menu": "menu",
+    "меню": "menu",
+    "help": "help",
+    "помощь": "help",
 }
 
 
+def _normalize_alias(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def _trie_pattern(node: dict) -> str:
+    alternatives = [
+        (r"\s+" if char == " " else re.escape(char)) + _trie_pattern(child)
+        for char, child in node.items()
+        if char
+    ]
+    if not alternatives:
+        return ""
+    body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    return f"(?:{body})?" if "" in node else body
+
+
+def compile_aliases(aliases: Iterable[str]) -> re.Pattern[str]:
+    """Build one regex matching the longest alias at the start of a message.
+
+    The aliases are folded into a character trie, so the regex walks shared
+    prefixes once and its cost depends on the message, not on the number of
+    aliases.  An alias must end at a word boundary ("resetting" is not
+    "reset"); words of multi-word aliases may be separated by any whitespace.
+    """
+
+    trie: dict = {}
+    for alias in aliases:
+        node = trie
+        for char in _normalize_alias(alias):
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return re.compile(rf"\s*({_trie_pattern(trie)})(?!\w)", re.IGNORECASE)
+
+
+_ALIAS_RE = compile_aliases(ALIASES)
+_ALIAS_COMMANDS = {_normalize_alias(a): cmd for a, cmd in ALIASES.items()}
+
+
 def parse_command(text: str) -> Tuple[str, List[str]]:
     """Parse plain or button text into a command and list of arguments.
 
@@ -34,7 +110,7 @@ def parse_command(text: str) -> Tuple[str, List[str]]:
     ----------
     text:
         Incoming message text.  It can be either a human typed command or the
-        label from one of the reply buttons.
+        label from one of the reply buttons, in English or Russian.
 
     Returns
     -------
@@ -44,31 +120,23 @@ def parse_command(text: str) -> Tuple[str, List[str]]:
         * args -- list of arguments following the command.
     """
 
-    cleaned = text.strip().lower()
-    for alias, cmd in ALIASES.items():
-        if cleaned.startswith(alias):
-            rest = text[len(alias) :].strip()
-            args = rest.split() if rest else []
-            return cmd, args
-    return "", [text]
+    match = _ALIAS_RE.match(text)
+    if match is None:
+        return "", [text]
+    return _ALIAS_COMMANDS[_normalize_alias(match.group(1))], text[match.end() :].split()
 
 
-def parse_hr_mail(msg: email.message.Message) -> tuple[str | None, datetime | None]:
-    """Extract employee name and dismissal date from an HR e-mail.
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+EMPLOYEE_ID_RE = re.compile(
+    r"(?:табельн\w*\s+(?:номер\w*|№)|таб\.?\s*№|employee\s*id)\s*[:#№]?\s*([a-z]{0,3}-?\d{3,12})\b",
+    re.IGNORECASE,
+)
+PHONE_RE = re.compile(r"(?<!\d)(?:\+7|8)[\s(-]*\d{3}[\s)-]*\d{3}[\s-]*\d{2}[\s-]*\d{2}(?!\d)")
 
-    Parameters
-    ----------
-    msg:
-        ``email.message.Message`` instance representing the incoming e-mail.
 
-    Returns
-    -------
-    tuple(fio, date)
-        * fio -- extracted full name or ``None`` when not found.
-        * date -- parsed ``datetime`` object or ``None`` when not found.
-    """
+def message_text(msg: email.message.Message) -> str:
+    """Return the concatenated ``text/plain`` parts of ``msg``."""
 
-    # Extract plain text payload from the message
     parts: List[str] = []
     if msg.is_multipart():
         for part in msg.walk():
@@ -83,26 +151,227 @@ def parse_hr_mail(msg: email.message.Message) -> tuple[str | None, datetime | No
             parts.append(payload.decode(msg.get_content_charset() or "utf-8", errors="ignore"))
         elif isinstance(payload, str):
             parts.append(payload)
+    return "\n".join(parts)
+
+
+def extract_identifiers(text: str, exclude: Iterable[str] = ()) -> List[str]:
+    """Find mail addresses, personnel numbers and phone numbers in ``text``.
+
+    Values in ``exclude`` (e.g. the sender's own address) are skipped.
+    Personnel numbers are only recognised after a label such as "таб. №".
+    """
+
+    skip = {e.lower() for e in exclude}
+    found = EMPLOYEE_ID_RE.findall(text) + EMAIL_RE.findall(text) + PHONE_RE.findall(text)
+    return [v for v in dict.fromkeys(f.strip() for f in found) if v.lower() not in skip]
+
+
+MONTHS = {
+    name: number
+    for number, name in enumerate(
+        (
+            "января",
+            "февраля",
+            "марта",
+            "апреля",
+            "мая",
+            "июня",
+            "июля",
+            "августа",
+            "сентября",
+            "октября",
+            "ноября",
+            "декабря",
+        ),
+        start=1,
+    )
+}
+DATE_RE = re.compile(
+    rf"(?<!\d)(\d{{1,2}})(?:\s+({'|'.join(MONTHS)})\s+|\.(\d{{1,2}})\.)(\d{{4}})(?!\d)",
+    re.IGNORECASE,
+)
+
+
+def _fast_date(text: str) -> datetime | None:
+    """First "1 июля 2024" or "01.07.2024" style date in ``text``."""
+
+    for match in DATE_RE.finditer(text):
+        day, month_name, month, year = match.groups()
+        try:
+            return datetime(int(year), MONTHS[month_name.lower()] if month_name else int(month), int(day))
+        except ValueError:
+            continue
+    return None
+
+
+# Three capitalised Cyrillic words: surname, name, patronymic.
+FIO_RE = re.compile(r"([А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+)")
+# "Устинову Н.П." or "Н.П. Устинову".
+SURNAME_RE = re.compile(
+    r"\b([А-ЯЁ][а-яё]{2,})\s+[А-ЯЁ]\.\s?[А-ЯЁ]\.|\b[А-ЯЁ]\.\s?[А-ЯЁ]\.\s?([А-ЯЁ][а-яё]{2,})"
+)
+# First line of a signature block; contacts below it are the sender's own.
+SIGNATURE_RE = re.compile(
+    r"^\s*(?:--\s*$|с\s+уважением|с\s+наилучшими|best\s+regards|kind\s+regards|regards\b|отдел\s+кадров|hr\s*:)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def strip_signature(text: str) -> str:
+    """``text`` up to the signature block, if one is recognised."""
+
+    match = SIGNATURE_RE.search(text)
+    return text[: match.start()] if match else text
+
+
+def mentioned_surname(text: str) -> str | None:
+    """Surname of the person a mail names, as written (possibly inflected).
 
-    body = "\n".join(parts)
+    Taken from a full FIO or from a surname with initials; ``None`` when the
+    mail names nobody.
+    """
 
-    # Extract FIO (full name) - three capitalized words
-    fio: str | None = None
-    match = re.search(r"([А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+)", body)
+    match = FIO_RE.search(text)
+    if match:
+        return match.group(1).split()[0]
+    match = SURNAME_RE.search(strip_signature(text))
     if match:
-        fio = match.group(1).strip()
+        return match.group(1) or match.group(2)
+    return None
+
+
+# Confidence of a parse: an explicit full date is trusted more than whatever
+# dateparser finds in running text ("завтра", "в пятницу"); a FIO adds to it.
+EXPLICIT_DATE_CONFIDENCE = 0.6
+FALLBACK_DATE_CONFIDENCE = 0.3
+FIO_CONFIDENCE = 0.4
+
+
+class HRMailParser:
+    """Extract the employee and dismissal date from HR mails.
+
+    One instance holds the configuration (languages and a prebuilt
+    ``dateparser`` settings object) and is reused for every mail, so long
+    runs do not rebuild it per message.
+
+    Parameters
+    ----------
+    languages:
+        Languages passed to ``dateparser`` for the fallback search.
+    settings:
+        ``dateparser`` settings overrides, e.g. ``{"PREFER_DATES_FROM": "future"}``.
+    """
+
+    def __init__(self, languages: Iterable[str] = ("ru",), settings: dict[str, Any] | None = None):
+        self.languages = list(languages)
+        self._overrides = settings
+        self._settings: Any = None
+
+    def _date_settings(self) -> Any:
+        if self._settings is None and self._overrides:
+            from dateparser.conf import settings as defaults
+
+            self._settings = defaults.replace(**self._overrides)
+        return self._settings
+
+    def find_date(self, text: str) -> tuple[datetime | None, float]:
+        """First date mentioned in ``text`` and the confidence it carries.
+
+        Full dates in the usual Russian forms are recognised by
+        :data:`DATE_RE`; only texts without one are handed to ``dateparser``,
+        which is orders of magnitude slower.
+        """
+
+        date = _fast_date(text)
+        if date is not None:
+            return date, EXPLICIT_DATE_CONFIDENCE
+        try:
+            found = search_dates(text, languages=self.languages, settings=self._date_settings())
+        except Exception:
+            found = None
+        if not found:
+            return None, 0.0
+        return found[0][1], FALLBACK_DATE_CONFIDENCE
+
+    def parse(self, msg: email.message.Message) -> tuple[str | None, datetime | None, float]:
+        """Return ``(fio, date, confidence)`` for one mail; confidence is 0 without a date."""
+
+        body = message_text(msg)
+        match = FIO_RE.search(body)
+        fio = match.group(1) if match else None
+        date, confidence = self.find_date(body)
+        if date is not None and fio:
+            confidence += FIO_CONFIDENCE
+        return fio, date, round(confidence, 2)
+
+
+_parser = HRMailParser()
+
+
+def find_date(text: str) -> datetime | None:
+    """Return the first date mentioned in ``text`` (see :meth:`HRMailParser.find_date`)."""
+
+    return _parser.find_date(text)[0]
 
-    # Extract first date occurrence using dateparser
-    date: datetime | None = None
-    try:
-        found = search_dates(body, languages=["ru"])
-    except Exception:
-        found = None
-    if found:
-        date = found[0][1]
 
+def parse_hr_mail(msg: email.message.Message) -> tuple[str | None, datetime | None]:
+    """Extract employee name and dismissal date from an HR e-mail.
+
+    Parameters
+    ----------
+    msg:
+        ``email.message.Message`` instance representing the incoming e-mail.
+
+    Returns
+    -------
+    tuple(fio, date)
+        * fio -- extracted full name or ``None`` when not found.
+        * date -- parsed ``datetime`` object or ``None`` when not found.
+    """
+
+    fio, date, _confidence = _parser.parse(msg)
     return fio, date
 
 
-__all__ = ["parse_command", "parse_hr_mail"]
+def parse_hr_mail_bytes(raw: bytes) -> tuple[str | None, datetime | None]:
+    """:func:`parse_hr_mail` for a raw RFC 822 message, e.g. in a worker process."""
+
+    return parse_hr_mail(email.message_from_bytes(raw))
+
+
+def parse_hr_mails(
+    messages: Iterable[email.message.Message | bytes],
+    parser: HRMailParser | None = None,
+) -> Iterator[tuple[str | None, str | None, datetime | None, float]]:
+    """Parse many HR mails with one shared :class:`HRMailParser`.
+
+    ``messages`` may mix ``Message`` objects and raw RFC 822 bytes and is
+    consumed lazily; results are yielded as they are ready.
+
+    Yields
+    ------
+    tuple(message_id, fio, date, confidence)
+        ``message_id`` is the ``Message-ID`` header or ``None``.
+    """
+
+    parser = parser if parser is not None else _parser
+    for item in messages:
+        msg = email.message_from_bytes(item) if isinstance(item, (bytes, bytearray)) else item
+        fio, date, confidence = parser.parse(msg)
+        yield msg.get("Message-ID"), fio, date, confidence
+
+
+__all__ = [
+    "parse_command",
+    "parse_hr_mail",
+    "parse_hr_mail_bytes",
+    "parse_hr_mails",
+    "HRMailParser",
+    "find_date",
+    "message_text",
+    "extract_identifiers",
+    "strip_signature",
+    "mentioned_surname",
+    "warm_up",
+]
 
@@ -0,0 +1 @@
+"""Benchmarks runnable against the synthetic directory (``ad.fake``)."""
@@ -0,0 +1,129 @@
+"""Benchmarks for directory search, caching and bulk operations.
+
+Runs entirely against :class:`ad.fake.MemoryBackend`, no domain controller is
+needed::
+
+    python -m benchmarks.bench_ad --users 100000 --latency 0.005
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+
+import ad.ad_client as ad_client
+from ad.fake import MemoryBackend, generate_users
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(name: str, timings: list[float]) -> None:
+    print(
+        f"{name:<28} n={len(timings):<6} "
+        f"p50={percentile(timings, 50) * 1000:8.3f}ms "
+        f"p99={percentile(timings, 99) * 1000:8.3f}ms "
+        f"max={max(timings) * 1000:8.3f}ms"
+    )
+
+
+def make_queries(backend: MemoryBackend, count: int, seed: int) -> list[str]:
+    rnd = random.Random(seed)
+    users = list(backend.index)
+    queries = []
+    for _ in range(count):
+        user = rnd.choice(users)
+        surname, name, _patronymic = user.DisplayName.split()
+        queries.append(rnd.choice([surname, f"{surname} {name}", surname[:4], user.SamAccountName]))
+    return queries
+
+
+def bench_index(backend: MemoryBackend, queries: list[str]) -> None:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        backend.index.search(query, limit=11)
+        timings.append(time.perf_counter() - started)
+    report("index.search (top 11)", timings)
+
+
+# Type-ahead sends every letter; one or two of them must not scan the index.
+SHORT_QUERY_BUDGET = 0.001
+
+
+def bench_short_queries(backend: MemoryBackend, queries: list[str]) -> None:
+    for length in (1, 2):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            backend.index.search(query[:length], limit=11)
+            timings.append(time.perf_counter() - started)
+        report(f"index.search ({length} char)", timings)
+        p99 = percentile(timings, 99)
+        assert p99 < SHORT_QUERY_BUDGET, f"{length} character queries took {p99 * 1000:.1f}ms at p99"
+
+
+async def bench_search_candidates(backend: MemoryBackend, queries: list[str], latency: float) -> None:
+    backend.latency = latency
+    ad_client.set_backend(backend)
+    for label in ("search_candidates cold", "search_candidates warm"):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            await ad_client.search_candidates(query, limit=11)
+            timings.append(time.perf_counter() - started)
+        report(label, timings)
+
+    ad_client.clear_caches()
+    before = backend.calls["search"]
+    started = time.perf_counter()
+    await asyncio.gather(*(ad_client.search_candidates(queries[i % 10], limit=11) for i in range(1000)))
+    elapsed = time.perf_counter() - started
+    print(f"{'burst of 1000 (10 distinct)':<28} {elapsed * 1000:8.1f}ms, backend calls={backend.calls['search'] - before}")
+    print(f"{'cache/coalescing stats':<28} {ad_client.cache_stats()}")
+
+
+async def bench_bulk(backend: MemoryBackend, count: int, latency: float) -> None:
+    backend.latency = latency
+    sams = [u.SamAccountName for u in list(backend.index)[:count]]
+    for concurrency in (1, 8, 32):
+        started = time.perf_counter()
+        report_ = await ad_client.disable_users(sams, concurrency=concurrency)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{'disable_users c=' + str(concurrency):<28} {len(sams)} accounts in {elapsed:6.2f}s "
+            f"({len(sams) / elapsed:8.1f}/s, failed={len(report_.failed)})"
+        )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000, help="directory size, e.g. 10000/100000/1000000")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.002, help="injected backend latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--bulk", type=int, default=300, help="accounts disabled in the bulk benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    backend = MemoryBackend(generate_users(args.users, seed=args.seed), error_rate=args.error_rate, seed=args.seed)
+    print(f"{'build index':<28} {args.users} users in {time.perf_counter() - started:6.2f}s")
+
+    queries = make_queries(backend, args.queries, args.seed)
+    bench_index(backend, queries)
+    bench_short_queries(backend, queries)
+    previous = ad_client.get_backend()
+    try:
+        asyncio.run(bench_search_candidates(backend, queries, args.latency))
+        asyncio.run(bench_bulk(backend, args.bulk, args.latency))
+    finally:
+        ad_client.set_backend(previous)
+
+
+if __name__ == "__main__":
+    main()
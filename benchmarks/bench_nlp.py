@@ -0,0 +1,127 @@
+"""Micro-benchmarks of message parsing.
+
+``parse_command`` runs on every free text update: the trie-shaped alias regex
+is compared with the previous linear ``startswith`` scan for the shipped
+aliases and for synthetic alias tables of growing size.  HR mail parsing is
+measured as backlog throughput of ``parse_hr_mails``::
+
+    python -m benchmarks.bench_nlp --messages 20000 --mails 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Callable
+
+from email.message import EmailMessage
+
+from ai.nlp import ALIASES, compile_aliases, parse_hr_mails, warm_up
+
+SAMPLES = [
+    "Reset Password",
+    "reset ivanov",
+    "Сбросить пароль Устинова",
+    "Schedule Block",
+    "заблокировать petrov",
+    "List Jobs",
+    "Admin Menu",
+    "привет, как дела?",
+    "Иванов Иван Иванович",
+]
+
+
+def linear_parser(aliases: dict[str, str]) -> Callable[[str], tuple[str, list[str]]]:
+    def parse(text: str) -> tuple[str, list[str]]:
+        cleaned = text.strip().lower()
+        for alias, cmd in aliases.items():
+            if cleaned.startswith(alias):
+                return cmd, cleaned[len(alias) :].split()
+        return "", [text]
+
+    return parse
+
+
+def regex_parser(aliases: dict[str, str]) -> Callable[[str], tuple[str, list[str]]]:
+    pattern = compile_aliases(aliases)
+
+    def parse(text: str) -> tuple[str, list[str]]:
+        match = pattern.match(text)
+        if match is None:
+            return "", [text]
+        return aliases[" ".join(match.group(1).split()).lower()], text[match.end() :].split()
+
+    return parse
+
+
+def synthetic_aliases(count: int, seed: int) -> dict[str, str]:
+    rnd = random.Random(seed)
+    aliases = dict(ALIASES)
+    letters = "abcdefghijklmnopqrstuvwxyzабвгдежзиклмнопрстуфхцчшщэюя"
+    while len(aliases) < count:
+        words = ["".join(rnd.choices(letters, k=rnd.randint(3, 9))) for _ in range(rnd.randint(1, 3))]
+        aliases[" ".join(words)] = f"cmd{len(aliases)}"
+    return aliases
+
+
+def bench(label: str, parse: Callable[[str], object], messages: list[str]) -> None:
+    started = time.perf_counter()
+    for message in messages:
+        parse(message)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed / len(messages) * 1e6:8.2f}us/message")
+
+
+MAIL_BODIES = [
+    "Просьба уволить {fio} {day} июля 2024 г.",
+    "Прошу заблокировать учётную запись {fio} с {day:02d}.07.2024",
+    "Последний рабочий день {fio} завтра, просьба отключить доступ",
+]
+NAMES = ["Иванов Иван Иванович", "Устинова Наталья Викторовна", "Петров Петр Петрович"]
+
+
+def make_mails(count: int, seed: int) -> list[bytes]:
+    rnd = random.Random(seed)
+    mails = []
+    for number in range(count):
+        msg = EmailMessage()
+        msg["Message-ID"] = f"<{number}@hr.local>"
+        msg.set_content(rnd.choice(MAIL_BODIES).format(fio=rnd.choice(NAMES), day=rnd.randint(1, 28)))
+        mails.append(msg.as_bytes())
+    return mails
+
+
+def bench_mails(count: int, seed: int) -> None:
+    mails = make_mails(count, seed)
+    started = time.perf_counter()
+    warm_up()
+    print(f"{'dateparser warm-up':<28} {(time.perf_counter() - started) * 1000:8.1f}ms")
+    started = time.perf_counter()
+    fallback = sum(1 for *_rest, confidence in parse_hr_mails(mails) if confidence < 1.0)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{'parse_hr_mails':<28} {count} mails in {elapsed:6.2f}s "
+        f"({count / elapsed:8.1f}/s, {fallback} via dateparser)"
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--mails", type=int, default=300, help="HR mails in the backlog benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(args.seed)
+    messages = [rnd.choice(SAMPLES) for _ in range(args.messages)]
+    for count in (len(ALIASES), 100, 1000):
+        aliases = synthetic_aliases(count, args.seed)
+        bench(f"linear scan, {count} aliases", linear_parser(aliases), messages)
+        bench(f"trie regex, {count} aliases", regex_parser(aliases), messages)
+    if args.mails:
+        bench_mails(args.mails, args.seed)
+
+
+if __name__ == "__main__":
+    main()
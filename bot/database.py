@@ -1,5 +1,6 @@
-import sqlite3, json, os
+import sqlite3, json, os, threading
 from datetime import datetime
+from typing import Callable
 from zoneinfo import ZoneInfo
 
 TZ = ZoneInfo(os.getenv("TIMEZONE", "Europe/Berlin"))
@@ -23,9 +24,29 @@ CREATE TABLE IF NOT EXISTS audit_logs (
     target TEXT,
     details TEXT
 );
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    cursor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS directory_users (
+    source TEXT NOT NULL,
+    sam TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (source, sam)
+);
+CREATE TABLE IF NOT EXISTS ad_accounts (
+    user_id INTEGER PRIMARY KEY,
+    sam TEXT NOT NULL,
+    dn TEXT NOT NULL
+);
 """
 
 DB: sqlite3.Connection | None = None
+# The directory snapshot is read and written from sync worker threads.
+_SYNC_DB: sqlite3.Connection | None = None
+_sync_lock = threading.Lock()
+# ``check(dn) -> bool`` granting admin rights by AD group membership.
+_group_check: Callable[[str], bool] | None = None
 
 def init_db():
     global DB
@@ -40,12 +61,44 @@ def _ensure_db() -> sqlite3.Connection:
         raise RuntimeError("Database is not initialized. Call init_db() first.")
     return DB
 
+def set_group_check(check: Callable[[str], bool] | None) -> None:
+    """Also treat users whose linked AD account passes ``check`` as admins."""
+    global _group_check
+    _group_check = check
+
+
 def is_admin(uid: int) -> bool:
     db = _ensure_db()
     if uid == SUPERADMIN_ID:
         return True
     cur = db.execute("SELECT 1 FROM admins WHERE user_id=?", (uid,))
-    return cur.fetchone() is not None
+    if cur.fetchone() is not None:
+        return True
+    if _group_check is None:
+        return False
+    account = get_account(uid)
+    return account is not None and _group_check(account[1])
+
+
+def link_account(uid: int, sam: str, dn: str, actor: int | None = None) -> None:
+    """Map Telegram user ``uid`` to the AD account ``sam``/``dn``."""
+    db = _ensure_db()
+    db.execute("INSERT OR REPLACE INTO ad_accounts (user_id, sam, dn) VALUES (?, ?, ?)", (uid, sam, dn))
+    audit(actor, "link_account", target=str(uid), details={"sam": sam})
+
+
+def unlink_account(uid: int, actor: int | None = None) -> bool:
+    db = _ensure_db()
+    cur = db.execute("DELETE FROM ad_accounts WHERE user_id=?", (uid,))
+    audit(actor, "unlink_account", target=str(uid))
+    return cur.rowcount > 0
+
+
+def get_account(uid: int) -> tuple[str, str] | None:
+    """Return ``(sam, dn)`` of the AD account linked to ``uid``."""
+    db = _ensure_db()
+    row = db.execute("SELECT sam, dn FROM ad_accounts WHERE user_id=?", (uid,)).fetchone()
+    return (row[0], row[1]) if row else None
 
 
 def audit(user_id: int | None, action: str, target: str | None = None, details: str | None = None) -> None:
@@ -78,3 +131,46 @@ def list_admins(actor: int | None = None) -> list[int]:
     rows = [r[0] for r in cur.fetchall()]
     audit(actor, "list_admins")
     return rows
+
+
+def _sync_db() -> sqlite3.Connection:
+    """Own connection for the sync tables, so its transactions never mix with ``DB``."""
+    global _SYNC_DB
+    _ensure_db()
+    if _SYNC_DB is None:
+        _SYNC_DB = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _SYNC_DB.executescript(SCHEMA)
+    return _SYNC_DB
+
+
+def load_sync_state(name: str) -> tuple[str | None, list[dict]]:
+    """Return the stored sync cursor and directory snapshot for ``name``.
+
+    Safe to call from a worker thread.
+    """
+    with _sync_lock:
+        db = _sync_db()
+        row = db.execute("SELECT cursor FROM sync_state WHERE name=?", (name,)).fetchone()
+        if row is None:
+            return None, []
+        cur = db.execute("SELECT data FROM directory_users WHERE source=?", (name,))
+        return row[0], [json.loads(r[0]) for r in cur.fetchall()]
+
+
+def save_sync_state(name: str, cursor: str, upserts: list[dict], deletes: list[str], full: bool = False) -> None:
+    """Persist one applied change batch together with the new cursor.
+
+    Safe to call from a worker thread.
+    """
+    with _sync_lock, _sync_db() as db:
+        if full:
+            db.execute("DELETE FROM directory_users WHERE source=?", (name,))
+        db.executemany(
+            "INSERT OR REPLACE INTO directory_users (source, sam, data) VALUES (?, ?, ?)",
+            [(name, u["SamAccountName"].lower(), json.dumps(u)) for u in upserts],
+        )
+        db.executemany(
+            "DELETE FROM directory_users WHERE source=? AND sam=?",
+            [(name, sam.lower()) for sam in deletes],
+        )
+        db.execute("INSERT OR REPLACE INTO sync_state (name, cursor) VALUES (?, ?)", (name, cursor))
@@ -1,3 +1,7 @@
+import logging
+import re
+from datetime import datetime
+
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     CommandHandler,
@@ -16,6 +20,8 @@ try:  # pragma: no cover - used only when full project layout is present
         add_admin,
         remove_admin,
         list_admins,
+        link_account,
+        unlink_account,
     )
 except Exception:  # pragma: no cover - tests focus only on basic handlers
     def is_admin(_):
@@ -33,18 +39,57 @@ except Exception:  # pragma: no cover - tests focus only on basic handlers
         """Return empty admin list"""
         return []
 
+    def link_account(*_args, **_kwargs):
+        return None
+
+    def unlink_account(*_args, **_kwargs):
+        return False
+
 try:  # pragma: no cover
-    from ad.ad_client import search_candidates, reset_password, disable_user
+    from ad.ad_client import (
+        account_name,
+        cache_stats,
+        disable_user,
+        get_user,
+        get_user_by_guid,
+        org_chart,
+        reset_password,
+        search_candidates,
+    )
 except Exception:  # pragma: no cover
-    async def search_candidates(_query):  # type: ignore
+    async def search_candidates(_query, limit=None):  # type: ignore
         return []
 
+    async def get_user(_sam):  # type: ignore
+        return None
+
+    async def org_chart():  # type: ignore
+        return None
+
+    async def get_user_by_guid(_guid):  # type: ignore
+        return None
+
+    def account_name(user):  # type: ignore
+        return user.SamAccountName
+
+    def cache_stats():  # type: ignore
+        return {}
+
     async def reset_password(_sam, length: int = 12):  # type: ignore
         return ""
 
     async def disable_user(_sam):  # type: ignore
         return None
 
+try:  # pragma: no cover - needs APScheduler
+    from .scheduler import schedule_disable_jobs
+    from .database import TZ
+except Exception:  # pragma: no cover
+    TZ = None
+
+    def schedule_disable_jobs(sams, *_args, **_kwargs):  # type: ignore
+        return 0
+
 from ai.nlp import parse_command
 
 def setup_handlers(app):
@@ -53,10 +98,18 @@ def setup_handlers(app):
     app.add_handler(CommandHandler("help", help_cmd))
     app.add_handler(CommandHandler("whoami", whoami_cmd))
     app.add_handler(CommandHandler("admin_menu", super_cmd))
+    app.add_handler(CommandHandler("ad_stats", ad_stats_cmd))
+    app.add_handler(CommandHandler("link_ad", link_ad_cmd))
+    app.add_handler(CommandHandler("unlink_ad", unlink_ad_cmd))
+    app.add_handler(CommandHandler("disable_subtree", disable_subtree_cmd))
     app.add_handler(CallbackQueryHandler(super_cb, pattern=r"^super:"))
     app.add_handler(CallbackQueryHandler(ad_callback, pattern=r"^(reset|disable)"))
+    app.add_handler(CallbackQueryHandler(subtree_cb, pattern=r"^subtree:"))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, free_text))
 
+MAX_CANDIDATES = 10
+GUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
 MENU_BUTTONS = [
     ["Reset Password", "Schedule Block"],
     ["List Jobs", "Admin Menu"],
@@ -101,6 +154,144 @@ async def whoami_cmd(update: Update, context):
         )
 
 
+async def ad_stats_cmd(update: Update, context):
+    """Show directory cache and lookup coalescing counters to admins."""
+
+    if not update.message or not update.effective_user:
+        return
+
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("Access denied")
+        return
+
+    lines = [
+        f"{name}: " + ", ".join(f"{key}={value}" for key, value in values.items())
+        for name, values in cache_stats().items()
+    ]
+    await update.message.reply_text("\n".join(lines) or "No statistics")
+
+
+async def link_ad_cmd(update: Update, context):
+    """/link_ad <telegram id> <sam>: map a Telegram user to an AD account.
+
+    Linked users get admin rights through ADMIN_AD_GROUPS membership.
+    """
+
+    if not update.message or not update.effective_user:
+        return
+
+    if update.effective_user.id != SUPERADMIN_ID:
+        await update.message.reply_text("Access denied")
+        return
+
+    args = getattr(context, "args", None) or []
+    if len(args) != 2 or not args[0].isdigit():
+        await update.message.reply_text("Usage: /link_ad <telegram id> <sam>")
+        return
+    user = await get_user(args[1])
+    if user is None:
+        await update.message.reply_text(f"User {args[1]} not found")
+        return
+    link_account(int(args[0]), user.SamAccountName, user.DistinguishedName, actor=update.effective_user.id)
+    await update.message.reply_text(f"{args[0]} linked to {user.SamAccountName}")
+
+
+async def unlink_ad_cmd(update: Update, context):
+    if not update.message or not update.effective_user:
+        return
+
+    if update.effective_user.id != SUPERADMIN_ID:
+        await update.message.reply_text("Access denied")
+        return
+
+    args = getattr(context, "args", None) or []
+    if len(args) != 1 or not args[0].isdigit():
+        await update.message.reply_text("Usage: /unlink_ad <telegram id>")
+        return
+    ok = unlink_account(int(args[0]), actor=update.effective_user.id)
+    await update.message.reply_text("Account unlinked" if ok else "Not linked")
+
+
+def _parse_day(text: str) -> datetime | None:
+    for fmt in ("%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            day = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return day.replace(hour=16, minute=0, second=0, tzinfo=TZ)
+    return None
+
+
+async def _subtree_targets(manager: str):
+    chart = await org_chart()
+    if chart is None or chart.get(manager) is None:
+        return None, []
+    return chart.get(manager), [u for u in chart.subtree(manager) if u.Enabled]
+
+
+async def disable_subtree_cmd(update: Update, context):
+    """/disable_subtree <manager sam> <date>: offboard everyone below a manager."""
+
+    if not update.message or not update.effective_user:
+        return
+
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("Access denied")
+        return
+
+    args = getattr(context, "args", None) or []
+    run_dt = _parse_day(args[1]) if len(args) == 2 else None
+    if run_dt is None:
+        await update.message.reply_text("Usage: /disable_subtree <manager login> <DD.MM.YYYY>")
+        return
+    manager, targets = await _subtree_targets(args[0])
+    if manager is None:
+        await update.message.reply_text(f"User {args[0]} not found")
+        return
+    if not targets:
+        await update.message.reply_text(f"No active reports under {manager.DisplayName}")
+        return
+    preview = "\n".join(u.DisplayName for u in targets[:MAX_CANDIDATES])
+    if len(targets) > MAX_CANDIDATES:
+        preview += f"\n... and {len(targets) - MAX_CANDIDATES} more"
+    keyboard = InlineKeyboardMarkup(
+        [[InlineKeyboardButton(
+            f"Disable {len(targets)} accounts on {run_dt:%d.%m.%Y}",
+            callback_data=f"subtree:{manager.SamAccountName}:{run_dt:%Y-%m-%d}",
+        )]]
+    )
+    await update.message.reply_text(
+        f"Everyone under {manager.DisplayName} ({len(targets)}):\n{preview}", reply_markup=keyboard
+    )
+
+
+async def subtree_cb(update: Update, context):
+    query = update.callback_query
+    user = update.effective_user
+    if not query or not user:
+        return
+
+    if not is_admin(user.id):
+        await query.answer("Access denied", show_alert=True)
+        return
+
+    await query.answer()
+    _prefix, sam, day = (query.data or "").split(":", 2)
+    run_dt = _parse_day(day)
+    # Recomputed, the hierarchy may have changed since the preview.
+    manager, targets = await _subtree_targets(sam)
+    if manager is None or run_dt is None:
+        await query.message.reply_text(f"User {sam} not found")
+        return
+    count = schedule_disable_jobs(
+        [u.SamAccountName for u in targets],
+        run_dt,
+        created_by=user.id,
+        meta={"source": "subtree", "manager": manager.SamAccountName},
+    )
+    await query.message.reply_text(f"Scheduled {count} accounts for {run_dt:%d.%m.%Y}")
+
+
 async def super_cmd(update: Update, context):
     """Display superadmin menu with inline buttons."""
 
@@ -163,13 +354,30 @@ async def ad_callback(update: Update, context):
         return
 
     await query.answer()
-    action, sam = (query.data or "").split(":", 1)
-    if action == "reset":
-        pwd = await reset_password(sam)
-        await query.message.reply_text(f"New password for {sam}: {pwd}")
-    elif action == "disable":
-        await disable_user(sam)
-        await query.message.reply_text(f"User {sam} disabled")
+    action, ref = (query.data or "").split(":", 1)
+    sam = ref
+    try:
+        # Buttons carry the objectGUID, which survives renames and, unlike
+        # the sAMAccountName, is unique across domains.  The keyed lookup is
+        # normally answered from the cache filled by the search that produced
+        # the buttons; the account may have gone since then.
+        user = await (get_user_by_guid(ref) if GUID_RE.match(ref) else get_user(ref))
+        if user is None:
+            await query.message.reply_text(f"User {ref} not found")
+            return
+        sam, target = user.SamAccountName, account_name(user)
+        if action == "reset":
+            pwd = await reset_password(target)
+            await query.message.reply_text(f"New password for {sam}: {pwd}")
+        elif action == "disable":
+            await disable_user(target)
+            await query.message.reply_text(f"User {sam} disabled")
+    except LookupError:
+        await query.message.reply_text(f"User {sam} not found")
+    except Exception as exc:
+        # ldap3, PowerShell and timeout errors; the admin must learn it failed.
+        logging.exception("%s of %s failed", action, sam)
+        await query.message.reply_text(f"Failed to {action} {sam}: {exc}")
 
 
 async def free_text(update: Update, context):
@@ -186,21 +394,29 @@ async def free_text(update: Update, context):
             await update.message.reply_text(f"Usage: {cmd} <query>")
             return
         query = " ".join(args)
-        candidates = await search_candidates(query)
+        # One extra match only tells us whether the list was truncated.
+        candidates = await search_candidates(query, limit=MAX_CANDIDATES + 1)
         if not candidates:
             await update.message.reply_text("No users found")
             return
         keyboard = [
-            [InlineKeyboardButton(c.DisplayName, callback_data=f"{cmd}:{c.SamAccountName}")]
-            for c in candidates
+            [InlineKeyboardButton(c.DisplayName, callback_data=f"{cmd}:{c.ObjectGUID or c.SamAccountName}")]
+            for c in candidates[:MAX_CANDIDATES]
         ]
+        text = "Select user:"
+        if len(candidates) > MAX_CANDIDATES:
+            text = f"Showing the first {MAX_CANDIDATES} matches, refine the query. Select user:"
         await update.message.reply_text(
-            "Select user:", reply_markup=InlineKeyboardMarkup(keyboard)
+            text, reply_markup=InlineKeyboardMarkup(keyboard)
         )
     elif cmd == "jobs":
         await update.message.reply_text("No scheduled jobs.")
     elif cmd == "admin":
         await super_cmd(update, context)
+    elif cmd == "menu":
+        await menu_cmd(update, context)
+    elif cmd == "help":
+        await help_cmd(update, context)
     else:
         await update.message.reply_text(
             "Unrecognised input. Use /menu to show available actions.",
@@ -1,43 +1,200 @@
-import asyncio, email, imaplib, logging, os
+import asyncio, email, imaplib, logging, multiprocessing, os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from email.utils import getaddresses
 from .scheduler import schedule_disable_job
-from ai.nlp import parse_hr_mail
+from ai.nlp import (
+    extract_identifiers,
+    mentioned_surname,
+    message_text,
+    parse_hr_mail,
+    parse_hr_mail_bytes,
+    strip_signature,
+    warm_up,
+)
 from .database import TZ
 
 try:  # pragma: no cover - optional dependency
     from ad.ad_client import search_candidates
+    from ad.identifiers import matches
 except Exception:  # pragma: no cover - allow import without AD package
-    async def search_candidates(_query):  # type: ignore
+    async def search_candidates(_query, limit=None):  # type: ignore
         return []
 
+    def matches(_user, _query):  # type: ignore
+        return False
+
+
+def _same_surname(mentioned: str, token: str) -> bool:
+    """Whether ``mentioned`` is ``token`` in some grammatical case.
+
+    Russian surnames decline by changing or adding a short ending
+    ("Устинова" -> "Устиновой", "Иванов" -> "Иванову"), so everything but
+    the last letter of ``token`` has to match.
+    """
+    a, b = mentioned.lower(), token.lower()
+    if a == b:
+        return True
+    common = len(os.path.commonprefix([a, b]))
+    return common >= max(4, len(b) - 1) and abs(len(a) - len(b)) <= 2
+
+
+def _same_person(user, surname: str) -> bool:
+    return any(_same_surname(surname, token) for token in (user.DisplayName or "").split())
+
+
+async def find_employee(msg, fio: str | None) -> list:
+    """Resolve the person an HR mail is about.
+
+    Mail addresses, personnel numbers and phone numbers in the body are exact
+    keys and are tried first.  A hit is only trusted when it is unique and
+    carries the surname the mail names (a full FIO or "Устинову Н.П."); a
+    mail naming nobody is never resolved by identifier alone.  Contacts in
+    the signature block, in the headers or belonging to the sender's own
+    account are ignored, since they are the HR officer's.  Otherwise the
+    FIO is searched.
+    """
+    body = message_text(msg)
+    surname = fio.split()[0] if fio else mentioned_surname(body)
+    if not surname:
+        return []
+    headers = msg.get_all("From", []) + msg.get_all("To", []) + msg.get_all("Cc", [])
+    own = [addr for _name, addr in getaddresses(headers)]
+    senders = None
+    for identifier in extract_identifiers(strip_signature(body), exclude=own):
+        if senders is None:
+            senders = []
+            for _name, addr in getaddresses(msg.get_all("From", [])):
+                senders += [u for u in await search_candidates(addr, limit=2) if matches(u, addr)]
+        if any(matches(sender, identifier) for sender in senders):
+            continue
+        sender_sams = {sender.SamAccountName for sender in senders}
+        found = [
+            u
+            for u in await search_candidates(identifier, limit=2)
+            if _same_person(u, surname) and u.SamAccountName not in sender_sams
+        ]
+        if len(found) == 1:
+            return found
+    if not fio:
+        return []
+    # Two matches are enough to tell a unique person from namesakes.
+    return await search_candidates(fio, limit=2)
+
+
+class MailParsePool:
+    """Parse HR mails off the event loop.
+
+    dateparser may spend seconds on an unusual mail, which would freeze every
+    Telegram handler.  With ``workers`` > 0 mails are parsed in a pool of
+    spawned processes (dateparser is loaded once per process), with 0 in a
+    thread.  The checker awaits one mail at a time, so one worker is enough.
+    A mail that takes longer than ``timeout`` raises :class:`TimeoutError`;
+    the process pool is then replaced by a fresh one, so later mails never
+    queue behind the slow one, while the old worker (or thread) is left to
+    finish on its own.
+    """
+
+    def __init__(self, workers: int = 1, timeout: float = 30.0):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self.stats = {"parsed": 0, "timeouts": 0, "restarts": 0}
+
+    @classmethod
+    def from_env(cls) -> "MailParsePool":
+        return cls(
+            workers=int(os.getenv("MAIL_PARSE_WORKERS", "1")),
+            timeout=float(os.getenv("MAIL_PARSE_TIMEOUT", "30")),
+        )
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking the bot would copy its event loop and locks held by other threads.
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=warm_up
+            )
+        return self._executor
+
+    def _restart(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        # Pending mails fail at once; a worker stuck in a mail exits when done.
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.stats["restarts"] += 1
+
+    async def parse(self, raw: bytes) -> tuple[str | None, datetime | None]:
+        """Return ``(fio, date)`` of the RFC 822 message ``raw``."""
+        executor = self._pool() if self.workers else None
+        if executor is not None:
+            work = asyncio.get_running_loop().run_in_executor(executor, parse_hr_mail_bytes, raw)
+        else:
+            work = asyncio.to_thread(lambda: parse_hr_mail(email.message_from_bytes(raw)))
+        try:
+            result = await asyncio.wait_for(work, self.timeout)
+        except BrokenProcessPool:
+            if self._executor is executor:  # a worker died on its own
+                self._restart()
+            raise
+        except (asyncio.TimeoutError, TimeoutError):
+            self.stats["timeouts"] += 1
+            if self.workers:
+                self._restart()
+            raise TimeoutError(f"Parsing took longer than {self.timeout}s") from None
+        self.stats["parsed"] += 1
+        return result
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
 async def start_mail_checker():
     host, user, pwd = os.getenv("IMAP_HOST"), os.getenv("IMAP_USER"), os.getenv("IMAP_PASS")
     if not all([host, user, pwd]):
         logging.info("IMAP disabled")
         return
-    while True:
-        try:
-            with imaplib.IMAP4_SSL(host) as M:
-                M.login(user, pwd)
-                M.select(os.getenv("IMAP_FOLDER", "INBOX"))
-                typ, data = M.search(None, "UNSEEN")
-                for num in data[0].split():
-                    typ, msg_data = M.fetch(num, "(RFC822)")
-                    msg = email.message_from_bytes(msg_data[0][1])
-                    msg_id = msg.get("Message-ID", num.decode())
-                    logging.info("Processing mail %s", msg_id)
-                    fio, date = parse_hr_mail(msg)
-                    if fio and date:
-                        candidates = await search_candidates(fio)
-                        if len(candidates) != 1:
-                            logging.info("Ambiguous FIO '%s'", fio)
+    parser = MailParsePool.from_env()
+    try:
+        while True:
+            try:
+                with imaplib.IMAP4_SSL(host) as M:
+                    M.login(user, pwd)
+                    M.select(os.getenv("IMAP_FOLDER", "INBOX"))
+                    typ, data = M.search(None, "UNSEEN")
+                    for num in data[0].split():
+                        typ, msg_data = M.fetch(num, "(RFC822)")
+                        raw = msg_data[0][1]
+                        msg = email.message_from_bytes(raw)
+                        msg_id = msg.get("Message-ID", num.decode())
+                        logging.info("Processing mail %s", msg_id)
+                        try:
+                            fio, date = await parser.parse(raw)
+                        except TimeoutError:
+                            # It would time out again on every poll; leave it to a human.
+                            logging.error("Giving up on mail %s, parsing timed out", msg_id)
                             M.store(num, "+FLAGS", "\\Seen")
                             continue
-                        sam = candidates[0].SamAccountName
-                        run_dt = date.replace(hour=16, minute=0, second=0, tzinfo=TZ)
-                        schedule_disable_job(sam, run_dt, created_by=0, meta={"source": "mail"})
-                        M.store(num, "+FLAGS", "\\Seen")
-                        logging.info("Processed mail %s", msg_id)
-        except Exception:
-            logging.exception("IMAP poll error")
-        await asyncio.sleep(int(os.getenv("IMAP_POLL_SECONDS", "300")))
+                        except BrokenProcessPool:
+                            # A worker died, possibly killed over another mail; retried next poll.
+                            logging.warning("Mail %s was not parsed, worker pool restarted", msg_id)
+                            continue
+                        if date and (fio or mentioned_surname(message_text(msg))):
+                            candidates = await find_employee(msg, fio)
+                            if len(candidates) != 1:
+                                logging.info("Ambiguous FIO '%s'", fio)
+                                M.store(num, "+FLAGS", "\\Seen")
+                                continue
+                            sam = candidates[0].SamAccountName
+                            run_dt = date.replace(hour=16, minute=0, second=0, tzinfo=TZ)
+                            schedule_disable_job(sam, run_dt, created_by=0, meta={"source": "mail"})
+                            M.store(num, "+FLAGS", "\\Seen")
+                            logging.info("Processed mail %s", msg_id)
+            except Exception:
+                logging.exception("IMAP poll error")
+            await asyncio.sleep(int(os.getenv("IMAP_POLL_SECONDS", "300")))
+    finally:
+        parser.close()
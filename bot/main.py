@@ -4,19 +4,84 @@ from telegram import MenuButtonCommands
 from bot.handlers import setup_handlers
 from .scheduler import scheduler, restore_jobs_on_startup
 from .mail_checker import start_mail_checker
-from .database import init_db, SUPERADMIN_ID
+from .database import init_db, SUPERADMIN_ID, load_sync_state, save_sync_state, set_group_check
+from ad.ad_client import configure_from_env, get_backend
+from ad.morph import get_analyzer
+from ai import nlp
+from ad.groups import GroupMembership, GroupSync, LDAPGroupFeed
+from ad.ldap_backend import LDAPBackend
+from ad.sync import LDAPChangeFeed, enable_sync
 from telegram import (
     BotCommand,
     BotCommandScopeChat,
 )
-import os, logging, asyncio
+import os, logging, asyncio, threading, time
+from functools import partial
+
+def start_directory_sync(app, backend):
+    """Keep a local user index warm when AD_SYNC_SECONDS is configured."""
+    sync_seconds = int(os.getenv("AD_SYNC_SECONDS", "0"))
+    if not sync_seconds or not os.getenv("AD_SERVER"):
+        return None
+    if os.getenv("AD_DOMAINS"):
+        # Forest searches fan out to every domain; the local index covers one.
+        logging.warning("AD_SYNC_SECONDS is ignored together with AD_DOMAINS")
+        return None
+    # USN cursors are per DC, so with failover the feed sticks to the first one.
+    primary = getattr(backend, "primary", backend)
+    if not isinstance(primary, LDAPBackend):
+        logging.warning("AD_SYNC_SECONDS needs an LDAP directory, ignoring it")
+        return None
+    source = os.environ["AD_SERVER"]
+    sync = enable_sync(
+        LDAPChangeFeed(primary),
+        load_state=partial(load_sync_state, source),
+        save_state=partial(save_sync_state, source),
+        interval=sync_seconds,
+    )
+    app.create_task(sync.run())
+    return sync
+
+def start_group_sync(app, backend):
+    """Grant admin rights to members of ADMIN_AD_GROUPS (nested groups included)."""
+    groups = [g.strip() for g in os.getenv("ADMIN_AD_GROUPS", "").split(";") if g.strip()]
+    if not groups:
+        return None
+    backend = getattr(backend, "primary", backend)
+    if not isinstance(backend, LDAPBackend):
+        logging.warning("ADMIN_AD_GROUPS needs a single-domain LDAP directory, ignoring it")
+        return None
+    membership = GroupMembership()
+    sync = GroupSync(LDAPGroupFeed(backend), membership, interval=int(os.getenv("AD_GROUP_SYNC_SECONDS", "300")))
+    set_group_check(lambda dn: membership.member_of_any(dn, groups))
+    app.create_task(sync.run())
+    return sync
+
+def warm_up_nlp():
+    """Load dateparser and pymorphy3 before the first HR mail or inflected search needs them."""
+    started = time.perf_counter()
+    try:
+        nlp.warm_up()
+        get_analyzer()
+        index = getattr(get_backend(), "index", None)
+        if index is not None:
+            index.names.warm()
+    except Exception:
+        logging.exception("NLP warm-up failed")
+        return
+    logging.info("NLP warm-up took %.1fs", time.perf_counter() - started)
 
 async def on_startup(app):
     init_db()
+    backend = configure_from_env()
+    start_directory_sync(app, backend)
+    start_group_sync(app, backend)
     scheduler.start()
     await restore_jobs_on_startup()
     app.create_task(start_mail_checker())
     await app.bot.set_chat_menu_button(menu_button=MenuButtonCommands())
+    # Polling starts right after this hook; heavy NLP data loads meanwhile.
+    threading.Thread(target=warm_up_nlp, name="nlp-warm-up", daemon=True).start()
 
 def main():
     token = os.getenv("TELEGRAM_TOKEN")
@@ -36,6 +101,10 @@ def main():
         super_cmds = base_cmds + [
             BotCommand("add_admin", "Add admin"),
             BotCommand("remove_admin", "Remove admin"),
+            BotCommand("ad_stats", "Directory cache stats"),
+            BotCommand("link_ad", "Link Telegram user to AD account"),
+            BotCommand("unlink_ad", "Unlink AD account"),
+            BotCommand("disable_subtree", "Disable everyone under a manager"),
         ]
         await application.bot.set_my_commands(
             super_cmds, scope=BotCommandScopeChat(SUPERADMIN_ID)
@@ -4,32 +4,40 @@ from apscheduler.triggers.date import DateTrigger
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from ad.ad_client import disable_user
-from .database import DB, TZ
+from ad.governor import BULK
+from .database import TZ, _ensure_db
 
 scheduler = AsyncIOScheduler(timezone=TZ)
 
-def schedule_disable_job(sam, run_dt, created_by, meta=None):
-    DB.execute(
-        "INSERT INTO jobs(sam,run_ts,created_by,meta) VALUES (?,?,?,?)",
-        (sam, int(run_dt.timestamp()), created_by, json.dumps(meta or {})),
-    )
-    DB.commit()
+def _add_disable_job(sam, run_dt):
     scheduler.add_job(
         disable_user,
         trigger=DateTrigger(run_date=run_dt),
         args=[sam],
+        kwargs={"priority": BULK},
         id=f"disable:{sam}:{int(run_dt.timestamp())}",
         replace_existing=True,
     )
 
+def schedule_disable_job(sam, run_dt, created_by, meta=None):
+    schedule_disable_jobs([sam], run_dt, created_by, meta)
+
+def schedule_disable_jobs(sams, run_dt, created_by, meta=None):
+    """Schedule disabling all ``sams`` at ``run_dt`` with one database transaction."""
+    sams = list(dict.fromkeys(sams))
+    ts = int(run_dt.timestamp())
+    payload = json.dumps(meta or {})
+    db = _ensure_db()
+    db.executemany(
+        "INSERT INTO jobs(sam,run_ts,created_by,meta) VALUES (?,?,?,?)",
+        [(sam, ts, created_by, payload) for sam in sams],
+    )
+    db.commit()
+    for sam in sams:
+        _add_disable_job(sam, run_dt)
+    return len(sams)
+
 async def restore_jobs_on_startup():
-    rows = DB.execute("SELECT sam, run_ts FROM jobs").fetchall()
+    rows = _ensure_db().execute("SELECT sam, run_ts FROM jobs").fetchall()
     for sam, ts in rows:
-        run_dt = datetime.fromtimestamp(ts, tz=TZ)
-        scheduler.add_job(
-            disable_user,
-            trigger=DateTrigger(run_date=run_dt),
-            args=[sam],
-            id=f"disable:{sam}:{ts}",
-            replace_existing=True,
-        )
+        _add_disable_job(sam, datetime.fromtimestamp(ts, tz=TZ))
@@ -0,0 +1,98 @@
+"""Stand-in for ad/ps_host.ps1 speaking the same JSON line protocol.
+
+Special accounts: ``slow`` never answers in time, ``crash`` kills the host.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+USERS = {
+    "nustinova": {
+        "SamAccountName": "nustinova",
+        "DisplayName": "Устинова Наталья",
+        "DistinguishedName": "CN=Nat,OU=Users,DC=corp,DC=local",
+        "Enabled": True,
+        "Mail": "nustinova@corp.local",
+        "ObjectGUID": "0B9A3C34-6D1F-4B8E-9F0E-2A7D1C5E8F11",
+        "EmployeeID": "004512",
+        "TelephoneNumber": "+7 (495) 123-45-67",
+        "Manager": "CN=Boss,OU=Users,DC=corp,DC=local",
+    },
+}
+
+
+# Attribute of a filter term -> field of the stand-in users.
+FIELDS = {
+    "displayname": "DisplayName",
+    "sn": "DisplayName",
+    "givenname": "DisplayName",
+    "samaccountname": "SamAccountName",
+    "mail": "Mail",
+    "employeeid": "EmployeeID",
+    "telephonenumber": "TelephoneNumber",
+}
+TERM_RE = re.compile(r"\((\w+)=([^()]*)\)")
+
+
+def unescape(value):
+    if re.search(r"\\(?![0-9a-fA-F]{2})", value):
+        raise ValueError(f"Invalid escape in filter value {value!r}")
+    return re.sub(r"\\([0-9a-fA-F]{2})", lambda m: chr(int(m.group(1), 16)), value).lower()
+
+
+def term_matches(user, attr, raw):
+    """Whether ``user`` matches the filter term ``(attr=raw)``."""
+    if attr == "anr":
+        words = user["DisplayName"].lower().split()
+        return all(any(w.startswith(part) for w in words) for part in unescape(raw).split())
+    text = user.get(FIELDS[attr], "").lower()
+    if raw == "*":
+        return bool(text)
+    if raw.startswith("*") and raw.endswith("*"):
+        return unescape(raw[1:-1]) in text
+    if raw.endswith("*"):
+        return text.startswith(unescape(raw[:-1]))
+    return text == unescape(raw)
+
+
+def search(ldap_filter):
+    """Users matching any term of an ``ad.filters`` filter besides the class checks."""
+    terms = [(a.lower(), v) for a, v in TERM_RE.findall(ldap_filter) if a not in ("objectCategory", "objectClass")]
+    return [u for u in USERS.values() if any(term_matches(u, attr, raw) for attr, raw in terms)]
+
+
+def handle(command, args):
+    sam = args.get("sam", "")
+    if sam == "slow":
+        time.sleep(5)
+    if sam == "crash":
+        sys.exit(3)
+    if command == "search":
+        return search(args["filter"])[: args["limit"] or None]
+    if command == "get_user":
+        return USERS.get(sam)
+    if command == "get_user_by_guid":
+        return next((u for u in USERS.values() if u["ObjectGUID"].lower() == args["guid"]), None)
+    if command == "pid":
+        return os.getpid()
+    if command not in ("disable", "set_password"):
+        raise ValueError(f"Unknown command {command}")
+    if sam not in USERS:
+        raise LookupError(f"User {sam} not found")
+    if command == "disable":
+        USERS[sam]["Enabled"] = False
+    return None
+
+
+for line in sys.stdin:
+    request = json.loads(line)
+    try:
+        reply = {"id": request["id"], "ok": True, "result": handle(request["command"], request["args"])}
+    except LookupError as exc:
+        reply = {"id": request["id"], "ok": False, "kind": "NotFound", "error": str(exc)}
+    except Exception as exc:
+        reply = {"id": request["id"], "ok": False, "kind": type(exc).__name__, "error": str(exc)}
+    print(json.dumps(reply, ensure_ascii=False), flush=True)
@@ -0,0 +1,385 @@
+import asyncio
+import re
+import threading
+import uuid
+from contextlib import aclosing
+
+import pytest
+
+import ad.ad_client as ad_client
+from ad.filters import identifier_filter
+from ad.ldap_backend import LDAPBackend, LDAPConnectionPool
+
+
+class FakeConnection:
+    """Tiny stand-in for ``ldap3.Connection`` understanding the filters we send."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.bound = True
+        self.closed = False
+        self.response = []
+        self.modified = []
+        self.extend = type("Ext", (), {})()
+        self.extend.microsoft = type("MS", (), {"modify_password": self._modify_password})()
+        self.passwords = {}
+        self.searches = []
+
+    def search(self, base, search_filter, search_scope="SUBTREE", attributes=None, **kwargs):
+        self.searches.append((base, search_scope))
+        sam = re.search(r"sAMAccountName=([^)*]+)\)", search_filter)
+        name = re.search(r"displayName=\*([^)]+)\*\)", search_filter)
+        anr = re.search(r"\(anr=([^)]*)\)", search_filter)
+        prefixes = re.findall(r"\((\w+)=([^)*]+)\*\)", search_filter)
+        guid = re.search(r"objectGUID=((?:\\[0-9a-f]{2})+)\)", search_filter)
+        self.response = []
+        for dn, attrs in self.entries.items():
+            if search_scope == "BASE" and dn != base:
+                continue
+            if sam and attrs["sAMAccountName"] != sam.group(1):
+                continue
+            if guid and attrs.get("objectGUID") != bytes.fromhex(guid.group(1).replace("\\", "")):
+                continue
+            if (name or anr or prefixes) and not (
+                (name and name.group(1).lower() in attrs["displayName"].lower())
+                or (anr and any(w.startswith(anr.group(1).lower()) for w in attrs["displayName"].lower().split()))
+                or any(str(attrs.get(a, "")).lower().startswith(v.lower()) for a, v in prefixes)
+            ):
+                continue
+            self.response.append({"type": "searchResEntry", "dn": dn, "attributes": dict(attrs)})
+        return bool(self.response)
+
+    def modify(self, dn, changes):
+        self.modified.append((dn, changes))
+        self.entries[dn]["userAccountControl"] = changes["userAccountControl"][0][1][0]
+        return True
+
+    def _modify_password(self, dn, password):
+        self.passwords[dn] = password
+        return True
+
+    def unbind(self):
+        self.bound = False
+        self.closed = True
+
+
+class PagedFakeConnection(FakeConnection):
+    """Adds RFC 2696 paging on top of :class:`FakeConnection`."""
+
+    def __init__(self, entries):
+        super().__init__(entries)
+        self.pages = []
+        self.result = {}
+
+    def search(self, base, search_filter, paged_size=None, paged_cookie=None, **kwargs):
+        super().search(base, search_filter, **kwargs)
+        self.pages.append((paged_size, paged_cookie))
+        if paged_size is None:
+            return True
+        start = int(paged_cookie or 0)
+        if paged_size == 0:
+            self.response, end = [], len(self.entries)
+        else:
+            end = start + paged_size
+            self.response = self.response[start:end]
+        cookie = str(end).encode() if end < len(self.entries) else b""
+        self.result = {"controls": {"1.2.840.113556.1.4.319": {"value": {"size": 0, "cookie": cookie}}}}
+        return True
+
+
+ENTRIES = {
+    "CN=Nat,OU=Users,DC=corp,DC=local": {
+        "sAMAccountName": "nustinova",
+        "displayName": "Устинова Наталья",
+        "userAccountControl": 512,
+        "objectGUID": uuid.UUID("0b9a3c34-6d1f-4b8e-9f0e-2a7d1c5e8f11").bytes_le,
+        "mail": "nustinova@corp.local",
+        "telephoneNumber": "+7 (495) 123-45-67",
+    },
+    "CN=Ivan,OU=Users,DC=corp,DC=local": {
+        "sAMAccountName": "iivanov",
+        "displayName": "Иванов Иван",
+        "userAccountControl": 514,
+    },
+}
+
+
+@pytest.fixture
+def fake_backend():
+    created = []
+    entries = {dn: dict(attrs) for dn, attrs in ENTRIES.items()}
+
+    def factory():
+        conn = FakeConnection(entries)
+        created.append(conn)
+        return conn
+
+    backend = LDAPBackend(LDAPConnectionPool(factory, size=2), "DC=corp,DC=local")
+    previous = ad_client.set_backend(backend)
+    yield backend, created
+    ad_client.set_backend(previous)
+
+
+def test_demo_backend_substring_search():
+    users = asyncio.run(ad_client.DemoBackend().search("устинова"))
+    assert [u.SamAccountName for u in users] == ["nustinovam", "nustinova"]
+
+
+def test_pool_reuses_bound_connection(fake_backend):
+    backend, created = fake_backend
+
+    async def scenario():
+        for _ in range(5):
+            await backend.search("Устинова")
+        await ad_client.disable_user("nustinova")
+        return await backend.search("устинова")
+
+    users = asyncio.run(scenario())
+    assert len(created) == 1
+    assert backend.pool.stats["reused"] == 6
+    assert users[0].Enabled is False
+
+
+def test_pool_is_bounded(fake_backend):
+    backend, created = fake_backend
+
+    async def scenario():
+        await asyncio.gather(*(ad_client.search_candidates("Иван") for _ in range(10)))
+
+    asyncio.run(scenario())
+    assert len(created) <= backend.pool.size
+
+
+def test_cancelled_call_does_not_share_its_connection():
+    release = threading.Event()
+    opened = []
+
+    def factory():
+        conn = FakeConnection({})
+        opened.append(conn)
+        return conn
+
+    pool = LDAPConnectionPool(factory, size=1)
+
+    def slow(conn):
+        release.wait(5)
+        return conn
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.run(slow), 0.05)
+        # the first thread still holds opened[0] and with it the only slot
+        second = asyncio.ensure_future(pool.run(lambda conn: conn))
+        await asyncio.sleep(0.05)
+        waiting = not second.done()
+        release.set()
+        return waiting, await second
+
+    waiting, second = asyncio.run(scenario())
+    assert waiting
+    assert second is opened[1]
+    assert opened[0].closed
+    assert pool.stats["discarded"] == 1
+
+
+def test_cancelled_page_keeps_its_slot_until_the_thread_is_done():
+    release = threading.Event()
+    pool = LDAPConnectionPool(lambda: FakeConnection({}), size=1)
+
+    def slow(conn):
+        release.wait(5)
+
+    async def paging():
+        async with pool.connection() as conn:
+            await pool.call(conn, slow)
+
+    async def scenario():
+        first = asyncio.ensure_future(paging())
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        blocked = pool._slots.locked() and pool.stats["discarded"] == 0
+        release.set()
+        await asyncio.sleep(0.1)
+        return blocked, pool._slots.locked(), pool.stats["discarded"]
+
+    assert asyncio.run(scenario()) == (True, False, 1)
+
+
+def test_broken_connection_is_replaced(fake_backend):
+    backend, created = fake_backend
+
+    async def scenario():
+        await backend.search("Иван")
+        created[0].unbind()
+        return await backend.search("Иван")
+
+    users = asyncio.run(scenario())
+    assert [u.SamAccountName for u in users] == ["iivanov"]
+    assert users[0].Enabled is False
+    assert len(created) == 2
+
+
+def test_reset_password_uses_dn(fake_backend):
+    _backend, created = fake_backend
+    pwd = asyncio.run(ad_client.reset_password("nustinova", length=16))
+    assert created[0].passwords == {"CN=Nat,OU=Users,DC=corp,DC=local": pwd}
+
+
+def test_unknown_user_raises(fake_backend):
+    with pytest.raises(LookupError):
+        asyncio.run(ad_client.disable_user("ghost"))
+
+
+def test_ldap3_mock_strategy():
+    ldap3 = pytest.importorskip("ldap3")
+    server = ldap3.Server("mock", get_info=ldap3.OFFLINE_AD_2012_R2)
+
+    def factory():
+        conn = ldap3.Connection(
+            server, user="CN=svc,DC=corp,DC=local", password="secret", client_strategy=ldap3.MOCK_SYNC
+        )
+        conn.strategy.add_entry("CN=svc,DC=corp,DC=local", {"userPassword": "secret", "sAMAccountName": "svc"})
+        conn.strategy.add_entry(
+            "CN=Nat,OU=Users,DC=corp,DC=local",
+            {
+                "objectClass": ["top", "person", "user"],
+                "objectCategory": "person",
+                "sAMAccountName": "nustinova",
+                "displayName": "Устинова Наталья",
+                "userAccountControl": 512,
+            },
+        )
+        conn.bind()
+        return conn
+
+    backend = LDAPBackend(LDAPConnectionPool(factory, size=1), "DC=corp,DC=local")
+
+    async def scenario():
+        await backend.disable("nustinova")
+        return await backend.search("Устинова")
+
+    users = asyncio.run(scenario())
+    assert [u.SamAccountName for u in users] == ["nustinova"]
+    assert users[0].Enabled is False
+
+
+def _paged_backend(n=5):
+    entries = {
+        f"CN=u{i},OU=Users,DC=corp,DC=local": {
+            "sAMAccountName": f"u{i}",
+            "displayName": f"Иванов {i}",
+            "userAccountControl": 512,
+        }
+        for i in range(n)
+    }
+    created = []
+
+    def factory():
+        created.append(PagedFakeConnection(entries))
+        return created[-1]
+
+    return LDAPBackend(LDAPConnectionPool(factory, size=1), "DC=corp,DC=local"), created
+
+
+def test_iter_candidates_pages_through_results():
+    backend, created = _paged_backend()
+    previous = ad_client.set_backend(backend)
+
+    async def scenario():
+        return [u.SamAccountName async for u in ad_client.iter_candidates("Иванов", page_size=2)]
+
+    try:
+        sams = asyncio.run(scenario())
+    finally:
+        ad_client.set_backend(previous)
+    assert sams == ["u0", "u1", "u2", "u3", "u4"]
+    assert created[0].pages == [(2, None), (2, b"2"), (2, b"4")]
+
+
+def test_iter_candidates_early_stop_abandons_paging():
+    backend, created = _paged_backend()
+
+    async def scenario():
+        found = []
+        async with aclosing(backend.iter_search("Иванов", page_size=2)) as users:
+            async for user in users:
+                found.append(user.SamAccountName)
+                break
+        # the connection is back in the pool and reused
+        await backend.search("Иванов")
+        return found
+
+    assert asyncio.run(scenario()) == ["u0"]
+    assert created[0].pages[:2] == [(2, None), (0, b"2")]
+    assert len(created) == 1
+
+
+def test_iter_candidates_falls_back_to_search():
+    async def scenario():
+        return [u.SamAccountName async for u in ad_client.iter_candidates("Устинова")]
+
+    assert asyncio.run(scenario()) == ["nustinovam", "nustinova"]
+
+
+def test_writes_reuse_cached_dn(fake_backend):
+    backend, created = fake_backend
+
+    async def scenario():
+        await ad_client.search_candidates("Устинова")
+        created[0].searches.clear()
+        await ad_client.reset_password("nustinova")
+        await ad_client.disable_user("nustinova")
+
+    asyncio.run(scenario())
+    dn = "CN=Nat,OU=Users,DC=corp,DC=local"
+    assert dn in created[0].passwords
+    # the password needs no lookup at all, the disable only reads the entry itself
+    assert created[0].searches == [(dn, "BASE")]
+
+
+def test_moved_user_falls_back_to_subtree_search(fake_backend):
+    backend, created = fake_backend
+    backend._dns.set("nustinova", "CN=Nat,OU=Old,DC=corp,DC=local")
+    asyncio.run(ad_client.disable_user("nustinova"))
+    assert created[0].modified[0][0] == "CN=Nat,OU=Users,DC=corp,DC=local"
+    assert backend._dns.get("nustinova") == "CN=Nat,OU=Users,DC=corp,DC=local"
+
+
+def test_get_user_by_guid(fake_backend):
+    guid = "0b9a3c34-6d1f-4b8e-9f0e-2a7d1c5e8f11"
+
+    async def scenario():
+        first = await ad_client.get_user_by_guid("{%s}" % guid.upper())
+        again = await ad_client.get_user_by_guid(guid)
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert first.SamAccountName == "nustinova"
+    assert first.ObjectGUID == guid
+    assert again is first
+    assert asyncio.run(ad_client.get_user_by_guid(str(uuid.uuid4()))) is None
+
+
+def test_identifier_query_uses_exact_lookup(fake_backend):
+    backend, _created = fake_backend
+    built = identifier_filter("8 495 123 45 67")
+    assert "(telephoneNumber=+7 \\28495\\29 123-45-67)" in built
+    assert "(telephoneNumber=*" not in built
+
+    async def scenario():
+        return [
+            [u.SamAccountName for u in await ad_client.search_candidates(q)]
+            for q in ("NUSTINOVA@corp.local", "84951234567", "84951234500")
+        ]
+
+    assert asyncio.run(scenario()) == [["nustinova"], ["nustinova"], []]
+
+
+def test_generated_passwords_meet_complexity():
+    for _ in range(200):
+        pwd = ad_client.generate_password(8)
+        assert len(pwd) == 8
+        assert all(any(c in cls for c in pwd) for cls in ad_client.PASSWORD_CLASSES)
+    with pytest.raises(ValueError):
+        ad_client.generate_password(3)
@@ -0,0 +1,80 @@
+import asyncio
+import importlib
+import os
+
+import pytest
+
+import ad.ad_client as ad_client
+
+
+class SlowBackend:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.active = 0
+        self.peak = 0
+        self.disabled = []
+        self.passwords = {}
+
+    async def search(self, query, limit=None):
+        return []
+
+    async def _op(self, sam):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if sam in self.fail:
+                raise LookupError(f"User {sam} not found")
+        finally:
+            self.active -= 1
+
+    async def set_password(self, sam, password):
+        await self._op(sam)
+        self.passwords[sam] = password
+
+    async def disable(self, sam):
+        await self._op(sam)
+        self.disabled.append(sam)
+
+
+@pytest.fixture
+def backend():
+    backend = SlowBackend(fail={"ghost"})
+    previous = ad_client.set_backend(backend)
+    yield backend
+    ad_client.set_backend(previous)
+
+
+@pytest.fixture
+def db():
+    os.environ["DB_PATH"] = ":memory:"
+    import bot.database as database
+    importlib.reload(database)
+    database.init_db()
+    return database
+
+
+def test_disable_users_bounded_concurrency(backend, db):
+    sams = [f"user{i}" for i in range(20)] + ["ghost", "user1"]
+    report = asyncio.run(ad_client.disable_users(sams, concurrency=4, actor=7, audit=db.audit))
+
+    assert backend.peak == 4
+    assert len(report.results) == 21
+    assert report.failed == ["ghost"]
+    assert sorted(backend.disabled) == sorted(f"user{i}" for i in range(20))
+    ghost = report.results[-1]
+    assert ghost.ok is False and "ghost" in ghost.error and ghost.duration > 0
+
+    rows = db.DB.execute("SELECT user_id, action, target, details FROM audit_logs").fetchall()
+    assert len(rows) == 1
+    user_id, action, target, details = rows[0]
+    assert (user_id, action, target) == (7, "bulk_disable", "21 accounts")
+    assert '"failed": 1' in details and '"sam": "ghost"' in details
+
+
+def test_reset_passwords_report(backend):
+    report = asyncio.run(ad_client.reset_passwords(["a", "b"], length=20, concurrency=2))
+    assert report.succeeded == ["a", "b"]
+    assert {r.sam: r.password for r in report.results} == backend.passwords
+    assert all(len(r.password) == 20 for r in report.results)
+    assert "password" not in str(report.audit_details())
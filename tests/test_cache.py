@@ -0,0 +1,105 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import ad.ad_client as ad_client
+from ad.ad_client import DemoBackend
+from ad.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingDemo(DemoBackend):
+    def __init__(self):
+        super().__init__()
+        self.searches = 0
+
+    async def search(self, query, limit=None):
+        self.searches += 1
+        await asyncio.sleep(0)
+        return await super().search(query, limit)
+
+
+@pytest.fixture
+def backend():
+    backend = CountingDemo()
+    previous = ad_client.set_backend(backend)
+    yield backend
+    ad_client.set_backend(previous)
+
+
+def test_ttl_and_lru():
+    clock = Clock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", "a" was used more recently
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    clock.now = 11
+    assert cache.get("a") is None
+    info = cache.info()
+    assert (info["hits"], info["misses"], info["evictions"], info["expired"]) == (2, 2, 1, 1)
+    assert info["size"] == 1
+
+
+def test_search_results_are_cached(backend):
+    first = asyncio.run(ad_client.search_candidates("Устинова"))
+    second = asyncio.run(ad_client.search_candidates("устинова "))
+    assert first == second
+    assert backend.searches == 1
+    assert ad_client.cache_stats()["search"]["hits"] >= 1
+
+
+def test_writes_invalidate_cached_entries(backend):
+    asyncio.run(ad_client.search_candidates("Устинова"))
+    assert asyncio.run(ad_client.get_user("NUSTINOVA")).Enabled is True
+
+    asyncio.run(ad_client.disable_user("nustinova"))
+
+    users = {u.SamAccountName: u for u in asyncio.run(ad_client.search_candidates("Устинова"))}
+    assert users["nustinova"].Enabled is False
+    assert users["nustinovam"].Enabled is True
+    assert backend.searches == 2
+    assert asyncio.run(ad_client.get_user("nustinova")).Enabled is False
+
+
+def test_lookup_racing_a_write_is_not_cached(backend):
+    async def scenario():
+        lookup = asyncio.ensure_future(ad_client.search_candidates("Устинова"))
+        await asyncio.sleep(0)
+        ad_client.invalidate_user("nustinova")
+        await lookup
+        await ad_client.search_candidates("Устинова")
+
+    asyncio.run(scenario())
+    assert backend.searches == 2
+
+
+def test_shared_between_threads():
+    def yielding_clock():
+        time.sleep(0)  # let another thread run between lookup and update
+        return time.monotonic()
+
+    cache = TTLCache(maxsize=32, ttl=0.0005, clock=yielding_clock)
+
+    def hammer(seed):
+        for i in range(800):
+            key = (seed + i) % 40
+            cache.set(key, i)
+            cache.get((key + 1) % 40)
+            if i % 5 == 0:
+                cache.pop((key + 2) % 40)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(hammer, range(8)))
+    assert len(cache) <= 32
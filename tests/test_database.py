@@ -50,3 +50,18 @@ def test_audit_logging(db):
         ("remove_admin", "7", 99),
     ]
 
+
+def test_admin_by_ad_group(db):
+    groups = {"cn=helpdesk,dc=corp,dc=local": {"cn=nat,ou=users,dc=corp,dc=local"}}
+    db.set_group_check(lambda dn: dn.lower() in groups["cn=helpdesk,dc=corp,dc=local"])
+    try:
+        assert db.is_admin(5) is False
+        db.link_account(5, "nustinova", "CN=Nat,OU=Users,DC=corp,DC=local", actor=1)
+        assert db.get_account(5) == ("nustinova", "CN=Nat,OU=Users,DC=corp,DC=local")
+        assert db.is_admin(5) is True
+        groups["cn=helpdesk,dc=corp,dc=local"].clear()
+        assert db.is_admin(5) is False
+        assert db.unlink_account(5, actor=1) is True
+        assert db.get_account(5) is None
+    finally:
+        db.set_group_check(None)
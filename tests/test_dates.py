@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+from ai import nlp
+
+# Dismissal notes as HR writes them, with the date they mean.
+CORPUS = [
+    ("Просьба уволить Иванов Иван Иванович 1 июля 2024", datetime(2024, 7, 1)),
+    ("Уволить Петрова Анна Сергеевна с 01.07.2024 г.", datetime(2024, 7, 1)),
+    ("Последний рабочий день 15 Марта 2025 года, Сидоров Петр Петрович", datetime(2025, 3, 15)),
+    ("Устинова Наталья Викторовна, дата увольнения 31.12.2024", datetime(2024, 12, 31)),
+    ("Увольнение 3 мая 2024 г. по собственному желанию", datetime(2024, 5, 3)),
+    ("с 9.1.2025 прошу заблокировать учётную запись", datetime(2025, 1, 9)),
+]
+
+
+@pytest.mark.parametrize("text, expected", CORPUS)
+def test_fast_path_agrees_with_dateparser(text, expected):
+    dateparser = pytest.importorskip("dateparser")
+
+    assert nlp._fast_date(text) == expected
+    phrase = nlp.DATE_RE.search(text).group(0)
+    assert dateparser.parse(phrase, languages=["ru"]) == expected
+
+
+def test_fast_path_skips_impossible_dates(monkeypatch):
+    calls = []
+    monkeypatch.setattr(nlp, "search_dates", lambda text, **kw: calls.append(text))
+    assert nlp.find_date("31.02.2024 или 1 марта 2024") == datetime(2024, 3, 1)
+    assert calls == []
+    assert nlp.find_date("уволить завтра") is None
+    assert calls == ["уволить завтра"]
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from ad.failover import CLOSED, OPEN, DirectoryUnavailable, FailoverBackend
+from ad.fake import MemoryBackend, generate_users
+
+USERS = list(generate_users(50, seed=3))
+QUERY = USERS[0].SamAccountName
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def dc(latency=0.0, error_rate=0.0):
+    return MemoryBackend(USERS, latency=latency, error_rate=error_rate, seed=1, analyzer=False)
+
+
+def run_reads(backend, count):
+    async def scenario():
+        for _ in range(count):
+            await backend.search(QUERY)
+
+    asyncio.run(scenario())
+
+
+def test_reads_prefer_fastest_dc():
+    slow, fast = dc(latency=0.02), dc(latency=0.001)
+    backend = FailoverBackend({"slow": slow, "fast": fast})
+    run_reads(backend, 10)
+    # both get measured once, then the fast one takes the traffic
+    assert slow.calls["search"] == 1
+    assert fast.calls["search"] == 9
+    assert backend.health()["fast"]["latency_ms"] < backend.health()["slow"]["latency_ms"]
+
+
+def test_failing_dc_trips_breaker_and_recovers():
+    clock = Clock()
+    broken, healthy = dc(error_rate=1.0), dc(latency=0.001)
+    backend = FailoverBackend(
+        {"broken": broken, "healthy": healthy}, failure_threshold=2, reset_timeout=30, clock=clock
+    )
+    run_reads(backend, 5)
+    assert backend.health()["broken"]["state"] == OPEN
+    assert broken.calls["search"] == 2
+    assert healthy.calls["search"] == 5
+    assert backend.stats["failovers"] == 2
+
+    broken.error_rate = 0.0
+    clock.now = 31
+    run_reads(backend, 1)  # half-open probe goes to the unmeasured-fast broken DC
+    assert backend.health()["broken"]["state"] == CLOSED
+
+
+def test_all_dcs_down():
+    backend = FailoverBackend({"a": dc(error_rate=1.0)}, failure_threshold=1)
+    with pytest.raises(ConnectionError):
+        run_reads(backend, 1)
+    with pytest.raises(DirectoryUnavailable):
+        run_reads(backend, 1)
+
+
+def test_hedged_read_uses_second_dc():
+    stalled, fast = dc(latency=0.5), dc(latency=0.001)
+    backend = FailoverBackend({"stalled": stalled, "fast": fast}, hedge_after=0.01)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        found = await backend.search(QUERY)
+        return found, loop.time() - started
+
+    found, elapsed = asyncio.run(scenario())
+    assert found[0].SamAccountName == QUERY
+    assert elapsed < 0.2
+    assert backend.stats["hedged"] == 1
+    # the cancelled request still taught us the stalled DC is slow
+    assert backend.health()["stalled"]["latency_ms"] >= 10
+
+
+def test_writes_fail_over_but_not_on_lookup_errors():
+    broken, healthy = dc(error_rate=1.0), dc()
+    backend = FailoverBackend({"broken": broken, "healthy": healthy})
+    asyncio.run(backend.disable(QUERY))
+    assert healthy.index.get(QUERY).Enabled is False
+    with pytest.raises(LookupError):
+        asyncio.run(backend.disable("ghost"))
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+
+import ad.ad_client as ad_client
+from ad.fake import MemoryBackend, generate_users
+
+
+def test_generator_is_deterministic_and_unique():
+    first = list(generate_users(2000, seed=7))
+    assert first == list(generate_users(2000, seed=7))
+    assert first != list(generate_users(2000, seed=8))
+    sams = [u.SamAccountName for u in first]
+    assert len(set(sams)) == len(sams)
+    assert all(s.isascii() for s in sams)
+    user = first[0]
+    assert len(user.DisplayName.split()) == 3
+    assert user.DistinguishedName.endswith(",OU=Users,DC=corp,DC=local")
+    assert user.Mail == f"{user.SamAccountName}@corp.local"
+
+
+def test_memory_backend_operations():
+    users = list(generate_users(500, seed=1))
+    backend = MemoryBackend(users, analyzer=False)
+    target = users[0]
+
+    async def scenario():
+        found = await backend.search(target.DisplayName)
+        await backend.disable(target.SamAccountName)
+        await backend.set_password(target.SamAccountName, "secret")
+        paged = [u async for u in backend.iter_search(target.DisplayName.split()[0], page_size=10)]
+        return found, paged, await backend.get_user(target.SamAccountName)
+
+    found, paged, updated = asyncio.run(scenario())
+    assert target in found
+    assert updated.Enabled is False
+    assert backend.passwords[target.SamAccountName.lower()] == "secret"
+    assert backend.calls["page"] == (len(paged) + 9) // 10
+    with pytest.raises(LookupError):
+        asyncio.run(backend.disable("ghost"))
+
+
+def test_injected_latency_and_errors():
+    slow = MemoryBackend(generate_users(10), latency=0.02, analyzer=False)
+    started = time.perf_counter()
+    asyncio.run(slow.search("а"))
+    assert time.perf_counter() - started >= 0.02
+
+    broken = MemoryBackend(generate_users(10), error_rate=1.0, analyzer=False)
+    with pytest.raises(ConnectionError):
+        asyncio.run(broken.search("а"))
+
+
+def test_identifier_lookup_is_exact():
+    users = list(generate_users(500, seed=4))
+    backend = MemoryBackend(users, analyzer=False)
+    previous = ad_client.set_backend(backend)
+    target = users[123]
+
+    async def scenario():
+        by_mail = await ad_client.search_candidates(target.Mail.upper())
+        by_number = await ad_client.search_candidates(target.EmployeeID)
+        by_phone = await ad_client.search_candidates(target.TelephoneNumber.replace(" ", ""))
+        return by_mail, by_number, by_phone
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        ad_client.set_backend(previous)
+    assert all([u.SamAccountName for u in found] == [target.SamAccountName] for found in results)
+    assert backend.calls["find"] == 3
+    assert backend.calls["search"] == 0
@@ -0,0 +1,38 @@
+from dataclasses import fields
+
+from ad import filters
+from ad.ad_client import ADUser
+
+
+def test_search_filter_uses_indexed_terms():
+    built = filters.search_filter("  Устинова   Наталья ")
+    assert built == filters.search_filter("устинова наталья")
+    assert "(anr=устинова наталья)" in built
+    assert "(sn=устинова наталья*)" in built
+    assert "*устинова" not in built
+    assert "(displayName=*устинова наталья*)" in filters.search_filter("Устинова Наталья", substring=True)
+
+
+def test_search_filter_escapes_and_caches():
+    filters._search_filter.cache_clear()
+    built = filters.search_filter("a*(b)\\")
+    assert "(anr=a\\2a\\28b\\29\\5c)" in built
+    filters.search_filter("A*(B)\\")
+    assert filters.cache_info() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_empty_query_lists_everybody():
+    assert filters.search_filter(" ") == "(&(objectCategory=person)(objectClass=user)(displayName=*))"
+
+
+def test_attributes_cover_user_fields():
+    assert set(filters.FIELD_ATTRIBUTES) == {f.name for f in fields(ADUser)}
+    assert "memberOf" not in filters.USER_ATTRIBUTES
+    assert filters.identifier_filter("Иванов") is None
+
+
+def test_phone_spellings_cover_typed_formats():
+    spellings = filters.phone_spellings("4951234567")
+    for typed in ("+7 (495) 123-45-67", "8 495 123 45 67", "+74951234567", "8(495)1234567", "4951234567"):
+        assert typed in spellings
+    assert filters.phone_spellings("1234567") == ["1234567"]
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+
+from ad.ad_client import ADUser
+from ad.fake import MemoryBackend
+from ad.forest import ForestBackend, dn_domain, domain_dn
+
+
+def user(sam, name, domain, enabled=True):
+    return ADUser(sam, name, f"CN={name},OU=Users,{domain_dn(domain)}", enabled)
+
+
+CORP = [user("iivanov", "Иванов Иван", "corp.local"), user("ivanova", "Иванова Анна", "corp.local")]
+EU = [user("iivanov", "Иванов Игорь", "eu.corp.local"), user("aivanov", "Иван Петров", "eu.corp.local")]
+
+
+def backend(users, latency=0.0, error_rate=0.0):
+    return MemoryBackend(users, latency=latency, error_rate=error_rate, analyzer=False)
+
+
+def test_dn_domain_round_trip():
+    assert dn_domain("CN=a\\, b,OU=x,DC=Corp,DC=Local") == "corp.local"
+    assert domain_dn("eu.corp.local") == "DC=eu,DC=corp,DC=local"
+
+
+def test_merged_ranking_is_stable():
+    forest = ForestBackend({"corp.local": backend(CORP), "eu.corp.local": backend(EU, latency=0.01)})
+    found = asyncio.run(forest.search("иван"))
+    assert [u.DisplayName for u in found] == ["Иван Петров", "Иванов Иван", "Иванов Игорь", "Иванова Анна"]
+    assert [u.DisplayName for u in asyncio.run(forest.search("иван", limit=2))] == ["Иван Петров", "Иванов Иван"]
+
+
+def test_duplicates_from_global_catalog_are_merged():
+    forest = ForestBackend({"corp.local": backend(CORP), "gc": backend(CORP + EU)})
+    found = asyncio.run(forest.search("иван"))
+    assert len(found) == 4
+
+
+def test_slow_domain_returns_partial_results():
+    forest = ForestBackend({"corp.local": backend(CORP), "eu.corp.local": backend(EU, latency=1.0)}, timeout=0.05)
+    started = time.perf_counter()
+    found = asyncio.run(forest.search("иванов"))
+    assert time.perf_counter() - started < 0.5
+    assert {u.SamAccountName for u in found} == {"iivanov", "ivanova"}
+    assert forest.stats["timeouts"] == 1
+    assert forest.stats["partial"] == 1
+
+
+def test_all_domains_failing_raises():
+    forest = ForestBackend({"corp.local": backend(CORP, error_rate=1.0)})
+    with pytest.raises(ConnectionError):
+        asyncio.run(forest.search("иван"))
+
+
+def test_writes_go_to_owning_domain():
+    corp, eu = backend(CORP), backend(EU)
+    forest = ForestBackend({"corp.local": corp, "eu.corp.local": eu})
+    asyncio.run(forest.disable("aivanov"))
+    assert eu.index.get("aivanov").Enabled is False
+    assert corp.calls["disable"] == 0
+    with pytest.raises(LookupError):
+        asyncio.run(forest.disable("iivanov"))  # exists in both domains
+    with pytest.raises(LookupError):
+        asyncio.run(forest.set_password("ghost", "x"))
+
+
+def test_write_by_bare_name_needs_every_domain():
+    corp, eu = backend(CORP), backend(EU, latency=1.0)
+    forest = ForestBackend({"corp.local": corp, "eu.corp.local": eu}, timeout=0.05)
+    # eu also has an iivanov; it is slow, so the account cannot be told apart
+    with pytest.raises(ConnectionError):
+        asyncio.run(forest.disable("iivanov"))
+    assert corp.calls["disable"] == 0
+
+
+def test_qualified_name_addresses_one_domain():
+    corp, eu = backend(CORP), backend(EU, latency=1.0)
+    forest = ForestBackend({"corp.local": corp, "eu.corp.local": eu}, timeout=0.05)
+    name = forest.account_name(CORP[0])
+    assert name == "corp.local\\iivanov"
+    asyncio.run(forest.disable(name))
+    assert corp.index.get("iivanov").Enabled is False
+    assert asyncio.run(forest.get_user(name)).DisplayName == "Иванов Иван"
+    with pytest.raises(LookupError):
+        asyncio.run(forest.disable("other.local\\iivanov"))
+
+
+class CappedBackend(MemoryBackend):
+    """Unpaged searches stop at ``cap`` entries, like AD's MaxPageSize."""
+
+    cap = 2
+
+    async def search(self, query, limit=None):
+        return (await super().search(query, limit))[: self.cap]
+
+
+def test_iter_search_pages_every_domain():
+    corp = CappedBackend(CORP + [user("ppetrov", "Петров Пётр", "corp.local")], analyzer=False)
+    forest = ForestBackend({"corp.local": corp, "gc": backend(CORP + EU)})
+
+    async def scenario():
+        return [u async for u in forest.iter_search("", page_size=1)]
+
+    found = asyncio.run(scenario())
+    assert len(found) == 5
+    assert "ppetrov" in {u.SamAccountName for u in found}
+
+
+def test_iter_search_raises_when_a_domain_fails():
+    forest = ForestBackend({"corp.local": backend(CORP), "eu.corp.local": backend(EU, error_rate=1.0)})
+
+    async def scenario():
+        return [u async for u in forest.iter_search("")]
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(scenario())
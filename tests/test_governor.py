@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+import ad.ad_client as ad_client
+from ad.governor import BULK, INTERACTIVE, WriteGovernor
+
+
+def test_burst_is_granted_without_waiting():
+    async def scenario():
+        governor = WriteGovernor(rate=10, burst=3)
+        waits = [await governor.acquire() for _ in range(3)]
+        return governor, waits
+
+    governor, waits = asyncio.run(scenario())
+    assert waits == [0.0, 0.0, 0.0]
+    assert governor.metrics()["interactive_granted"] == 3
+
+
+def test_rate_is_enforced():
+    async def scenario():
+        governor = WriteGovernor(rate=100, burst=1)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(governor.acquire(BULK) for _ in range(6)))
+        return loop.time() - started, governor.metrics()
+
+    elapsed, metrics = asyncio.run(scenario())
+    assert elapsed >= 0.045
+    assert metrics["bulk_granted"] == 6
+    assert metrics["bulk_wait_max_ms"] > 0
+    assert metrics["bulk_queue"] == 0
+
+
+def test_interactive_lane_jumps_bulk_queue():
+    async def scenario():
+        governor = WriteGovernor(rate=50, burst=1)
+        order = []
+
+        async def write(name, priority):
+            await governor.acquire(priority)
+            order.append(name)
+
+        bulk = [asyncio.create_task(write(f"bulk{i}", BULK)) for i in range(5)]
+        await asyncio.sleep(0)
+        depth = governor.queue_depth(BULK)
+        await write("admin", INTERACTIVE)
+        await asyncio.gather(*bulk)
+        return order, depth
+
+    order, depth = asyncio.run(scenario())
+    assert depth == 4
+    assert order.index("admin") <= 2
+
+
+def test_cancelled_waiter_does_not_consume_token():
+    async def scenario():
+        governor = WriteGovernor(rate=50, burst=1)
+        await governor.acquire(BULK)
+        waiter = asyncio.create_task(governor.acquire(BULK))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.wait_for(governor.acquire(BULK), 1)
+        return governor.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["bulk_granted"] == 2
+    assert metrics["bulk_queue"] == 0
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        WriteGovernor(rate=0)
+    with pytest.raises(ValueError):
+        asyncio.run(WriteGovernor(rate=1).acquire(priority=7))
+
+
+def test_bulk_operations_use_bulk_lane():
+    governor = WriteGovernor(rate=1000, burst=2)
+    previous = ad_client.set_write_governor(governor)
+
+    async def scenario():
+        await ad_client.disable_users(["nustinova", "nustinovam"])
+        await ad_client.reset_password("nustinova")
+
+    try:
+        asyncio.run(scenario())
+        stats = ad_client.cache_stats()
+    finally:
+        ad_client.set_write_governor(previous)
+        ad_client.set_backend(ad_client.DemoBackend())
+    assert stats["writes"]["bulk_granted"] == 2
+    assert stats["writes"]["interactive_granted"] == 1
@@ -0,0 +1,82 @@
+import asyncio
+
+from ad.groups import GroupBatch, GroupChange, GroupMembership, GroupSync
+
+ADMINS = "CN=Bot Admins,OU=Groups,DC=corp,DC=local"
+HELPDESK = "CN=Helpdesk,OU=Groups,DC=corp,DC=local"
+NAT = "CN=Nat,OU=Users,DC=corp,DC=local"
+IVAN = "CN=Ivan,OU=Users,DC=corp,DC=local"
+
+
+def test_nested_membership_is_transitive():
+    groups = GroupMembership()
+    groups.set_members(ADMINS, [HELPDESK])
+    groups.set_members(HELPDESK, [NAT])
+    assert groups.is_member(NAT.upper(), ADMINS)
+    assert groups.is_member(HELPDESK, ADMINS)
+    assert not groups.is_member(IVAN, ADMINS)
+    assert groups.member_of_any(NAT, ["CN=Other,DC=corp,DC=local", ADMINS])
+
+
+def test_cycles_terminate():
+    groups = GroupMembership()
+    groups.set_members(ADMINS, [HELPDESK])
+    groups.set_members(HELPDESK, [ADMINS, NAT])
+    assert groups.members(ADMINS) == {HELPDESK.lower(), ADMINS.lower(), NAT.lower()}
+
+
+def test_closure_is_memoised_and_invalidated_precisely():
+    groups = GroupMembership()
+    other = "CN=Other,DC=corp,DC=local"
+    groups.set_members(ADMINS, [HELPDESK])
+    groups.set_members(HELPDESK, [NAT])
+    groups.set_members(other, [IVAN])
+    for _ in range(3):
+        groups.is_member(NAT, ADMINS)
+        groups.is_member(IVAN, other)
+    assert groups.stats["computed"] == 2
+
+    groups.set_members(HELPDESK, [IVAN])  # nested change drops only the admins closure
+    assert groups.is_member(IVAN, ADMINS)
+    assert not groups.is_member(NAT, ADMINS)
+    groups.is_member(IVAN, other)
+    assert groups.stats["computed"] == 3
+
+    groups.set_members(HELPDESK, [IVAN])  # no-op
+    groups.remove_group(HELPDESK)
+    assert not groups.is_member(IVAN, ADMINS)
+
+
+class FakeGroupFeed:
+    def __init__(self):
+        self.cursors = []
+        self.batches = [
+            GroupBatch([GroupChange(ADMINS, [HELPDESK]), GroupChange(HELPDESK, [NAT])], "10", full=True),
+            GroupBatch([GroupChange(HELPDESK, [IVAN])], "11"),
+            GroupBatch([GroupChange(ADMINS, [NAT])], "12", full=True),
+        ]
+
+    async def changes(self, cursor):
+        self.cursors.append(cursor)
+        return self.batches.pop(0)
+
+
+def test_sync_applies_batches_and_rereads_periodically():
+    feed = FakeGroupFeed()
+    groups = GroupMembership()
+    sync = GroupSync(feed, groups, full_every=3)
+
+    async def scenario():
+        await sync.sync_once()
+        first = groups.is_member(NAT, ADMINS)
+        await sync.sync_once()
+        second = groups.is_member(NAT, ADMINS), groups.is_member(IVAN, ADMINS)
+        await sync.sync_once()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is True
+    assert second == (False, True)
+    assert feed.cursors == [None, "10", None]
+    assert len(groups) == 1
+    assert groups.is_member(NAT, ADMINS)
@@ -33,6 +33,7 @@ def handlers_with_db(monkeypatch):
     monkeypatch.setattr(handlers, "add_admin", db.add_admin)
     monkeypatch.setattr(handlers, "remove_admin", db.remove_admin)
     monkeypatch.setattr(handlers, "list_admins", db.list_admins)
+    monkeypatch.setattr(handlers, "link_account", db.link_account)
     monkeypatch.setattr(handlers, "SUPERADMIN_ID", db.SUPERADMIN_ID)
     return handlers, db
 
@@ -49,3 +50,113 @@ def test_super_cb_add_and_remove(handlers_with_db):
     update.callback_query.data = "super:remove:42"
     asyncio.run(handlers.super_cb(update, None))
     assert db.list_admins(actor=1) == []
+
+
+def test_ad_stats_admin_only(handlers_with_db):
+    handlers, _db = handlers_with_db
+    message = DummyMessage()
+    update = types.SimpleNamespace(message=message, effective_user=DummyUser(2))
+    asyncio.run(handlers.ad_stats_cmd(update, None))
+    assert message.texts[-1][0] == "Access denied"
+
+    update.effective_user = DummyUser(1)
+    asyncio.run(handlers.ad_stats_cmd(update, None))
+    text = message.texts[-1][0]
+    assert "search: hits=" in text
+    assert "coalesced=" in text
+
+
+def test_ad_callback_resolves_user_first(handlers_with_db):
+    handlers, _db = handlers_with_db
+    message = DummyMessage()
+    update = types.SimpleNamespace(callback_query=DummyCallbackQuery("disable:ghost", message))
+    asyncio.run(handlers.ad_callback(update, None))
+    assert message.texts[-1][0] == "User ghost not found"
+
+    update.callback_query.data = "disable:NUSTINOVA"
+    asyncio.run(handlers.ad_callback(update, None))
+    assert message.texts[-1][0] == "User nustinova disabled"
+
+
+def test_ad_callback_addresses_account_by_guid(handlers_with_db, monkeypatch):
+    handlers, _db = handlers_with_db
+    from ad.ad_client import ADUser
+
+    user = ADUser("iivanov", "Иванов Иван", "CN=Ivan,DC=eu,DC=corp", True, ObjectGUID="0b9a3c34-6d1f-4b8e-9f0e-2a7d1c5e8f11")
+    disabled = []
+
+    async def by_guid(guid):
+        return user if guid == user.ObjectGUID else None
+
+    async def disable(name):
+        disabled.append(name)
+
+    monkeypatch.setattr(handlers, "get_user_by_guid", by_guid)
+    monkeypatch.setattr(handlers, "account_name", lambda u: "eu.corp\\" + u.SamAccountName)
+    monkeypatch.setattr(handlers, "disable_user", disable)
+    message = DummyMessage()
+    update = types.SimpleNamespace(callback_query=DummyCallbackQuery(f"disable:{user.ObjectGUID}", message))
+    asyncio.run(handlers.ad_callback(update, None))
+    assert disabled == ["eu.corp\\iivanov"]
+    assert message.texts[-1][0] == "User iivanov disabled"
+
+
+def test_ad_callback_reports_write_errors(handlers_with_db, monkeypatch):
+    handlers, _db = handlers_with_db
+
+    async def refuse(sam):
+        raise RuntimeError("insufficient access rights")
+
+    monkeypatch.setattr(handlers, "reset_password", refuse)
+    message = DummyMessage()
+    update = types.SimpleNamespace(callback_query=DummyCallbackQuery("reset:nustinova", message))
+    asyncio.run(handlers.ad_callback(update, None))
+    assert message.texts[-1][0] == "Failed to reset nustinova: insufficient access rights"
+
+
+def test_link_ad_superadmin_only(handlers_with_db):
+    handlers, db = handlers_with_db
+    message = DummyMessage()
+    context = types.SimpleNamespace(args=["5", "NUSTINOVA"])
+    update = types.SimpleNamespace(message=message, effective_user=DummyUser(2))
+    asyncio.run(handlers.link_ad_cmd(update, context))
+    assert message.texts[-1][0] == "Access denied"
+
+    update.effective_user = DummyUser(1)
+    asyncio.run(handlers.link_ad_cmd(update, context))
+    assert message.texts[-1][0] == "5 linked to nustinova"
+    assert db.get_account(5) == ("nustinova", "CN=Nat,OU=Users,DC=corp,DC=local")
+
+
+def test_disable_subtree_needs_confirmation(handlers_with_db, monkeypatch):
+    handlers, db = handlers_with_db
+    from ad.ad_client import ADUser
+    from ad.hierarchy import OrgChart
+
+    def person(sam, manager=""):
+        return ADUser(sam, sam.title(), f"CN={sam},DC=corp", sam != "gone", Manager=manager and f"CN={manager},DC=corp")
+
+    chart = OrgChart([person("boss"), person("a", "boss"), person("b", "a"), person("gone", "a")])
+
+    async def fake_chart():
+        return chart
+
+    scheduled = []
+    monkeypatch.setattr(handlers, "org_chart", fake_chart)
+    monkeypatch.setattr(handlers, "is_admin", db.is_admin)
+    monkeypatch.setattr(
+        handlers, "schedule_disable_jobs", lambda sams, run_dt, **kw: scheduled.append((sams, run_dt)) or len(sams)
+    )
+    message = DummyMessage()
+    update = types.SimpleNamespace(message=message, effective_user=DummyUser(1))
+    asyncio.run(handlers.disable_subtree_cmd(update, types.SimpleNamespace(args=["boss", "01.07.2025"])))
+    text, markup = message.texts[-1]
+    assert text.startswith("Everyone under Boss (2)")
+    assert scheduled == []
+
+    data = markup.inline_keyboard[0][0].callback_data
+    update = types.SimpleNamespace(callback_query=DummyCallbackQuery(data, message), effective_user=DummyUser(1))
+    asyncio.run(handlers.subtree_cb(update, None))
+    assert scheduled[0][0] == ["a", "b"]
+    assert scheduled[0][1].day == 1 and scheduled[0][1].hour == 16
+    assert message.texts[-1][0] == "Scheduled 2 accounts for 01.07.2025"
@@ -0,0 +1,75 @@
+import asyncio
+
+import ad.ad_client as ad_client
+from ad.ad_client import ADUser
+from ad.fake import MemoryBackend, generate_users
+from ad.hierarchy import OrgChart
+
+
+def person(sam, manager=""):
+    return ADUser(sam, sam.title(), f"CN={sam},OU=Users,DC=corp,DC=local", True, Manager=manager and f"CN={manager},OU=Users,DC=corp,DC=local")
+
+
+def brute_force_under(users, who, manager):
+    by_dn = {u.DistinguishedName.lower(): u for u in users}
+    seen = set()
+    current = next(u for u in users if u.SamAccountName == who)
+    while current.Manager and current.Manager.lower() in by_dn and current.SamAccountName not in seen:
+        seen.add(current.SamAccountName)
+        current = by_dn[current.Manager.lower()]
+        if current.SamAccountName == manager:
+            return True
+    return False
+
+
+def test_subtree_matches_brute_force():
+    users = list(generate_users(300, seed=5, span=3))
+    chart = OrgChart(users)
+    sams = [u.SamAccountName for u in users]
+    for manager in sams[:40:3]:
+        below = {u.SamAccountName for u in chart.subtree(manager)}
+        assert below == {s for s in sams if brute_force_under(users, s, manager)}
+        assert all(chart.is_under(s, manager) == (s in below) for s in sams)
+
+
+def test_reports_chain_and_lookup_by_dn():
+    users = [person("ceo"), person("cto", "ceo"), person("dev1", "cto"), person("dev2", "cto"), person("cfo", "ceo")]
+    chart = OrgChart(users)
+    assert [u.SamAccountName for u in chart.reports("CEO")] == ["cto", "cfo"]
+    assert [u.SamAccountName for u in chart.subtree("cto", include_manager=True)] == ["cto", "dev1", "dev2"]
+    assert [u.SamAccountName for u in chart.chain("dev2")] == ["cto", "ceo"]
+    assert chart.is_under("CN=dev1,OU=Users,DC=corp,DC=local", "ceo")
+    assert not chart.is_under("cfo", "cto")
+    assert not chart.is_under("ceo", "ceo")
+    assert chart.subtree("ghost") == []
+
+
+def test_manager_cycles_and_unknown_managers():
+    users = [person("a", "b"), person("b", "a"), person("c", "a"), person("d", "ghost")]
+    chart = OrgChart(users)
+    assert len(chart) == 4
+    assert chart.is_under("c", "a")
+    assert chart.subtree("d") == []
+    assert len(chart.chain("c")) == 2
+
+
+def test_org_chart_survives_writes_until_a_sync():
+    users = list(generate_users(50, seed=1))
+    previous = ad_client.set_backend(MemoryBackend(users, analyzer=False))
+
+    async def scenario():
+        first = await ad_client.org_chart()
+        await ad_client.disable_user(users[10].SamAccountName)
+        await ad_client.reset_password(users[11].SamAccountName)
+        again = await ad_client.org_chart()
+        ad_client.invalidate_org_chart()
+        return first, again, await ad_client.org_chart()
+
+    try:
+        first, again, rebuilt = asyncio.run(scenario())
+    finally:
+        ad_client.set_backend(previous)
+    assert first is again
+    assert rebuilt is not first
+    assert len(rebuilt.subtree(users[0].SamAccountName)) == 49
+    assert rebuilt.get(users[10].SamAccountName).Enabled is False
@@ -0,0 +1,126 @@
+import random
+import sys
+import threading
+
+from ad.ad_client import ADUser
+from ad.index import DirectoryIndex, INDEXED_FIELDS, MIN_SUBSTRING_QUERY
+
+SURNAMES = ["Устинова", "Устинов", "Иванов", "Петрова", "Сидоров", "Ус", "Кузнецова"]
+NAMES = ["Наталья", "Марина", "Иван", "Пётр", "Анна", "Ян"]
+
+
+def make_users(n=300, seed=1):
+    rnd = random.Random(seed)
+    users = []
+    for i in range(n):
+        surname, name = rnd.choice(SURNAMES), rnd.choice(NAMES)
+        sam = f"u{i}{surname[:2].lower()}"
+        users.append(ADUser(sam, f"{surname} {name}", f"CN={sam},OU=Users,DC=corp,DC=local", True, f"{sam}@corp.local"))
+    return users
+
+
+def reference(users, query):
+    q = query.lower()
+    if 0 < len(q) < MIN_SUBSTRING_QUERY:
+        return {u.SamAccountName for u in users if q in u.DisplayName.lower().split()}
+    return {u.SamAccountName for u in users if any(q in getattr(u, f).lower() for f in INDEXED_FIELDS)}
+
+
+def test_matches_linear_scan():
+    users = make_users()
+    index = DirectoryIndex(users, analyzer=False)
+    for query in ["устинова", "Уст", "ус", "у", "ова на", "u1", "@corp", "ян", "нет такого", ""]:
+        assert {u.SamAccountName for u in index.search(query)} == reference(users, query)
+
+
+def test_ranking_and_limit():
+    users = [
+        ADUser("a", "Иванова Анна", "CN=a", True),
+        ADUser("b", "Петров Иван", "CN=b", True),
+        ADUser("c", "Иван", "CN=c", True),
+        ADUser("d", "Ивантеев Пётр", "CN=d", True),
+        ADUser("e", "Кривандин Олег", "CN=e", True),
+    ]
+    index = DirectoryIndex(users, analyzer=False)
+    assert [u.SamAccountName for u in index.search("иван")] == ["c", "a", "d", "b", "e"]
+    assert [u.SamAccountName for u in index.search("иван", limit=2)] == ["c", "a"]
+
+
+def test_replace_and_remove():
+    users = make_users(50)
+    index = DirectoryIndex(users, analyzer=False)
+    first = users[0]
+    index.add(ADUser(first.SamAccountName, "Новое Имя", first.DistinguishedName, False))
+    assert len(index) == 50
+    assert index.get(first.SamAccountName).DisplayName == "Новое Имя"
+    assert first.SamAccountName in {u.SamAccountName for u in index.search("новое")}
+    assert index.remove(first.SamAccountName) is True
+    assert index.remove(first.SamAccountName) is False
+    assert index.search("новое") == []
+    assert len(index) == 49
+    assert {u.SamAccountName for u in index.search("ова")} == reference(users[1:], "ова")
+
+
+def test_transliterated_and_wrong_layout_queries():
+    users = [
+        ADUser("nust", "Устинова Наталья", "CN=nust", True),
+        ADUser("ajuk", "Жукова Юлия", "CN=ajuk", True),
+        ADUser("jsmith", "John Smith", "CN=jsmith", True),
+    ]
+    index = DirectoryIndex(users, analyzer=False)
+    for query in ["ustinova", "Ustinova Natalya", "ustin", "Ecnbyjdf", "ecnby yfn", "zhukova iuliia", "yuliya"]:
+        assert [u.SamAccountName for u in index.search(query)] in (["nust"], ["ajuk"]), query
+    assert [u.SamAccountName for u in index.search("ощрт")] == ["jsmith"]
+    assert index.search("ec") == []
+
+
+def test_respelled_matches_rank_last_and_are_removed():
+    users = [ADUser("a", "Устинова Анна", "CN=a", True), ADUser("ustinova", "Иванова Анна", "CN=b", True)]
+    index = DirectoryIndex(users, analyzer=False)
+    assert [u.SamAccountName for u in index.search("ustinova")] == ["ustinova", "a"]
+    index.remove("a")
+    assert [u.SamAccountName for u in index.search("ustinova")] == ["ustinova"]
+    assert index.search("ecnbyjdf") == []
+
+
+def test_lookup_by_guid():
+    guid = "0b9a3c34-6d1f-4b8e-9f0e-2a7d1c5e8f11"
+    index = DirectoryIndex([ADUser("a", "Иванова Анна", "CN=a", True, ObjectGUID=guid)], analyzer=False)
+    assert index.get_by_guid("{" + guid.upper() + "}").SamAccountName == "a"
+    index.add(ADUser("a", "Иванова Анна", "CN=a", False))
+    assert index.get_by_guid(guid) is None
+
+
+def test_find_by_identifier():
+    users = [
+        ADUser("a", "Иванова Анна", "CN=a", True, "anna@corp.local", EmployeeID="004512", TelephoneNumber="+7 (495) 123-45-67"),
+        ADUser("b", "Петров Иван", "CN=b", True, "ivan@corp.local", EmployeeID="4513", TelephoneNumber="8 495 765 43 21"),
+    ]
+    index = DirectoryIndex(users, analyzer=False)
+    assert [u.SamAccountName for u in index.find("ANNA@corp.local")] == ["a"]
+    assert [u.SamAccountName for u in index.find("004512")] == ["a"]
+    assert [u.SamAccountName for u in index.find("84951234567")] == ["a"]
+    assert [u.SamAccountName for u in index.find("+7 495 765-43-21")] == ["b"]
+    assert index.find("Иванова") == []
+    index.remove("a")
+    assert index.find("004512") == []
+
+
+def test_snapshot_is_not_torn_by_later_patches():
+    users = make_users(400)
+    index = DirectoryIndex(users, analyzer=False)
+    snapshot = index.snapshot()
+    seen = []
+    reader = threading.Thread(target=lambda: seen.extend(snapshot))
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        reader.start()
+        for i, user in enumerate(users):
+            # frees a row and refills it with another user
+            index.remove(user.SamAccountName)
+            index.add(ADUser(f"x{i}", "Иванов Иван", f"CN=x{i},OU=Users,DC=corp,DC=local", True, f"x{i}@corp.local"))
+        reader.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert seen == users
@@ -4,6 +4,7 @@ from email.message import EmailMessage
 from datetime import datetime
 import types
 import sys
+import time
 
 import pytest
 
@@ -57,6 +58,7 @@ def test_mail_checker_marks_seen(monkeypatch, caplog):
     monkeypatch.setenv("IMAP_HOST", "host")
     monkeypatch.setenv("IMAP_USER", "user")
     monkeypatch.setenv("IMAP_PASS", "pass")
+    monkeypatch.setenv("MAIL_PARSE_WORKERS", "0")
 
     monkeypatch.setattr(mc.imaplib, "IMAP4_SSL", lambda host: fake)
     monkeypatch.setattr(mc, "parse_hr_mail", lambda msg: ("User", datetime(2024, 1, 1)))
@@ -66,7 +68,7 @@ def test_mail_checker_marks_seen(monkeypatch, caplog):
         mc, "schedule_disable_job", lambda *args, **kwargs: scheduled.append(args)
     )
 
-    async def fake_search(_query):
+    async def fake_search(_query, limit=None):
         return [types.SimpleNamespace(SamAccountName="user1")]
 
     monkeypatch.setattr(mc, "search_candidates", fake_search)
@@ -85,3 +87,117 @@ def test_mail_checker_marks_seen(monkeypatch, caplog):
     assert len(scheduled) == 1
     assert scheduled[0][0] == "user1"
     assert any("id1" in msg for msg in caplog.messages)
+
+
+def _hr_mail(body, sender="hr@corp.local"):
+    m = EmailMessage()
+    m["From"] = sender
+    m["Message-ID"] = "<hr>"
+    m.set_content(body)
+    return m
+
+
+def test_find_employee_prefers_exact_identifier(monkeypatch):
+    users = {
+        "004512": [types.SimpleNamespace(SamAccountName="iivanov", DisplayName="Иванов Иван Иванович")],
+        "+7 (495) 100-00-01": [types.SimpleNamespace(SamAccountName="hrboss", DisplayName="Петрова Анна")],
+    }
+    queries = []
+
+    async def fake_search(query, limit=None):
+        queries.append(query)
+        return users.get(query, [])
+
+    monkeypatch.setattr(mc, "search_candidates", fake_search)
+    msg = _hr_mail("Уволить Иванов Иван Иванович, таб. № 004512, с 1 июля.\nHR: hr@corp.local, +7 (495) 100-00-01")
+    found = asyncio.run(mc.find_employee(msg, "Иванов Иван Иванович"))
+    assert [u.SamAccountName for u in found] == ["iivanov"]
+    # the sender's own account is looked up first
+    assert queries == ["hr@corp.local", "004512"]
+
+    # the signature phone resolves to somebody else and is ignored
+    msg = _hr_mail("Уволить Иванов Иван Иванович с 1 июля.\nHR: +7 (495) 100-00-01")
+    assert asyncio.run(mc.find_employee(msg, "Иванов Иван Иванович")) == []
+    assert queries[-1] == "Иванов Иван Иванович"
+
+
+def test_find_employee_without_fio_ignores_signature(monkeypatch):
+    hr = types.SimpleNamespace(
+        SamAccountName="hrboss", DisplayName="Петрова Анна", Mail="hr@corp.local", TelephoneNumber="+7 (495) 111-22-33"
+    )
+    nat = types.SimpleNamespace(SamAccountName="nustinova", DisplayName="Устинова Наталья", Mail="nustinova@corp.local")
+    users = {
+        "hr@corp.local": [hr],
+        "+7 (495) 111-22-33": [hr],
+        "8 495 111 22 33": [hr],
+        "nustinova@corp.local": [nat],
+    }
+    queries = []
+
+    async def fake_search(query, limit=None):
+        queries.append(query)
+        return users.get(query, [])
+
+    monkeypatch.setattr(mc, "search_candidates", fake_search)
+    signature = "\nС уважением,\nПетрова Анна\n+7 (495) 111-22-33"
+    msg = _hr_mail("Прошу уволить Устинову Н.П. с 01.07.2024." + signature)
+    assert asyncio.run(mc.find_employee(msg, None)) == []
+    assert "+7 (495) 111-22-33" not in queries
+
+    # the sender's own phone outside a recognised signature is skipped too
+    msg = _hr_mail("Прошу уволить Устинову Н.П. с 01.07.2024, вопросы по 8 495 111 22 33")
+    assert asyncio.run(mc.find_employee(msg, None)) == []
+
+    # an identifier is accepted once the surname confirms it
+    msg = _hr_mail("Прошу уволить Устинову Н.П. (nustinova@corp.local) с 01.07.2024." + signature)
+    assert [u.SamAccountName for u in asyncio.run(mc.find_employee(msg, None))] == ["nustinova"]
+
+    # a mail naming nobody is never resolved by identifier alone
+    queries.clear()
+    msg = _hr_mail("Заблокировать nustinova@corp.local с 01.07.2024")
+    assert asyncio.run(mc.find_employee(msg, None)) == []
+    assert queries == []
+
+
+def test_slow_mail_does_not_block_the_loop(monkeypatch):
+    def slow_parse(msg):
+        time.sleep(0.3)
+        return "User", None
+
+    monkeypatch.setattr(mc, "parse_hr_mail", slow_parse)
+    pool = mc.MailParsePool(workers=0, timeout=0.1)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        with pytest.raises(TimeoutError):
+            await asyncio.gather(pool.parse(_hr_mail("x").as_bytes()), ticker())
+
+    asyncio.run(scenario())
+    assert len(ticks) == 5
+    assert pool.stats["timeouts"] == 1
+
+
+def test_process_pool_parses_and_restarts_after_timeout():
+    pytest.importorskip("dateparser")
+    raw = _hr_mail("Просьба уволить Иванов Иван Иванович 1 июля 2024").as_bytes()
+    pool = mc.MailParsePool(workers=1, timeout=0.001)
+
+    async def scenario():
+        # Spawning a worker takes far longer than the timeout.
+        with pytest.raises(TimeoutError):
+            await pool.parse(raw)
+        pool.timeout = 60
+        return await pool.parse(raw)
+
+    try:
+        fio, date = asyncio.run(scenario())
+    finally:
+        pool.close()
+    assert fio == "Иванов Иван Иванович"
+    assert date == datetime(2024, 7, 1)
+    assert pool.stats == {"parsed": 1, "timeouts": 1, "restarts": 1}
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ad.ad_client import ADUser
+from ad.index import DirectoryIndex
+import ad.morph as morph
+from ad.morph import NameForms
+
+# word -> (normal form, gender, grammemes, forms of the lexeme)
+LEXEMES = {
+    "устинова": ("устинов", "femn", {"Surn"}, ["устинова", "устиновой", "устинову"]),
+    "устинов": ("устинов", "masc", {"Surn"}, ["устинов", "устинова", "устинову", "устиновым"]),
+    "наталья": ("наталья", "femn", {"Name"}, ["наталья", "натальи", "наталье", "натальей"]),
+    "иван": ("иван", "masc", {"Name"}, ["иван", "ивана", "ивану"]),
+}
+
+
+class FakeAnalyzer:
+    """Minimal stand-in for ``pymorphy3.MorphAnalyzer``."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _parse(self, word, lemma):
+        normal, gender, grammemes, forms = LEXEMES[lemma]
+        tag = SimpleNamespace(gender=gender, grammemes=grammemes)
+        lexeme = [SimpleNamespace(word=f, tag=tag) for f in forms]
+        return SimpleNamespace(word=word, normal_form=normal, tag=tag, lexeme=lexeme)
+
+    def parse(self, word):
+        self.calls += 1
+        return [self._parse(word, lemma) for lemma, entry in LEXEMES.items() if word in entry[3]]
+
+
+def users():
+    return [
+        ADUser("nustinova", "Устинова Наталья", "CN=nustinova", True),
+        ADUser("pustinov", "Устинов Пётр", "CN=pustinov", True),
+        ADUser("iivanov", "Иванов Иван", "CN=iivanov", True),
+    ]
+
+
+def test_oblique_case_resolves_to_nominative_tokens():
+    index = DirectoryIndex(users(), analyzer=FakeAnalyzer())
+    assert [u.SamAccountName for u in index.search("Устиновой Натальи")] == ["nustinova"]
+    assert [u.SamAccountName for u in index.search("ивану")] == ["iivanov"]
+    # "устинова" is also the genitive of "устинов": substring match first
+    assert [u.SamAccountName for u in index.search("устинова")] == ["nustinova", "pustinov"]
+
+
+def test_forms_are_precomputed_once():
+    analyzer = FakeAnalyzer()
+    forms = NameForms(analyzer)
+    forms.add_tokens(["устинова", "наталья"])
+    forms.warm()
+    calls = analyzer.calls
+    assert forms.resolve("натальей") == {"наталья"}
+    assert forms.resolve("устиновой") == {"устинова"}
+    assert analyzer.calls == calls
+
+
+def test_without_morphology_only_exact_tokens():
+    index = DirectoryIndex(users(), analyzer=False)
+    assert index.search("Устиновой Натальи") == []
+    assert [u.SamAccountName for u in index.search("Наталья Устинова")] == ["nustinova"]
+
+
+def test_resolve_leaves_parsing_to_warm():
+    analyzer = FakeAnalyzer()
+    forms = NameForms(analyzer)
+    forms.add_tokens(["устинова"])
+    assert forms.resolve("устинова") == {"устинова"}
+    assert analyzer.calls == 0
+    assert forms.pending == 1
+    forms.warm()
+    assert forms.resolve("устиновой") == {"устинова"}
+    assert forms.pending == 0
+
+
+def test_real_analyzer_inflects_names():
+    pymorphy3 = pytest.importorskip("pymorphy3")
+    index = DirectoryIndex(users(), analyzer=pymorphy3.MorphAnalyzer(lang="ru"))
+    assert index.names.resolve("устиновой") == {"устинова"}
+    assert [u.SamAccountName for u in index.search("Устиновой Натальи")] == ["nustinova"]
+    assert index.names.resolve("натальей") == {"наталья"}
+
+
+def test_resolve_never_loads_the_shared_analyzer(monkeypatch):
+    monkeypatch.setattr(morph, "_analyzer", None)
+    monkeypatch.setattr(morph, "get_analyzer", lambda: pytest.fail("analyzer loaded by resolve"))
+    forms = NameForms()
+    forms.add_tokens(["устинова"])
+    assert forms.resolve("устинова") == {"устинова"}
+    assert forms.resolve("устиновой") == frozenset()
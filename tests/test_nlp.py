@@ -1,7 +1,10 @@
 from email.message import EmailMessage
 from datetime import datetime
 
-from ai.nlp import parse_hr_mail
+import pytest
+
+import ai.nlp as nlp
+from ai.nlp import HRMailParser, compile_aliases, parse_command, parse_hr_mail, parse_hr_mails
 
 
 def test_parse_hr_mail_valid():
@@ -19,3 +22,64 @@ def test_parse_hr_mail_invalid():
     fio, date = parse_hr_mail(msg)
     assert fio is None
     assert date is None
+
+
+def test_parse_command_prefers_longest_alias():
+    assert parse_command("Reset Password") == ("reset", [])
+    assert parse_command("  reset   password  ivanov ") == ("reset", ["ivanov"])
+    assert parse_command("RESET ivanov petr") == ("reset", ["ivanov", "petr"])
+    assert parse_command("Admin Menu") == ("admin", [])
+
+
+def test_parse_command_russian_aliases():
+    assert parse_command("Сбросить пароль Иванов") == ("reset", ["Иванов"])
+    assert parse_command("заблокировать устинову") == ("disable", ["устинову"])
+    assert parse_command("Список задач") == ("jobs", [])
+
+
+def test_parse_command_needs_whole_words():
+    assert parse_command("resetting x") == ("", ["resetting x"])
+    assert parse_command("hello") == ("", ["hello"])
+
+
+def test_compile_aliases_orders_by_length():
+    pattern = compile_aliases({"a": "x", "a b": "y"})
+    assert pattern.match("A   B c").group(1) == "A   B"
+
+
+def _mail(body, msg_id=None):
+    msg = EmailMessage()
+    if msg_id:
+        msg["Message-ID"] = msg_id
+    msg.set_content(body)
+    return msg
+
+
+def test_parse_hr_mails_streams_messages_and_bytes(monkeypatch):
+    fallback = []
+    monkeypatch.setattr(nlp, "search_dates", lambda text, **kw: fallback.append(kw) or [("завтра", datetime(2024, 7, 2))])
+    mails = iter(
+        [
+            _mail("Просьба уволить Иванов Иван Иванович 1 июля 2024", "<a>"),
+            _mail("Просьба уволить Петров Петр Петрович завтра", "<b>").as_bytes(),
+            _mail("Просто письмо"),
+        ]
+    )
+    results = parse_hr_mails(mails)
+    assert next(results) == ("<a>", "Иванов Иван Иванович", datetime(2024, 7, 1), 1.0)
+    assert fallback == []
+    assert list(results) == [
+        ("<b>", "Петров Петр Петрович", datetime(2024, 7, 2), 0.7),
+        (None, None, datetime(2024, 7, 2), 0.3),
+    ]
+    assert fallback[0]["languages"] == ["ru"]
+
+
+def test_parser_settings_are_built_once(monkeypatch):
+    pytest.importorskip("dateparser")
+    seen = []
+    monkeypatch.setattr(nlp, "search_dates", lambda text, **kw: seen.append(kw["settings"]))
+    parser = HRMailParser(settings={"PREFER_DATES_FROM": "future"})
+    list(parse_hr_mails([_mail("уволить завтра"), _mail("уволить в пятницу")], parser=parser))
+    assert seen[0] is seen[1]
+    assert seen[0].PREFER_DATES_FROM == "future"
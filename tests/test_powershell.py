@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from ad.powershell import PowerShellBackend, PowerShellError, PowerShellPool
+
+STANDIN = [sys.executable, os.path.join(os.path.dirname(__file__), "ps_standin.py")]
+
+
+def run(scenario):
+    return asyncio.run(scenario)
+
+
+def test_commands_reuse_one_host():
+    async def scenario():
+        backend = PowerShellBackend(PowerShellPool(STANDIN, size=1))
+        try:
+            pids = {await backend.pool.run("pid") for _ in range(3)}
+            users = await backend.search("устинова")
+            await backend.disable("nustinova")
+            user = await backend.get_user_by_guid("0b9a3c34-6d1f-4b8e-9f0e-2a7d1c5e8f11")
+            return pids, users, user, dict(backend.pool.stats)
+        finally:
+            await backend.close()
+
+    pids, users, user, stats = run(scenario())
+    assert len(pids) == 1
+    assert [u.SamAccountName for u in users] == ["nustinova"]
+    assert user.Enabled is False
+    assert user.ObjectGUID == "0b9a3c34-6d1f-4b8e-9f0e-2a7d1c5e8f11"
+    assert user.Manager == "CN=Boss,OU=Users,DC=corp,DC=local"
+    assert (user.EmployeeID, user.TelephoneNumber) == ("004512", "+7 (495) 123-45-67")
+    assert stats["started"] == 1
+
+
+def test_host_is_recycled_after_max_ops():
+    async def scenario():
+        pool = PowerShellPool(STANDIN, size=1, max_ops=2)
+        try:
+            return [await pool.run("pid") for _ in range(5)], dict(pool.stats)
+        finally:
+            await pool.close()
+
+    pids, stats = run(scenario())
+    assert pids[0] == pids[1] != pids[2] == pids[3] != pids[4]
+    assert stats["recycled"] == 2
+    assert stats["started"] == 3
+
+
+def test_timeout_kills_host():
+    async def scenario():
+        backend = PowerShellBackend(PowerShellPool(STANDIN, size=1, timeout=0.5))
+        try:
+            with pytest.raises(TimeoutError):
+                await backend.get_user("slow")
+            user = await backend.get_user("nustinova")
+            return user, dict(backend.pool.stats)
+        finally:
+            await backend.close()
+
+    user, stats = run(scenario())
+    assert user.SamAccountName == "nustinova"
+    assert stats["timeouts"] == 1
+    assert stats["started"] == 2
+
+
+def test_errors_are_mapped():
+    async def scenario():
+        backend = PowerShellBackend(PowerShellPool(STANDIN, size=1))
+        try:
+            with pytest.raises(LookupError):
+                await backend.disable("ghost")
+            with pytest.raises(PowerShellError):
+                await backend.pool.run("format_disk")
+            with pytest.raises(ConnectionError):
+                await backend.disable("crash")
+            return await backend.get_user("nustinova"), dict(backend.pool.stats)
+        finally:
+            await backend.close()
+
+    user, stats = run(scenario())
+    assert user is not None
+    assert stats["discarded"] == 1
+
+
+def test_searches_send_escaped_indexed_filters():
+    async def scenario():
+        backend = PowerShellBackend(PowerShellPool(STANDIN, size=1))
+        try:
+            return (
+                await backend.search("Устинова Н"),
+                await backend.search("нат*(а)\\"),
+                await backend.find("NUstinova@corp.local"),
+                await backend.find("004512"),
+                await backend.find("someone@corp.local"),
+            )
+        finally:
+            await backend.close()
+
+    by_name, odd, by_mail, by_id, nobody = run(scenario())
+    assert [u.SamAccountName for u in by_name] == ["nustinova"]
+    assert odd == []
+    assert [u.SamAccountName for u in by_mail] == ["nustinova"]
+    assert [u.SamAccountName for u in by_id] == ["nustinova"]
+    assert nobody == []
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import ad.ad_client as ad_client
+from ad.ad_client import ADUser
+from ad.singleflight import SingleFlight
+
+
+class CountingBackend:
+    def __init__(self):
+        self.queries = []
+
+    async def search(self, query, limit=None):
+        self.queries.append((query, limit))
+        await asyncio.sleep(0.01)
+        if query == "boom":
+            raise RuntimeError("directory unavailable")
+        return [ADUser("iivanov", "Иванов Иван", "CN=iivanov", True)]
+
+
+@pytest.fixture
+def backend():
+    backend = CountingBackend()
+    previous = ad_client.set_backend(backend)
+    yield backend
+    ad_client.set_backend(previous)
+
+
+def test_concurrent_identical_searches_are_coalesced(backend):
+    before = ad_client.search_stats()
+
+    async def scenario():
+        return await asyncio.gather(
+            ad_client.search_candidates("Иванов"),
+            ad_client.search_candidates("  иванов "),
+            ad_client.search_candidates("ИВАНОВ"),
+            ad_client.search_candidates("Петров"),
+        )
+
+    results = asyncio.run(scenario())
+    assert backend.queries == [("иванов", None), ("петров", None)]
+    assert results[0] == results[1] == results[2]
+    assert results[0] is not results[1]
+    stats = ad_client.search_stats()
+    assert stats["calls"] - before["calls"] == 4
+    assert stats["coalesced"] - before["coalesced"] == 2
+
+    # once the first flight has landed and the cache is gone a new call goes
+    # to the directory again
+    ad_client.clear_caches()
+    asyncio.run(ad_client.search_candidates("Иванов"))
+    assert len(backend.queries) == 3
+
+
+def test_errors_are_shared(backend):
+    async def scenario():
+        return await asyncio.gather(
+            ad_client.search_candidates("boom"),
+            ad_client.search_candidates("boom"),
+            return_exceptions=True,
+        )
+
+    errors = asyncio.run(scenario())
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert backend.queries == [("boom", None)]
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("k", slow))
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == 42
+    assert flight.stats == {"calls": 2, "executed": 1, "coalesced": 1}
+    assert len(flight) == 0
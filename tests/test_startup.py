@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Seconds ``import bot.main`` may take in a fresh interpreter; dateparser
+# alone used to take about half a second of it.
+IMPORT_BUDGET = 2.0
+LAZY_MODULES = ("dateparser", "pymorphy3")
+
+
+def test_bot_import_stays_light():
+    pytest.importorskip("telegram")
+    pytest.importorskip("apscheduler")
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        "import bot.main\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(json.dumps([elapsed, [m for m in {LAZY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed, loaded = json.loads(result.stdout.splitlines()[-1])
+    assert loaded == []
+    assert elapsed < IMPORT_BUDGET
+
+
+def test_dateparser_loads_on_first_use():
+    pytest.importorskip("dateparser")
+    code = (
+        "import sys\n"
+        "from ai import nlp\n"
+        "assert 'dateparser' not in sys.modules\n"
+        "nlp.warm_up()\n"
+        "assert 'dateparser' in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+
+def test_directory_sync_needs_an_ldap_backend(monkeypatch):
+    pytest.importorskip("telegram")
+    pytest.importorskip("apscheduler")
+    from ad.powershell import PowerShellBackend, PowerShellPool
+    from bot import main
+
+    monkeypatch.setenv("AD_SYNC_SECONDS", "60")
+    monkeypatch.setenv("AD_SERVER", "dc1.corp.local")
+    monkeypatch.delenv("AD_DOMAINS", raising=False)
+    app = SimpleNamespace(create_task=lambda coro: pytest.fail("sync task started"))
+    assert main.start_directory_sync(app, PowerShellBackend(PowerShellPool(["pwsh"]))) is None
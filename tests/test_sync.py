@@ -0,0 +1,151 @@
+import asyncio
+import importlib
+import os
+from functools import partial
+
+import pytest
+
+import ad.ad_client as ad_client
+from ad.ad_client import ADUser
+from ad.index import DirectoryIndex
+from ad.sync import SNAPSHOT_SCHEMA, Change, ChangeBatch, DirectorySync, enable_sync
+
+
+def user(sam, name, enabled=True):
+    return ADUser(sam, name, f"CN={sam},OU=Users,DC=corp,DC=local", enabled)
+
+
+class FakeChangeFeed:
+    """Change feed replaying a fixed log of changes keyed by USN."""
+
+    def __init__(self):
+        self.log: list[tuple[int, Change]] = []
+        self.requests: list[str | None] = []
+
+    def push(self, change):
+        self.log.append((len(self.log) + 1, change))
+
+    async def changes(self, cursor):
+        self.requests.append(cursor)
+        high = len(self.log)
+        if cursor is None:
+            latest = {}
+            for _usn, change in self.log:
+                latest[change.sam] = change
+            changes = [c for c in latest.values() if c.user is not None]
+            return ChangeBatch(changes, str(high), full=True)
+        return ChangeBatch([c for usn, c in self.log if usn > int(cursor)], str(high))
+
+
+@pytest.fixture
+def db():
+    os.environ["DB_PATH"] = ":memory:"
+    import bot.database as database
+    importlib.reload(database)
+    database.init_db()
+    return database
+
+
+def make_sync(feed, db, index=None):
+    return DirectorySync(
+        feed,
+        index if index is not None else DirectoryIndex(),
+        load_state=partial(db.load_sync_state, "dc1"),
+        save_state=partial(db.save_sync_state, "dc1"),
+    )
+
+
+def test_incremental_changes_patch_index(db):
+    feed = FakeChangeFeed()
+    feed.push(Change("nustinova", user("nustinova", "Устинова Наталья")))
+    feed.push(Change("iivanov", user("iivanov", "Иванов Иван")))
+    sync = make_sync(feed, db)
+
+    assert asyncio.run(sync.sync_once()) == 2
+    assert sync.cursor == "2"
+
+    feed.push(Change("iivanov"))
+    feed.push(Change("nustinova", user("nustinova", "Устинова Наталья", enabled=False)))
+    assert asyncio.run(sync.sync_once()) == 2
+    assert feed.requests == [None, "2"]
+    assert sync.index.get("iivanov") is None
+    assert sync.index.get("nustinova").Enabled is False
+
+
+def test_restart_resumes_from_cursor(db):
+    feed = FakeChangeFeed()
+    feed.push(Change("nustinova", user("nustinova", "Устинова Наталья")))
+    feed.push(Change("iivanov", user("iivanov", "Иванов Иван")))
+    asyncio.run(make_sync(feed, db).sync_once())
+    feed.push(Change("ppetrov", user("ppetrov", "Петров Пётр")))
+
+    restarted = make_sync(feed, db)
+    assert asyncio.run(restarted.restore()) is True
+    assert len(restarted.index) == 2
+    asyncio.run(restarted.sync_once())
+    assert feed.requests == [None, "2"]
+    assert {u.SamAccountName for u in restarted.index} == {"nustinova", "iivanov", "ppetrov"}
+    assert restarted.cursor == "3"
+    assert len(db.load_sync_state("dc1")[1]) == 3
+
+
+def test_enable_sync_serves_searches_from_index(db):
+    feed = FakeChangeFeed()
+    feed.push(Change("iivanov", user("iivanov", "Иванов Иван")))
+    previous = ad_client.get_backend()
+    try:
+        sync = enable_sync(feed)
+        # not warmed yet -> falls back to the demo directory
+        assert [u.SamAccountName for u in asyncio.run(ad_client.search_candidates("Иванов"))] == []
+        asyncio.run(sync.sync_once())
+        found = asyncio.run(ad_client.search_candidates("Иванов"))
+        assert [u.SamAccountName for u in found] == ["iivanov"]
+    finally:
+        ad_client.set_backend(previous)
+
+
+def test_snapshot_of_another_schema_forces_full_sync(db):
+    db.save_sync_state("dc1", "7", [{"SamAccountName": "old", "DisplayName": "Old"}], [], True)
+    feed = FakeChangeFeed()
+    feed.push(Change("iivanov", user("iivanov", "Иванов Иван")))
+    sync = make_sync(feed, db)
+    assert asyncio.run(sync.restore()) is False
+    asyncio.run(sync.sync_once())
+    assert feed.requests == [None]
+    assert db.load_sync_state("dc1")[0] == f"{SNAPSHOT_SCHEMA}:1"
+    assert [u["SamAccountName"] for u in db.load_sync_state("dc1")[1]] == ["iivanov"]
+
+
+def test_corrupt_snapshot_does_not_stop_sync(db):
+    feed = FakeChangeFeed()
+    feed.push(Change("iivanov", user("iivanov", "Иванов Иван")))
+    sync = make_sync(feed, db)
+    sync.load_state = lambda: (f"{SNAPSHOT_SCHEMA}:5", [{"Unknown": 1}])
+    sync.interval = 3600
+
+    async def main():
+        task = asyncio.create_task(sync.run())
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if sync.cursor is not None:
+                break
+        task.cancel()
+
+    asyncio.run(main())
+    assert sync.cursor == "1"
+    assert sync.index.get("iivanov") is not None
+
+
+def test_full_batch_swaps_in_a_new_index(db):
+    feed = FakeChangeFeed()
+    feed.push(Change("iivanov", user("iivanov", "Иванов Иван")))
+    previous = ad_client.get_backend()
+    try:
+        sync = enable_sync(feed)
+        old = sync.index
+        asyncio.run(sync.sync_once())
+        assert sync.index is not old
+        assert ad_client.get_backend().index is sync.index
+        assert len(old) == 0
+    finally:
+        ad_client.set_backend(previous)
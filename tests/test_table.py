@@ -0,0 +1,50 @@
+import dataclasses
+
+import pytest
+
+from ad.ad_client import ADUser
+from ad.table import UserTable, split_dn
+
+
+def make_user(i, enabled=True):
+    ou = "OU=Sales" if i % 2 else "OU=IT"
+    return ADUser(f"user{i}", f"Пользователь {i}", f"CN=User {i},{ou},OU=Users,DC=corp,DC=local", enabled, f"user{i}@corp.local")
+
+
+def test_aduser_is_slotted_and_immutable():
+    user = make_user(1)
+    assert not hasattr(user, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        user.Enabled = False
+    assert dataclasses.replace(user, Enabled=False).Enabled is False
+
+
+def test_split_dn_handles_escaped_commas():
+    assert split_dn(r"CN=Ivanov\, Ivan,OU=Users,DC=corp") == (r"CN=Ivanov\, Ivan", "OU=Users,DC=corp")
+    assert split_dn("DC=local") == ("DC=local", "")
+
+
+def test_round_trip_and_interning():
+    table = UserTable()
+    users = [make_user(i, enabled=i % 3 != 0) for i in range(20)]
+    rows = [table.append(u) for u in users]
+    assert [table[r] for r in rows] == users
+    assert list(table) == users
+    assert table.paths == 2
+    assert [table.enabled(r) for r in rows] == [u.Enabled for u in users]
+
+
+def test_delete_and_reuse_rows():
+    table = UserTable()
+    rows = [table.append(make_user(i)) for i in range(10)]
+    table.delete(rows[3])
+    assert len(table) == 9
+    assert rows[3] not in table
+    with pytest.raises(IndexError):
+        table[rows[3]]
+    replacement = make_user(99, enabled=False)
+    assert table.append(replacement) == rows[3]
+    assert table[rows[3]] == replacement
+    table.update(rows[0], dataclasses.replace(table[rows[0]], Enabled=False))
+    assert table.enabled(rows[0]) is False
+    assert len(table) == 10